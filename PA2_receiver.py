@@ -5,57 +5,71 @@ import sys
 import time
 import socket
 import datetime 
-from checksum import checksum, checksum_verifier
+from checksum import ALGORITHMS
+from rdt_io import open_sink
+from rdt_compress import COMPRESSIONS, DecompressingSink
+from rdt_checkpoint import ResumableSink
+from rdt_framing import PacketReader, send_packets
+from rdt_connection import establish_connection
+from rdt_metrics import NullMetrics
+from rdt_ack import DEFAULT_ACK_EVERY, DEFAULT_ACK_DELAY
+from rdt_core import RdtReceiver
+from rdt_packet import (PROTOCOLS, PROTOCOL_STOP_AND_WAIT, PROTOCOL_SELECTIVE_REPEAT, DEFAULT_WINDOW_SIZE,
+                        FORMATS, FORMAT_TEXT, DEFAULT_MSS, MAX_MSS, make_ack_packet,
+                        hello_options, negotiated_format, negotiated_compression, negotiated_fec, negotiated_resume)
 
-CONNECTION_TIMEOUT = 60 # timeout when the receiver cannot find the sender within 60 seconds
 FIRST_NAME = "Ilmin"
 LAST_NAME = "Cho"
 
-def establish_connection(server_ip, server_port, connection_ID, role, loss_rate, corrupt_rate, max_delay):
-    """ Establish a connection to the gaia.cs.umass.edu server """
-    try:
-        # Create a TCP/IP socket
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-        # Connect the socket to the server
-        sock.connect((server_ip, server_port))
-
-        # Send "HELLO" message
-        hello_message = f"HELLO {role} {loss_rate} {corrupt_rate} {max_delay} {connection_ID}"
-        sock.sendall(hello_message.encode())
-
-        # Receive response
-        while True:
-            response = sock.recv(1024).decode()
-            if 'OK' in response:
-                print("Connection Established with ID:", connection_ID)
-                return sock
-            elif 'WAITING' in response:
-                print("Waiting for the other client to connect.")
-                continue  # Stay in the loop and wait for OK or ERROR
-            elif 'ERROR' in response:
-                print("Error received from server:", response)
-                sock.close()
-                return None
-            else:
-                print("Unexpected response:", response)
-                sock.close()
-                return None
-    except Exception as e:
-        print(f"Failed to connect to server: {e}")
-        return None
-    except KeyboardInterrupt:
-        sock.close()
-        return None
-
 def create_ack_packet(ack_num):
     """ Creates an ACK packet with the given acknowledgment number """
-    ack_packet = f"  {ack_num} {' ' * 20} "  # Data field is blank in ACK packet
-    ack_packet_checksum = checksum(ack_packet)
-    return f"{ack_packet}{ack_packet_checksum}"
+    return make_ack_packet(ack_num)
 
 
-def start_receiver(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt_rate=0.0, max_delay=0.0):
+def receive_packets(server_socket, receiver, sink, metrics=None):
+    """
+     Drives an rdt_core.RdtReceiver over a blocking socket until the sender closes the connection:
+     writes the payloads it delivers to sink in order and sends the ACKs it returns.
+     metrics is the rdt_metrics.TransferMetrics told about every delivered payload (default is None).
+    """
+    metrics = NullMetrics() if metrics is None else metrics
+    # Packets are reassembled from the byte stream, so a split packet is completed instead of dropped
+    reader = PacketReader(server_socket, receiver.packet_format)
+    # ACKs of the packets that came in with one recv go out together with one send
+    acks = []
+
+    while True:
+        if acks and not reader.buffered():
+            send_packets(server_socket, acks)
+            acks.clear()
+        try:
+            if receiver.deadline is None:
+                server_socket.settimeout(None)
+            else:
+                remaining = receiver.deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout
+                server_socket.settimeout(remaining)
+            packet = reader.read_packet()
+        except socket.timeout:
+            # The pending cumulative ACK is due
+            acks += receiver.timer_expired(time.monotonic())
+            continue
+
+        if not packet:
+            print("Connection closed by sender.")
+            return
+        new_acks, payloads = receiver.packet_received(packet, time.monotonic())
+        acks += new_acks
+        for payload in payloads:
+            sink.write(payload)
+            metrics.delivered(len(payload))
+
+
+def start_receiver(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt_rate=0.0, max_delay=0.0, protocol=PROTOCOL_STOP_AND_WAIT,
+                   window_size=DEFAULT_WINDOW_SIZE, output=None, packet_format=FORMAT_TEXT, segment_size=DEFAULT_MSS,
+                   checksum_algorithm=None, ack_every=DEFAULT_ACK_EVERY, ack_delay=DEFAULT_ACK_DELAY, pool=None,
+                   metrics=None, compression=None, fec=False, resume=False):
     """
      This function runs the receiver, connnect to the server, and receiver file from the sender.
      The function will print the checksum of the received file at the end. 
@@ -68,6 +82,29 @@ def start_receiver(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt
         loss_rate - the probabilities that a message will be lost (float - default is 0, the value should be between 0 to 1)
         corrupt_rate - the probabilities that a message will be corrupted (float - default is 0, the value should be between 0 to 1)
         max_delay - maximum delay for your packet at the server (int - default is 0, the value should be between 0 to 5)
+        protocol - "saw" for stop-and-wait, "gbn" for Go-Back-N or "sr" for Selective Repeat, must match the sender (String - default is "saw")
+        window_size - number of out-of-order packets buffered with Selective Repeat (int - default is 8, the value should be between 1 to 31)
+        output - where the received data goes: None only checksums it, a filename writes it to that file,
+                 a callable is called with every accepted segment, or an rdt_io.OutputSink such as MmapSink
+        packet_format - "text" or "bin", binary packets are only used if the sender asks for them too (String - default is "text")
+        segment_size - largest binary payload this receiver accepts, offered in the handshake (int - default is 1024)
+        checksum_algorithm - per-packet checksum to ask for in the handshake: "sum", "inet" or "crc32" (binary only); used if
+                             the sender asks for the same one (String - default is None, the format's own checksum)
+        ack_every - with Go-Back-N, in-order packets covered by one cumulative ACK (int - default is 2, 1 acknowledges every packet)
+        ack_delay - with Go-Back-N, longest time an in-order packet waits for its ACK (float - default is 0.05 seconds);
+                    gaps, duplicates and corrupted packets are always acknowledged at once
+        pool - rdt_connection.ConnectionPool whose connection prepared for connection_ID and this role is used, if it has one,
+               instead of establishing a new one; it must have been prepared with the same HELLO options (default is None)
+        metrics - rdt_metrics.TransferMetrics to fill in with RTTs, throughput, recv time and handshake latency;
+                  export it with to_json() or to_prometheus() afterwards (default is None, nothing is recorded)
+        compression - "zlib" or "lzma" to compress the payload as one stream, binary packets only; used if the
+                      other side asks for the same one (String - default is None, no compression)
+        fec - with selective repeat and binary packets, accept the XOR parity packet the sender sends after
+              every group of segments and rebuild one lost segment per group. Used if the other side
+              asks for it too (bool - default is False)
+        resume - with output a filename, keep a checkpoint next to it while receiving; if the connection drops,
+                 run again with the same connection ID to continue from the checkpoint instead of byte zero
+                 (with a sender that also resumes). An interrupted transfer returns "00000". (bool - default is False)
 
      Output: 
         checksum_val - the checksum value of the file sent (String that always has 5 digits)
@@ -77,9 +114,6 @@ def start_receiver(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt
     print("Start running receiver: {}".format(datetime.datetime.now()))
 
     checksum_val = "00000"
-    received_data = ""
-    expected_seq_num = 0
-    last_ack_sent = 1
 
     ##### START YOUR IMPLEMENTATION HERE #####
     loss_rate = 0.0 if not (0.0 <= float(loss_rate) <= 1.0) else float(loss_rate)
@@ -90,63 +124,62 @@ def start_receiver(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt
     # Validate and set default for max delay
     max_delay = 0 if not (0 <= int(max_delay) <= 5) else int(max_delay)
 
-
+    # Validate and set default for protocol, packet format and segment size
+    protocol = PROTOCOL_STOP_AND_WAIT if protocol not in PROTOCOLS else protocol
+    packet_format = FORMAT_TEXT if packet_format not in FORMATS else packet_format
+    segment_size = DEFAULT_MSS if not (1 <= int(segment_size) <= MAX_MSS) else int(segment_size)
+    checksum_algorithm = None if checksum_algorithm not in ALGORITHMS else checksum_algorithm
+    compression = None if compression not in COMPRESSIONS else compression
+    fec = bool(fec) and protocol == PROTOCOL_SELECTIVE_REPEAT
+    resume = bool(resume) and isinstance(output, str)
+    compression = None if resume else compression  # resume offsets count bytes of the file itself
+    metrics = NullMetrics() if metrics is None else metrics
+
+    # Accepted data is streamed to the sink instead of being concatenated in memory; a resumed file
+    # is only truncated to where the transfer continues once the sender agreed on it
+    sink = ResumableSink(output, connection_ID) if resume else open_sink(output)
 
     # Add this inside the start_receiver function
-    server_socket = establish_connection(server_ip, server_port, connection_ID, "R", loss_rate, corrupt_rate, max_delay)
+    checkpoint = sink.checkpoint if resume else None
+    options = hello_options(packet_format, segment_size, checksum_algorithm, compression=compression, fec=fec,
+                            resume=sink.offset if resume else None,
+                            resume_checksum=checkpoint.checksum if checkpoint is not None else None)
+    handshake_started = time.monotonic()
+    pooled = pool.acquire(connection_ID, "R") if pool is not None else None
+    if pooled is not None:
+        server_socket, options = pooled  # the handshake already happened
+    else:
+        server_socket = establish_connection(server_ip, server_port, connection_ID, "R", loss_rate, corrupt_rate, max_delay, options)
     if server_socket is None:
         print("Failed to establish connection. Exiting...")
+        sink.close()
         sys.exit(1)
+    metrics.handshake(time.monotonic() - handshake_started)
+    server_socket = metrics.socket(server_socket)
+    packet_format = negotiated_format(options)
+    if negotiated_compression(options) is not None:
+        sink = DecompressingSink(sink, negotiated_compression(options))  # the checksum is taken after decompression
+    if resume:
+        sink.start(negotiated_resume(options))
+
+    # The protocol itself, without sockets; Go-Back-N coalesces its cumulative ACKs
+    receiver = RdtReceiver(packet_format, protocol, window_size, ack_every, ack_delay, negotiated_fec(options))
 
     try:
-        while True:
-            packet = server_socket.recv(30).decode()
-            # print("\nreceived:"+packet)
-
-            # Check if the packet has enough data to be unpacked
-            if packet == '':
-                print("Connection closed by sender.")
-                break
-            if len(packet) < 30:
-                print("Incomplete packet received. Length:", len(packet))
-                continue
-
-            # Extract sequence number, payload, and checksum
-            parts = packet.split(' ')
-            seq_num = parts[0]
-            payload = packet[4:-6] # Join back the payload part
-            packet_checksum = parts[-1]
-
-            calculated_checksum = checksum(f"{seq_num} 0 {payload} ")
-
-            # print(calculated_checksum)
-            # print(packet_checksum)
-            # print(seq_num)
-            # print(expected_seq_num)
-
-            if calculated_checksum == packet_checksum and str(seq_num) == str(expected_seq_num):
-                received_data += payload
-                last_ack_sent = expected_seq_num
-                ack_packet = create_ack_packet(expected_seq_num)
-                # print("1")
-
-                expected_seq_num = 1 - expected_seq_num
-            elif calculated_checksum != packet_checksum or seq_num != last_ack_sent:
-                ack_packet = create_ack_packet(last_ack_sent)
-                # print("2")
-
-            server_socket.send(ack_packet.encode())
-            
-        #     print("sent:"+ack_packet)
-
-        # print(len(received_data))
-        # print("last:"+str(received_data))
-        checksum_val = checksum(received_data)
+        receive_packets(server_socket, receiver, sink, metrics)
+        sink.finish()
+
+        if resume and sink.interrupted:
+            print(f"Transfer interrupted after {sink.position} bytes, checkpoint saved to resume from there.")
+        else:
+            checksum_val = sink.checksum.value
 
     except Exception as e:
         print(f"An error occurred: {e}")
     finally:
         server_socket.close()
+        sink.close()
+        metrics.finish()
         print("Finish running receiver: {}".format(datetime.datetime.now()))
         print("File checksum: {}".format(checksum_val))
 
@@ -165,9 +198,11 @@ def start_receiver(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt
  
 if __name__ == '__main__':
     # CHECK INPUT ARGUMENTS
-    if len(sys.argv) != 7:
-        print("Expected \"python PA2_receiver.py <server_ip> <server_port> <connection_id> <loss_rate> <corrupt_rate> <max_delay>\"")
+    if len(sys.argv) not in (7, 8, 9):
+        print("Expected \"python PA2_receiver.py <server_ip> <server_port> <connection_id> <loss_rate> <corrupt_rate> <max_delay> [protocol] [window_size]\"")
         exit()
-    server_ip, server_port, connection_ID, loss_rate, corrupt_rate, max_delay = sys.argv[1:]
+    server_ip, server_port, connection_ID, loss_rate, corrupt_rate, max_delay = sys.argv[1:7]
+    protocol = sys.argv[7] if len(sys.argv) > 7 else PROTOCOL_STOP_AND_WAIT
+    window_size = int(sys.argv[8]) if len(sys.argv) > 8 else DEFAULT_WINDOW_SIZE
     # START RECEIVER
-    start_receiver(server_ip, int(server_port), connection_ID, loss_rate, corrupt_rate, max_delay)
+    start_receiver(server_ip, int(server_port), connection_ID, loss_rate, corrupt_rate, max_delay, protocol, window_size)
@@ -1,62 +1,103 @@
 #!/usr/bin/env python3
 # Last updated: Oct, 2021
 
+import os
 import sys
+import time
 import socket
 import datetime
-from checksum import checksum, checksum_verifier
+import itertools
+from checksum import checksum, Checksum, ALGORITHMS, SUM
+from rdt_packet import (PROTOCOLS, PROTOCOL_STOP_AND_WAIT, PROTOCOL_GO_BACK_N, PROTOCOL_SELECTIVE_REPEAT,
+                        DEFAULT_WINDOW_SIZE, FORMATS, FORMAT_TEXT, FORMAT_BINARY, DEFAULT_MSS, MAX_MSS, make_data_packet,
+                        hello_options, negotiated_format, negotiated_compression, negotiated_fec, negotiated_resume,
+                        negotiated_resume_checksum)
+from rdt_rto import RtoEstimator
+from rdt_congestion import CongestionWindow
+from rdt_core import GoBackNSender, SelectiveRepeatSender
+from rdt_io import CHUNK_SIZE, iter_file_segments
+from rdt_compress import COMPRESSIONS, compress_segments
+from rdt_fec import ParityEncoder
+from rdt_checkpoint import prefix_checksum
+from rdt_framing import PacketReader, send_packets
+from rdt_connection import establish_connection
+from rdt_metrics import NullMetrics
+from rdt_ack import SenderStats
 
-CONNECTION_TIMEOUT = 60 # timeout when the sender cannot find the receiver within 60 seconds
 FIRST_NAME = "Ilmin"
 LAST_NAME = "Cho"
 
-def establish_connection(server_ip, server_port, connection_ID, role, loss_rate, corrupt_rate, max_delay):
-    """ Establish a connection to the gaia.cs.umass.edu server """
-    try:
-        # Create a TCP/IP socket
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-        # Connect the socket to the server
-        sock.connect((server_ip, server_port))
-
-        # Send "HELLO" message
-        hello_message = f"HELLO {role} {loss_rate} {corrupt_rate} {max_delay} {connection_ID}"
-        sock.sendall(hello_message.encode())
-
-        # Receive response
-        while True:
-            response = sock.recv(1024).decode()
-            if 'OK' in response:
-                print("Connection Established with ID:", connection_ID)
-                return sock
-            elif 'WAITING' in response:
-                print("Waiting for the other client to connect.")
-                continue  # Stay in the loop and wait for OK or ERROR
-            elif 'ERROR' in response:
-                print("Error received from server:", response)
-                sock.close()
-                return None
-            else:
-                print("Unexpected response:", response)
-                sock.close()
-                return None
-
-    except Exception as e:
-        print(f"Failed to connect to server: {e}")
-        return None
-    except KeyboardInterrupt:
-        sock.close()
-        return None
-    
 def create_packet(seq_num, data):
     """ Creates a packet with a sequence number and data """
-    data = data.ljust(20)  # Ensure data is exactly 20 bytes
-    packet = f"{seq_num} 0 {data} "  # ACK num is not used in sender packet
-    packet_checksum = checksum(packet)  # Calculate checksum
-    return f"{packet}{packet_checksum}"
+    return make_data_packet(seq_num, data)
+
+
+def run_sender(server_socket, sender):
+    """
+     Drives an rdt_core.RdtSender over a blocking socket until every segment is acknowledged:
+     sends what it returns, waits for an ACK until its deadline and hands it the ACK or the timeout.
+
+     Output:
+        total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+        total_duplicate_ack, total_fast_retransmit (int)
+    """
+    reader = PacketReader(server_socket, sender.packet_format)  # ACKs are reassembled however TCP splits them
+    burst = sender.start(time.monotonic())
+    while True:
+        send_packets(server_socket, burst)  # one syscall for the whole burst
+        if sender.done:
+            break  # every segment is acknowledged
+
+        remaining = sender.deadline - time.monotonic()
+        try:
+            if remaining <= 0:
+                raise socket.timeout
+            server_socket.settimeout(remaining)
+            ack = reader.read_packet()
+        except socket.timeout:
+            burst = sender.timer_expired(time.monotonic())
+            continue
+        if not ack:
+            raise ConnectionError("Connection closed by receiver")
+        burst = sender.ack_received(ack, time.monotonic())
+
+    return sender.stats()
+
+
+def send_go_back_n(server_socket, segments, window_size, rto, packet_format, protocol=PROTOCOL_GO_BACK_N, fast_retransmit=True):
+    """
+     Sends every segment with Go-Back-N (rdt_core.GoBackNSender): up to window_size packets are in flight
+     at once, the receiver acknowledges cumulatively and a timeout resends every unacknowledged packet.
+     rto is the RtoEstimator that provides the retransmission timeout and packet_format the
+     negotiated rdt_packet format. With protocol "saw" and a window of one this is stop-and-wait.
+     window_size is a number of packets or an rdt_congestion.CongestionWindow.
+
+     Output:
+        total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+        total_duplicate_ack, total_fast_retransmit (int)
+    """
+    return run_sender(server_socket, GoBackNSender(segments, packet_format, window_size, rto, protocol, fast_retransmit))
 
 
-def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rate=0, max_delay=0, transmission_timeout=60, filename="declaration.txt"):
+def send_selective_repeat(server_socket, segments, window_size, rto, packet_format, fast_retransmit=True, fec=None):
+    """
+     Sends every segment with Selective Repeat (rdt_core.SelectiveRepeatSender): every packet has its
+     own timer, so only the packets that were actually lost are sent again. fec is an
+     rdt_fec.ParityEncoder that follows every group of segments with a parity packet.
+     The other arguments are the same as for send_go_back_n.
+
+     Output:
+        total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+        total_duplicate_ack, total_fast_retransmit (int)
+    """
+    return run_sender(server_socket, SelectiveRepeatSender(segments, packet_format, window_size, rto, fast_retransmit, fec))
+
+
+def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rate=0, max_delay=0, transmission_timeout=60, filename="declaration.txt",
+                 protocol=PROTOCOL_STOP_AND_WAIT, window_size=DEFAULT_WINDOW_SIZE, adaptive_timeout=False,
+                 stream=False, packet_format=FORMAT_TEXT, segment_size=DEFAULT_MSS, checksum_algorithm=None, fast_retransmit=True,
+                 congestion_control=False, pool=None, metrics=None, compression=None, fec=False,
+                 resume=False):
     """
      This function runs the sender, connnect to the server, and send a file to the receiver.
      The function will print the checksum, number of packet sent/recv/corrupt recv/timeout at the end. 
@@ -69,8 +110,33 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
         loss_rate - the probabilities that a message will be lost (float - default is 0, the value should be between 0 to 1)
         corrupt_rate - the probabilities that a message will be corrupted (float - default is 0, the value should be between 0 to 1)
         max_delay - maximum delay for your packet at the server (int - default is 0, the value should be between 0 to 5)
-        tranmission_timeout - waiting time until the sender resends the packet again (int - default is 60 seconds and cannot be 0)
+        tranmission_timeout - waiting time until the sender resends the packet again (float - default is 60 seconds and cannot be 0)
         filename - the path + filename to send (String)
+        protocol - "saw" for stop-and-wait, "gbn" for Go-Back-N or "sr" for Selective Repeat (String - default is "saw")
+        window_size - number of packets in flight with Go-Back-N or Selective Repeat (int - default is 8, the value should be between 1 to 61 for "gbn" and 1 to 31 for "sr")
+        adaptive_timeout - compute the timeout from measured RTT, using transmission_timeout as the initial and largest value (bool - default is False)
+        stream - send the whole file, read lazily with constant memory, instead of its first 200 bytes (bool - default is False)
+        packet_format - "text" for the 30-byte course packet or "bin" for length-prefixed binary packets, which are only
+                        used if the relay and the receiver agree in the handshake (String - default is "text")
+        segment_size - payload bytes per binary packet offered in the handshake (int - default is 1024, at most 65535)
+        checksum_algorithm - per-packet checksum to ask for in the handshake: "sum", "inet" or "crc32" (binary only); used if
+                             the receiver asks for the same one (String - default is None, the format's own checksum)
+        fast_retransmit - with Go-Back-N and Selective Repeat, resend on three duplicate ACKs instead of waiting for the timeout
+                          (bool - default is True)
+        congestion_control - with Go-Back-N and Selective Repeat, start from one packet in flight and grow up to window_size
+                             with slow start and AIMD, shrinking on loss (bool - default is False, always window_size)
+        pool - rdt_connection.ConnectionPool whose connection prepared for connection_ID and this role is used, if it has one,
+               instead of establishing a new one; it must have been prepared with the same HELLO options (default is None)
+        metrics - rdt_metrics.TransferMetrics to fill in with RTTs, throughput, recv time and handshake latency;
+                  export it with to_json() or to_prometheus() afterwards (default is None, nothing is recorded)
+        compression - "zlib" or "lzma" to compress the payload as one stream, binary packets only; used if the
+                      other side asks for the same one (String - default is None, no compression)
+        fec - with selective repeat and binary packets, send an XOR parity packet after every group of
+              segments so that the receiver rebuilds one lost segment per group; the group size follows
+              the loss rate. Used if the other side asks for it too (bool - default is False)
+        resume - continue where a receiver started with resume=True and the same connection ID got to before
+                 the connection dropped, and mark the end of the file so that it knows the transfer is complete;
+                 implies stream and excludes compression (bool - default is False)
 
      Output: 
         checksum_val - the checksum value of the file sent (String that always has 5 digits)
@@ -78,6 +144,7 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
         total_packet_recv - the total number of packet received, including corrupted (int)
         total_corrupted_pkt_recv - the total number of corrupted packet receieved (int)
         total_timeout - the total number of timeout (int)
+        The tuple also has duplicate_acks and fast_retransmits attributes (rdt_ack.SenderStats)
 
     """
 
@@ -89,6 +156,8 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
     total_packet_recv = 0
     total_corrupted_pkt_recv = 0
     total_timeout =  0
+    total_duplicate_ack = 0
+    total_fast_retransmit = 0
 
     print("Connecting to server: {}, {}, {}".format(server_ip, server_port, connection_ID))
 
@@ -102,50 +171,137 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
     max_delay = 0 if not (0 <= int(max_delay) <= 5) else int(max_delay)
 
     # Validate and set default for transmission timeout
-    transmission_timeout = 3 if not (int(transmission_timeout) > 0) else int(transmission_timeout)
+    transmission_timeout = 3 if not (float(transmission_timeout) > 0) else float(transmission_timeout)
+
+    # Validate and set default for protocol, packet format and segment size
+    protocol = PROTOCOL_STOP_AND_WAIT if protocol not in PROTOCOLS else protocol
+    packet_format = FORMAT_TEXT if packet_format not in FORMATS else packet_format
+    segment_size = DEFAULT_MSS if not (1 <= int(segment_size) <= MAX_MSS) else int(segment_size)
+    checksum_algorithm = None if checksum_algorithm not in ALGORITHMS else checksum_algorithm
+    compression = None if compression not in COMPRESSIONS else compression
+    fec = bool(fec) and protocol == PROTOCOL_SELECTIVE_REPEAT
+    resume = bool(resume) and os.path.isfile(filename)
+    stream = stream or resume
+    compression = None if resume else compression  # resume offsets count bytes of the file itself
+    metrics = NullMetrics() if metrics is None else metrics
+    rto = RtoEstimator(transmission_timeout, adaptive=bool(adaptive_timeout), on_sample=metrics.observe_rtt)
 
     # # Add this inside the start_sender function
-    server_socket = establish_connection(server_ip, server_port, connection_ID, "S", loss_rate, corrupt_rate, max_delay)
+    # The sender can resume anywhere in its file; the receiver says where it got to
+    options = hello_options(packet_format, segment_size, checksum_algorithm, compression=compression, fec=fec,
+                            resume=os.path.getsize(filename) if resume else None)
+    handshake_started = time.monotonic()
+    pooled = pool.acquire(connection_ID, "S") if pool is not None else None
+    if pooled is not None:
+        server_socket, options = pooled  # the handshake already happened
+    else:
+        server_socket = establish_connection(server_ip, server_port, connection_ID, "S", loss_rate, corrupt_rate, max_delay, options)
     if server_socket is None:
         print("Failed to establish connection. Exiting...")
         sys.exit(1)
+    metrics.handshake(time.monotonic() - handshake_started)
+    server_socket = metrics.socket(server_socket)
+    packet_format = negotiated_format(options)
+
+    # Validate and set default for window size, whose limit depends on the negotiated sequence space
+    max_window = packet_format.max_window_size(protocol)
+    window_size = min(DEFAULT_WINDOW_SIZE, max_window) if not (1 <= int(window_size) <= max_window) else int(window_size)
 
+    data = None
+    # A resumed transfer skips what the receiver has, which still counts in the file checksum
+    offset = negotiated_resume(options) or 0
+    resumed_checksum = prefix_checksum(filename, offset) if offset else Checksum()
+    if offset and resumed_checksum.total != negotiated_resume_checksum(options):
+        print("The file changed since the receiver's checkpoint, sending it from the start.")
+        offset = 0
+        resumed_checksum = Checksum()
     try:
-        with open(filename, 'r') as file:
-            data = file.read(200)  # Read the first 200 bytes
-            seq_num = 0
+        if packet_format.name == FORMAT_BINARY:
+            # Binary packets carry raw bytes, so segments come straight from the file
+            file_checksum = resumed_checksum
+            if negotiated_compression(options) is not None:
+                # The file is checksummed as it is read, before it is compressed
+                chunks = iter_file_segments(filename, file_checksum, CHUNK_SIZE, None if stream else 200)
+                segments = compress_segments(chunks, negotiated_compression(options), packet_format.segment_size)
+            else:
+                segments = iter_file_segments(filename, file_checksum, packet_format.segment_size, None if stream else 200,
+                                              offset)
+        elif stream:
+            # Read the whole file lazily; the checksum is updated as segments are produced. Text packets
+            # take the bytes as they are, so any file goes through, not only ASCII ones
+            file_checksum = resumed_checksum
+            segments = iter_file_segments(filename, file_checksum, offset=offset)
+        else:
+            with open(filename, 'r') as file:
+                data = file.read(200)  # Read the first 200 bytes
+            segments = [data[i:i+20] for i in range(0, len(data), 20)]  # Split data into 20-byte segments
+        if negotiated_resume(options) is not None:
+            # The first segment tells the receiver where the data continues from, and an empty
+            # segment after the last one that the file is complete
+            segments = itertools.chain([b'%d' % offset], segments, [b''])
+        segments = metrics.count_segments(segments)
 
-            for i in range(0, len(data), 20):  # Split data into 20-byte segments
-                packet_data = data[i:i+20]
-                packet = create_packet(str(seq_num), packet_data)
+        legacy_packets = packet_format.name == FORMAT_TEXT and packet_format.checksum_algorithm == SUM
+        if protocol in (PROTOCOL_GO_BACK_N, PROTOCOL_SELECTIVE_REPEAT) or not legacy_packets:
+            # Stop-and-wait with binary packets or another checksum is Go-Back-N with a window of one
+            if congestion_control and protocol != PROTOCOL_STOP_AND_WAIT:
+                window_size = CongestionWindow(window_size)
+            if protocol == PROTOCOL_SELECTIVE_REPEAT:
+                encoder = ParityEncoder(packet_format) if negotiated_fec(options) else None
+                stats = send_selective_repeat(server_socket, segments, window_size, rto, packet_format, fast_retransmit,
+                                              encoder)
+            else:
+                stats = send_go_back_n(server_socket, segments, window_size, rto, packet_format, protocol, fast_retransmit)
+            (total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+             total_duplicate_ack, total_fast_retransmit) = stats
+        else:
+            reader = PacketReader(server_socket, packet_format)
+            codec = packet_format.codec  # packets built and checked on bytes, ACKs are never decoded
+            seq_num = 0
+            for packet_data in segments:
+                packet = codec.data_packet(seq_num, packet_data)  # once, not on every retransmission
                 # print(f"\nSending packet: {packet}")
 
+                attempts = 0
                 while True:
-                    server_socket.sendall(packet.encode())
+                    send_packets(server_socket, [packet])
                     # print("packet:"+ packet)
                     total_packet_sent += 1
-                    server_socket.settimeout(transmission_timeout)
+                    attempts += 1
+                    sent_at = time.monotonic()
+                    deadline = sent_at + rto.timeout
                     try:
-                        ack = server_socket.recv(30).decode()
-                        total_packet_recv += 1
-                        # print("recived:"+ack)
-                        # print("---------------")
-                        
-                        if ack[2] == str(seq_num):
-                            if checksum_verifier(ack):
-                                seq_num = 1 - seq_num
-                                break
-                            else:
+                        # As in rdt3.0, a corrupted ACK or one for the other packet is ignored and only
+                        # the timer resends, so every retransmission is counted as a timeout
+                        while True:
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                raise socket.timeout
+                            server_socket.settimeout(remaining)
+                            ack = reader.read_packet()
+                            if not ack:
+                                raise ConnectionError("Connection closed by receiver")
+                            total_packet_recv += 1
+                            # print("recived:"+ack)
+                            # print("---------------")
+
+                            if not codec.verify(ack):
                                 total_corrupted_pkt_recv += 1
-                        else:
-                            total_timeout += 1 # sender packet was corrupt so, should ignore receiver packet
-                              
+                            elif codec.ack_number(ack) == seq_num:
+                                break
+                            # else the sender packet was corrupt, so the receiver acknowledged the previous one
+                        if attempts == 1:  # Karn's rule: no RTT samples from retransmitted packets
+                            rto.sample(time.monotonic() - sent_at)
+                        seq_num = 1 - seq_num
+                        break
+
                     except socket.timeout:
                         total_timeout += 1
+                        rto.backoff()
                         # break
-            
-            # print("\ndata:"+data)
-            checksum_val = checksum(data)  # Calculate checksum of sent data
+
+        # print("\ndata:"+data)
+        checksum_val = checksum(data) if data is not None else file_checksum.value  # Calculate checksum of sent data
             
 
 
@@ -155,6 +311,7 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
         print(f"An error occurred: {e}")
     finally:
         server_socket.close()
+        metrics.finish()
         print("Finish running sender: {}".format(datetime.datetime.now()))
         # PRINT STATISTICS
         print("File checksum: {}".format(checksum_val))
@@ -162,8 +319,11 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
         print("Total packet recv: {}".format(total_packet_recv))
         print("Total corrupted packet recv: {}".format(total_corrupted_pkt_recv))
         print("Total timeout: {}".format(total_timeout))
+        print("Total duplicate ACK recv: {}".format(total_duplicate_ack))
+        print("Total fast retransmit: {}".format(total_fast_retransmit))
 
-    return (checksum_val, total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout)   
+    return SenderStats((checksum_val, total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout),
+                       total_duplicate_ack, total_fast_retransmit)
 
     # ##### END YOUR IMPLEMENTATION HERE #####
 
@@ -181,12 +341,15 @@ def start_sender(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rat
  
 if __name__ == '__main__':
     # CHECK INPUT ARGUMENTS
-    if len(sys.argv) != 9:
-        print("Expected \"python3 PA2_sender.py <server_ip> <server_port> <connection_id> <loss_rate> <corrupt_rate> <max_delay> <transmission_timeout> <filename>\"")
+    if len(sys.argv) not in (9, 10, 11):
+        print("Expected \"python3 PA2_sender.py <server_ip> <server_port> <connection_id> <loss_rate> <corrupt_rate> <max_delay> <transmission_timeout> <filename> [protocol] [window_size]\"")
         exit()
 
     # ASSIGN ARGUMENTS TO VARIABLES
-    server_ip, server_port, connection_ID, loss_rate, corrupt_rate, max_delay, transmission_timeout, filename = sys.argv[1:]
+    server_ip, server_port, connection_ID, loss_rate, corrupt_rate, max_delay, transmission_timeout, filename = sys.argv[1:9]
+    protocol = sys.argv[9] if len(sys.argv) > 9 else PROTOCOL_STOP_AND_WAIT
+    window_size = int(sys.argv[10]) if len(sys.argv) > 10 else DEFAULT_WINDOW_SIZE
     
     # RUN SENDER
-    start_sender(server_ip, int(server_port), connection_ID, loss_rate, corrupt_rate, max_delay, float(transmission_timeout), filename)
+    start_sender(server_ip, int(server_port), connection_ID, loss_rate, corrupt_rate, max_delay, float(transmission_timeout), filename,
+                 protocol, window_size)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# Microbenchmarks for checksum.py: cost per packet of every algorithm, next to the original per-byte loop
+
+import sys
+import timeit
+import argparse
+import checksum
+from checksum import ALGORITHMS, Checksum, compute
+
+SIZES = (30, 1036, 65548)  # a text packet, a binary packet with the default MSS, the largest binary packet
+
+
+def legacy_checksum(msg):
+    """ The original implementation of checksum.checksum, kept as the baseline """
+    byte_msg = msg.encode("utf-8")
+    s = 0
+    for i in range(len(byte_msg)):
+        s += byte_msg[i]
+    return format(s, '05d')
+
+
+def time_per_call(statement, number):
+    """ Best of five runs, in microseconds per call """
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-packet cost of the checksum algorithms")
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    args = parser.parse_args(argv)
+
+    print(f"NumPy fast path: {'enabled' if checksum.numpy is not None else 'not installed'}")
+    print(f"{'algorithm':<14}" + "".join(f"{size:>12} B" for size in SIZES) + "   (us per packet)")
+    rows = [("legacy loop", lambda data: legacy_checksum(data.decode('latin-1')))]
+    rows += [(algorithm, lambda data, algorithm=algorithm: compute(data, algorithm)) for algorithm in ALGORITHMS]
+    for name, function in rows:
+        cells = []
+        for size in SIZES:
+            data = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+            number = max(1, args.number * SIZES[0] // size)
+            cells.append(time_per_call(lambda: function(data), number))
+        print(f"{name:<14}" + "".join(f"{cell:14.2f}" for cell in cells))
+
+    # Incremental use over a whole stream, as the sender and receiver checksum the file
+    data = bytes(range(256)) * 4
+    for algorithm in ALGORITHMS:
+        def stream():
+            running = Checksum(algorithm)
+            for _ in range(1024):
+                running.update(data)
+        seconds = min(timeit.repeat(stream, number=1, repeat=5))
+        print(f"{algorithm:<14}incremental over 1 MiB in 1 KiB updates: {seconds * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Microbenchmarks of rdt_core.py and rdt_codec.py: cost per segment of the sender and receiver state
+# machines alone, run against each other in memory with no socket, relay or timer involved, and cost
+# per text packet of the codec next to the original string-based packets
+
+import sys
+import timeit
+import argparse
+from checksum import checksum_verifier
+from rdt_core import RdtReceiver, make_sender
+from rdt_codec import TextCodec
+from rdt_packet import PROTOCOLS, BinaryFormat, TextFormat, make_ack_packet, make_data_packet
+from rdt_rto import RtoEstimator
+
+
+def run_in_memory(segments, packet_format, protocol, window_size):
+    """ Transfers segments over a lossless in-memory link; every ACK goes back at once """
+    sender = make_sender(segments, packet_format, protocol, window_size, RtoEstimator(60))
+    receiver = RdtReceiver(packet_format, protocol, window_size, ack_every=1)
+    packets = sender.start(0.0)
+    while not sender.done:
+        acks = []
+        for packet in packets:
+            acks += receiver.packet_received(packet, 0.0)[0]
+        packets = [packet for ack in acks for packet in sender.ack_received(ack, 0.0)]
+    return sender.stats()
+
+
+def legacy_parse(packet):
+    """ The original receiver's checks: decode, verify the checksum on the str, split out the fields """
+    packet = packet.decode()
+    if not checksum_verifier(packet):
+        return None
+    parts = packet.split(' ')
+    return int(parts[0]), ' '.join(parts[2:-1]).rstrip("\0")
+
+
+def time_per_call(function, number):
+    """ Best of five runs, in microseconds per call """
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-segment cost of the RDT state machines without I/O")
+    parser.add_argument("--file", default="declaration.txt")
+    parser.add_argument("--window-size", type=int, default=8)
+    args = parser.parse_args(argv)
+    with open(args.file, 'rb') as file:
+        data = file.read()
+
+    print(f"{'format':<10}" + "".join(f"{protocol:>12}" for protocol in PROTOCOLS) + "   (us per segment)")
+    for packet_format in (TextFormat(), BinaryFormat()):
+        size = packet_format.segment_size
+        segments = [data[i:i + size] for i in range(0, len(data), size)]
+        cells = []
+        for protocol in PROTOCOLS:
+            window_size = min(args.window_size, packet_format.max_window_size(protocol))
+            seconds = min(timeit.repeat(lambda: run_in_memory(segments, packet_format, protocol, window_size),
+                                        number=1, repeat=5))
+            cells.append(seconds / len(segments) * 1e6)
+        print(f"{packet_format.name:<10}" + "".join(f"{cell:12.2f}" for cell in cells))
+
+    codec = TextCodec()
+    segment = data[:20]
+    packet = codec.data_packet(1, segment)
+    print(f"\n{'text packet':<14}{'data packet':>14}{'ACK':>14}{'parse':>14}   (us per packet)")
+    rows = [("strings", lambda: make_data_packet("1", segment.decode()).encode(), lambda: make_ack_packet("1").encode(),
+             lambda: legacy_parse(packet)),
+            ("rdt_codec", lambda: codec.data_packet(1, segment), lambda: codec.ack_packet(1),
+             lambda: codec.parse_data(memoryview(packet)))]
+    for name, *functions in rows:
+        print(f"{name:<14}" + "".join(f"{time_per_call(function, 20000):14.2f}" for function in functions))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Throughput benchmark matrix: transfers through a local relay over a grid of loss rate, corrupt rate,
+# max delay, transmission timeout, window size and segment size, with goodput, completion time and
+# p50/p99 transfer latency written to CSV or JSON and compared against a saved baseline
+
+import os
+import csv
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import itertools
+import tempfile
+from rdt_packet import PROTOCOLS, PROTOCOL_SELECTIVE_REPEAT, FORMATS, FORMAT_BINARY
+from rdt_relay import RelayServer
+from rdt_async import start_receiver_async, start_sender_async
+
+PARAMETERS = ("protocol", "packet_format", "loss_rate", "corrupt_rate", "max_delay", "timeout", "window_size", "segment_size")
+RESULTS = ("transfers", "failures", "goodput_bytes_per_second", "mean_seconds", "p50_seconds", "p99_seconds",
+           "packets_sent", "timeouts")
+DEFAULT_TOLERANCE = 0.2  # a cell regressed if its goodput fell by more than this fraction of the baseline
+
+
+def percentile(values, q):
+    """ Nearest-rank percentile of a non-empty list """
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q * len(ordered)), 1) - 1]
+
+
+async def transfer(port, connection_ID, filename, size, cell):
+    """ One transfer of the file through the relay; returns (seconds, sender stats, receiver checksum) """
+    started = time.perf_counter()
+    common = dict(packet_format=cell["packet_format"], segment_size=cell["segment_size"])
+    stats, checksum_val = await asyncio.gather(
+        start_sender_async("127.0.0.1", port, connection_ID, cell["loss_rate"], cell["corrupt_rate"], cell["max_delay"],
+                           cell["timeout"], filename, cell["protocol"], cell["window_size"], adaptive_timeout=True,
+                           stream=True, **common),
+        start_receiver_async("127.0.0.1", port, connection_ID, cell["loss_rate"], cell["corrupt_rate"], cell["max_delay"],
+                             cell["protocol"], cell["window_size"], **common),
+    )
+    return time.perf_counter() - started, stats, checksum_val
+
+
+def run_cell(port, filename, size, cell, repeat, index):
+    """ Runs repeat transfers of one grid cell one after the other; returns the cell with its results """
+    seconds, packets_sent, timeouts, failures = [], [], [], 0
+    for attempt in range(repeat):
+        elapsed, stats, checksum_val = asyncio.run(transfer(port, f"bench{index}-{attempt}", filename, size, cell))
+        if stats[0] != checksum_val or checksum_val == "00000":
+            failures += 1
+            continue
+        seconds.append(elapsed)
+        packets_sent.append(stats[1])
+        timeouts.append(stats[4])
+    row = dict(cell, transfers=repeat, failures=failures)
+    if seconds:
+        row.update(goodput_bytes_per_second=size * len(seconds) / sum(seconds),
+                   mean_seconds=sum(seconds) / len(seconds),
+                   p50_seconds=percentile(seconds, 0.5),
+                   p99_seconds=percentile(seconds, 0.99),
+                   packets_sent=sum(packets_sent) / len(packets_sent),
+                   timeouts=sum(timeouts) / len(timeouts))
+    return row
+
+
+def cell_key(row):
+    return tuple(str(row[name]) for name in PARAMETERS)
+
+
+def compare(rows, baseline, tolerance):
+    """ Returns a line for every cell whose goodput fell more than tolerance below the baseline's """
+    previous = {cell_key(row): row for row in baseline}
+    regressions = []
+    for row in rows:
+        before = previous.get(cell_key(row))
+        if not before or not before.get("goodput_bytes_per_second"):
+            continue
+        now = row.get("goodput_bytes_per_second") or 0.0
+        change = now / float(before["goodput_bytes_per_second"]) - 1
+        if change < -tolerance:
+            regressions.append(f"{dict(zip(PARAMETERS, cell_key(row)))}: goodput {change:+.0%}")
+    return regressions
+
+
+def load_rows(path):
+    """ Reads results written by write_rows, CSV or JSON by extension """
+    with open(path, newline='') as file:
+        if path.endswith(".csv"):
+            return list(csv.DictReader(file))
+        return json.load(file)
+
+
+def write_rows(path, rows):
+    with open(path, 'w', newline='') as file:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(file, fieldnames=PARAMETERS + RESULTS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, file, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Goodput and latency of transfers over a grid of link and protocol settings")
+    parser.add_argument("--protocol", nargs="+", choices=PROTOCOLS, default=[PROTOCOL_SELECTIVE_REPEAT])
+    parser.add_argument("--format", dest="packet_format", nargs="+", choices=FORMATS, default=[FORMAT_BINARY])
+    parser.add_argument("--loss-rate", nargs="+", type=float, default=[0.0, 0.1])
+    parser.add_argument("--corrupt-rate", nargs="+", type=float, default=[0.0, 0.1])
+    parser.add_argument("--max-delay", nargs="+", type=int, default=[0])
+    parser.add_argument("--timeout", nargs="+", type=float, default=[1.0])
+    parser.add_argument("--window-size", nargs="+", type=int, default=[8, 16])
+    parser.add_argument("--segment-size", nargs="+", type=int, default=[1024], help="binary packets only")
+    parser.add_argument("--bytes", type=int, default=256 * 1024, help="size of the file sent by every transfer")
+    parser.add_argument("--repeat", type=int, default=5, help="transfers per cell, for the latency percentiles")
+    parser.add_argument("--seed", default="1", help="relay seed")
+    parser.add_argument("--output", help="write the results to this .csv or .json file")
+    parser.add_argument("--baseline", help="compare goodput against results saved earlier with --output")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    grid = [dict(zip(PARAMETERS, values)) for values in itertools.product(
+        args.protocol, args.packet_format, args.loss_rate, args.corrupt_rate, args.max_delay, args.timeout,
+        args.window_size, args.segment_size)]
+    relay = RelayServer(port=0, seed=args.seed).start_in_thread()
+    # Printable bytes, so the text format can carry the same file
+    fd, filename = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, 'wb') as file:
+        file.write(bytes(ord("a") + i % 26 for i in range(args.bytes)))
+    rows = []
+    try:
+        print(f"{'cell':<96}{'goodput KiB/s':>14}{'p50 s':>9}{'p99 s':>9}{'fail':>6}")
+        for index, cell in enumerate(grid):
+            row = run_cell(relay.port, filename, args.bytes, cell, args.repeat, index)
+            rows.append(row)
+            label = f"{cell['protocol']}/{cell['packet_format']} " + " ".join(f"{name}={cell[name]}" for name in PARAMETERS[2:])
+            if "goodput_bytes_per_second" in row:
+                print(f"{label:<96}{row['goodput_bytes_per_second'] / 1024:14.1f}{row['p50_seconds']:9.3f}"
+                      f"{row['p99_seconds']:9.3f}{row['failures']:6d}")
+            else:
+                print(f"{label:<96}{'-':>14}{'-':>9}{'-':>9}{row['failures']:6d}")
+    finally:
+        relay.stop()
+        os.unlink(filename)
+
+    if args.output:
+        write_rows(args.output, rows)
+    if args.baseline:
+        regressions = compare(rows, load_rows(args.baseline), args.tolerance)
+        for line in regressions:
+            print(f"Regression: {line}")
+        if regressions:
+            return 1
+        print(f"No cell regressed by more than {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,31 +1,135 @@
 #!/usr/bin/env python3
 # Last updated: Jul, 2021
 
-def checksum(msg):
+import zlib
+
+try:
+    import numpy
+except ImportError:  # NumPy only speeds up large buffers, everything works without it
+    numpy = None
+
+# Checksum algorithms a connection can negotiate
+SUM = "sum"  # the course checksum: plain sum of the bytes
+INTERNET = "inet"  # RFC 1071 16-bit one's complement sum
+CRC32 = "crc32"
+ALGORITHMS = (SUM, INTERNET, CRC32)
+
+NUMPY_THRESHOLD = 64 * 1024  # below this the builtin sum is faster than going through NumPy
+
+
+def byte_sum(data):
+    """ Sum of all bytes of a bytes-like object, vectorized with NumPy for large buffers """
+    if numpy is not None and len(data) >= NUMPY_THRESHOLD:
+        return int(numpy.frombuffer(data, dtype=numpy.uint8).sum(dtype=numpy.uint64))
+    return sum(data)
+
+
+def _word_sum(data):
+    """
+     One's complement sum of the big-endian 16-bit words of an even-length buffer.
+     Since 2**16 is 1 modulo 0xFFFF, that sum is the buffer read as one big integer
+     modulo 0xFFFF, which int.from_bytes computes without a Python-level loop.
+    """
+    number = int.from_bytes(data, 'big')
+    total = number % 0xFFFF
+    return 0xFFFF if number and not total else total  # one's complement keeps -0 for nonzero data
+
+
+def _add16(first, second):
+    total = first + second
+    return (total & 0xFFFF) + (total >> 16)
+
+
+def internet_checksum(data):
+    """ RFC 1071 Internet checksum of a bytes-like object """
+    data = memoryview(data).cast('B')
+    total = _word_sum(data[:len(data) & ~1])
+    if len(data) & 1:
+        total = _add16(total, data[-1] << 8)  # pad the odd byte with zero
+    return ~total & 0xFFFF
+
+
+def compute(data, algorithm=SUM):
+    """ Checksum of a bytes-like object with the given algorithm, as an int """
+    if algorithm == SUM:
+        return byte_sum(data)
+    if algorithm == INTERNET:
+        return internet_checksum(data)
+    if algorithm == CRC32:
+        return zlib.crc32(data)
+    raise ValueError(f"unknown checksum algorithm: {algorithm}")
+
+
+class Checksum:
+    """
+     Incremental checksum: update() it with consecutive pieces of data and read the result
+     from digest() (an int) or value (a string formatted like checksum()).
+     The result is the same as compute() over the concatenation of all pieces.
+    """
+
+    def __init__(self, algorithm=SUM):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown checksum algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.total = 0
+        self._odd_byte = None  # INTERNET: trailing byte waiting for its pair
+
+    def update(self, data):
+        """ Adds a bytes-like object to the checksum """
+        if self.algorithm == SUM:
+            self.total += byte_sum(data)
+        elif self.algorithm == CRC32:
+            self.total = zlib.crc32(data, self.total)
+        else:
+            data = memoryview(data).cast('B')
+            if self._odd_byte is not None and len(data):
+                self.total = _add16(self.total, (self._odd_byte << 8) | data[0])
+                self._odd_byte = None
+                data = data[1:]
+            if len(data) & 1:
+                self._odd_byte = data[-1]
+                data = data[:-1]
+            self.total = _add16(self.total, _word_sum(data))
+
+    def digest(self):
+        """ The checksum of everything added so far, as an int """
+        if self.algorithm != INTERNET:
+            return self.total
+        total = self.total
+        if self._odd_byte is not None:
+            total = _add16(total, self._odd_byte << 8)
+        return ~total & 0xFFFF
+
+    @property
+    def value(self):
+        """ The checksum string, zero-padded to five digits like checksum() """
+        return format(self.digest(), '05d')
+
+
+def checksum(msg, algorithm=SUM):
     """
      This function calculates checksum of an input string
-     Note that this checksum is not an Internet checksum.
-    
-     Input: msg - String
+     Note that this checksum is not an Internet checksum, unless algorithm is INTERNET.
+
+     Input: msg - String (or bytes)
      Output: String with length of five
      Example Input: "1 0 That was the time fo "
      Expected Output: "02018"
     """
 
     # step1: covert msg (string) to bytes
-    msg = msg.encode("utf-8")
-    s = 0
-    # step2: sum all bytes
-    for i in range(0, len(msg), 1):
-        s += msg[i]
-    # step3: return the checksum string with fixed length of five 
+    if isinstance(msg, str):
+        msg = msg.encode("utf-8")
+    # step2: sum all bytes (or run the selected algorithm)
+    s = compute(msg, algorithm)
+    # step3: return the checksum string with fixed length of five
     #        (zero-padding in front if needed)
     return format(s, '05d')
 
 def checksum_verifier(msg):
     """
      This function compares packet checksum with expected checksum
-    
+
      Input: msg - String
      Output: Boolean - True if they are the same, Otherwise False.
      Example Input: "1 0 That was the time fo 02018"
@@ -0,0 +1,28 @@
+from typing import Callable, Iterator, Optional
+
+import pytest
+
+from rdt_relay import RelayServer
+
+
+@pytest.fixture
+def relay_factory() -> Iterator[Callable[[Optional[str]], RelayServer]]:
+    """ Starts local relays on free ports with the given seed, and stops them after the test """
+    servers = []
+
+    def start(seed: Optional[str] = None) -> RelayServer:
+        servers.append(RelayServer(port=0, seed=seed).start_in_thread())
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def relay(request: pytest.FixtureRequest, relay_factory: Callable[[Optional[str]], RelayServer]) -> RelayServer:
+    """
+     A local relay on a free port. Its seed is the parameter of an indirect parametrization of
+     relay, or else the RELAY_SEED of the test module, so every module replays its own impairments.
+    """
+    return relay_factory(getattr(request, "param", getattr(request.module, "RELAY_SEED", None)))
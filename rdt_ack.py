@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# ACK policies: delayed cumulative ACKs on the Go-Back-N receiver, duplicate ACKs on the senders
+
+import time
+
+DEFAULT_ACK_EVERY = 2  # in-order segments covered by one cumulative ACK
+DEFAULT_ACK_DELAY = 0.05  # seconds an in-order segment may wait for its ACK
+DUP_ACK_THRESHOLD = 3  # duplicate ACKs that trigger a fast retransmit
+
+
+class DelayedAck:
+    """
+     Decides when a receiver that acknowledges cumulatively sends its ACK: after every
+     `every` in-order segments, or once the oldest unacknowledged one has waited `delay`
+     seconds. Gaps, duplicates and corrupted packets are still acknowledged at once by the
+     caller, which then calls sent(). With every=1 every segment is acknowledged immediately.
+     clock returns the current time in seconds.
+    """
+
+    def __init__(self, every=DEFAULT_ACK_EVERY, delay=DEFAULT_ACK_DELAY, clock=time.monotonic):
+        self.every = max(int(every), 1)
+        self.delay = max(float(delay), 0.0)
+        self.clock = clock
+        self.pending = 0  # in-order segments not acknowledged yet
+        self.deadline = None
+
+    def received_in_order(self):
+        """ Counts an in-order segment; returns True if the cumulative ACK should be sent now """
+        self.pending += 1
+        if self.pending >= self.every:
+            return True
+        if self.deadline is None:
+            self.deadline = self.clock() + self.delay
+        return False
+
+    def sent(self):
+        """ Records that an ACK covering every segment received so far went out """
+        self.pending = 0
+        self.deadline = None
+
+
+class SenderStats(tuple):
+    """
+     The (checksum_val, total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout)
+     tuple returned by the senders, with the counters that do not fit that historical shape as
+     attributes: duplicate_acks received and fast_retransmits made. total_timeout only counts
+     retransmission timer expiries.
+    """
+
+    def __new__(cls, values, duplicate_acks=0, fast_retransmits=0):
+        stats = super().__new__(cls, values)
+        stats.duplicate_acks = duplicate_acks
+        stats.fast_retransmits = fast_retransmits
+        return stats
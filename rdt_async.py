@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# asyncio versions of start_sender and start_receiver: every transfer is a coroutine instead of an
+# OS thread, so one event loop can drive hundreds of them at once
+
+import asyncio
+import itertools
+from checksum import Checksum, ALGORITHMS
+from rdt_packet import (PROTOCOLS, PROTOCOL_STOP_AND_WAIT, PROTOCOL_GO_BACK_N, PROTOCOL_SELECTIVE_REPEAT,
+                        DEFAULT_WINDOW_SIZE, FORMATS, FORMAT_TEXT, DEFAULT_MSS, MAX_MSS,
+                        hello_options, negotiated_format, negotiated_compression, negotiated_fec)
+from rdt_rto import RtoEstimator
+from rdt_congestion import CongestionWindow
+from rdt_core import GoBackNSender, SelectiveRepeatSender, RdtReceiver
+from rdt_io import CHUNK_SIZE, iter_file_segments, open_sink
+from rdt_compress import COMPRESSIONS, DecompressingSink, compress_segments
+from rdt_fec import ParityEncoder
+from rdt_ack import SenderStats, DEFAULT_ACK_EVERY, DEFAULT_ACK_DELAY
+from rdt_connection import establish_connection_async
+
+
+async def read_packet(reader, packet_format):
+    """ Reads one complete packet from a StreamReader, or returns b'' once the peer closes """
+    try:
+        packet = await reader.readexactly(packet_format.packet_size(b'') or 2)
+        size = packet_format.packet_size(packet)
+        if size > len(packet):
+            packet += await reader.readexactly(size - len(packet))
+    except asyncio.IncompleteReadError:
+        return b''
+    return packet
+
+
+class PacketQueue:
+    """
+     Reads packets in a background task and queues them, so that waiting for one with a
+     timeout (asyncio.wait_for on get) never cancels a read halfway through a packet.
+     Without a reader, packets are put() in by someone else, such as rdt_session's demultiplexer.
+    """
+
+    def __init__(self, reader=None, packet_format=None):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._read(reader, packet_format)) if reader is not None else None
+
+    async def _read(self, reader, packet_format):
+        while True:
+            packet = await read_packet(reader, packet_format)
+            self.queue.put_nowait(packet)
+            if not packet:
+                return
+
+    def put(self, packet):
+        self.queue.put_nowait(packet)
+
+    def pending(self):
+        """ True if a packet is queued already, so get returns it without waiting """
+        return not self.queue.empty()
+
+    async def get(self, timeout=None):
+        """ Returns the next packet, b'' once the peer closed; raises asyncio.TimeoutError after timeout seconds """
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), max(timeout, 0))
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+
+async def run_sender(acks, writer, sender):
+    """
+     Coroutine version of PA2_sender.run_sender: drives an rdt_core.RdtSender over the writer
+     of a connection and its PacketQueue acks, with the event loop's clock.
+
+     Output:
+        total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+        total_duplicate_ack, total_fast_retransmit (int)
+    """
+    clock = asyncio.get_running_loop().time  # the loop's clock, which rdt_sim.py makes virtual
+    burst = sender.start(clock())
+    while True:
+        writer.writelines(burst)  # one syscall for the whole burst
+        await writer.drain()
+        if sender.done:
+            break  # every segment is acknowledged
+
+        try:
+            ack = await acks.get(sender.deadline - clock())
+        except asyncio.TimeoutError:
+            burst = sender.timer_expired(clock())
+            continue
+        if not ack:
+            raise ConnectionError("Connection closed by receiver")
+        burst = sender.ack_received(ack, clock())
+
+    return sender.stats()
+
+
+async def send_go_back_n(acks, writer, segments, window_size, rto, packet_format, protocol=PROTOCOL_GO_BACK_N, fast_retransmit=True):
+    """
+     Coroutine version of PA2_sender.send_go_back_n; acks is the PacketQueue of the connection.
+     With protocol "saw" and a window of one this is stop-and-wait.
+
+     Output:
+        total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+        total_duplicate_ack, total_fast_retransmit (int)
+    """
+    return await run_sender(acks, writer, GoBackNSender(segments, packet_format, window_size, rto, protocol, fast_retransmit))
+
+
+async def send_selective_repeat(acks, writer, segments, window_size, rto, packet_format, fast_retransmit=True, fec=None):
+    """
+     Coroutine version of PA2_sender.send_selective_repeat; acks is the PacketQueue of the connection.
+     fec is an rdt_fec.ParityEncoder to follow the data with parity packets (default is None, none).
+
+     Output:
+        total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+        total_duplicate_ack, total_fast_retransmit (int)
+    """
+    return await run_sender(acks, writer, SelectiveRepeatSender(segments, packet_format, window_size, rto, fast_retransmit,
+                                                                fec))
+
+
+async def receive_packets(packets, writer, packet_format, protocol, window_size, sink,
+                          ack_every=DEFAULT_ACK_EVERY, ack_delay=DEFAULT_ACK_DELAY, fec=False):
+    """
+     Receives data packets from the PacketQueue packets until the peer closes, writing the
+     accepted payloads to sink in order and answering with ACKs like PA2_receiver.start_receiver,
+     through an rdt_core.RdtReceiver. With fec, selective repeat rebuilds segments from the
+     sender's parity packets.
+    """
+    clock = asyncio.get_running_loop().time
+    receiver = RdtReceiver(packet_format, protocol, window_size, ack_every, ack_delay, fec)
+    acks = []  # written together once no more packets are queued
+
+    while True:
+        if acks and not packets.pending():
+            writer.writelines(acks)
+            acks.clear()
+            await writer.drain()
+        try:
+            packet = await packets.get(None if receiver.deadline is None else receiver.deadline - clock())
+        except asyncio.TimeoutError:
+            acks += receiver.timer_expired(clock())  # the pending cumulative ACK is due
+            continue
+        if not packet:
+            return
+        new_acks, payloads = receiver.packet_received(packet, clock())
+        acks += new_acks
+        for payload in payloads:
+            sink.write(payload)
+
+
+async def start_sender_async(server_ip, server_port, connection_ID, loss_rate=0, corrupt_rate=0, max_delay=0, transmission_timeout=60,
+                             filename="declaration.txt", protocol=PROTOCOL_STOP_AND_WAIT, window_size=DEFAULT_WINDOW_SIZE,
+                             adaptive_timeout=False, stream=False, packet_format=FORMAT_TEXT, segment_size=DEFAULT_MSS,
+                             checksum_algorithm=None, fast_retransmit=True, congestion_control=False, offset=0, length=None,
+                             compression=None, fec=False, end_mark=False, verbose=False):
+    """
+     Coroutine version of PA2_sender.start_sender with the same arguments and the same result.
+     Stop-and-wait runs as Go-Back-N with a window of one. Statistics are only printed with verbose,
+     since many transfers usually share the process. With length, the length bytes of the file that
+     start at offset are sent instead (one stripe of rdt_striped.py), whatever stream is. With
+     end_mark, an empty segment follows the last one, so the receiver can tell the whole data
+     from data cut short by a failed sender.
+
+     Output:
+        (checksum_val, total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout)
+    """
+    checksum_val = "00000"
+    stats = (0, 0, 0, 0, 0, 0)
+
+    loss_rate = 0.0 if not (0.0 <= float(loss_rate) <= 1.0) else float(loss_rate)
+    corrupt_rate = 0.0 if not (0.0 <= float(corrupt_rate) <= 1.0) else float(corrupt_rate)
+    max_delay = 0 if not (0 <= int(max_delay) <= 5) else int(max_delay)
+    transmission_timeout = 3 if not (float(transmission_timeout) > 0) else float(transmission_timeout)
+    protocol = PROTOCOL_STOP_AND_WAIT if protocol not in PROTOCOLS else protocol
+    packet_format = FORMAT_TEXT if packet_format not in FORMATS else packet_format
+    segment_size = DEFAULT_MSS if not (1 <= int(segment_size) <= MAX_MSS) else int(segment_size)
+    checksum_algorithm = None if checksum_algorithm not in ALGORITHMS else checksum_algorithm
+    compression = None if compression not in COMPRESSIONS else compression
+    rto = RtoEstimator(transmission_timeout, adaptive=bool(adaptive_timeout))
+
+    # Parity packets are only of use to a receiver that buffers out of order segments
+    fec = bool(fec) and protocol == PROTOCOL_SELECTIVE_REPEAT
+    options = hello_options(packet_format, segment_size, checksum_algorithm, compression=compression, fec=fec)
+    connection = await establish_connection_async(server_ip, server_port, connection_ID, "S", loss_rate, corrupt_rate,
+                                                  max_delay, options)
+    if connection is None:
+        raise ConnectionError(f"Failed to establish connection {connection_ID}")
+    reader, writer = connection
+    packet_format = negotiated_format(options)
+
+    max_window = packet_format.max_window_size(protocol)
+    window_size = min(DEFAULT_WINDOW_SIZE, max_window) if not (1 <= int(window_size) <= max_window) else int(window_size)
+    if congestion_control and protocol != PROTOCOL_STOP_AND_WAIT:
+        window_size = CongestionWindow(window_size)
+
+    acks = PacketQueue(reader, packet_format)
+    try:
+        # Text packets accept bytes as well, so both formats read the file the same way
+        file_checksum = Checksum()
+        if length is None:
+            length = None if stream else 200
+        if negotiated_compression(options) is not None:
+            chunks = iter_file_segments(filename, file_checksum, CHUNK_SIZE, length, offset)
+            segments = compress_segments(chunks, negotiated_compression(options), packet_format.segment_size)
+        else:
+            segments = iter_file_segments(filename, file_checksum, packet_format.segment_size, length, offset)
+        if end_mark:
+            segments = itertools.chain(segments, [b''])
+        if protocol == PROTOCOL_SELECTIVE_REPEAT:
+            encoder = ParityEncoder(packet_format) if negotiated_fec(options) else None
+            stats = await send_selective_repeat(acks, writer, segments, window_size, rto, packet_format, fast_retransmit,
+                                                encoder)
+        else:
+            stats = await send_go_back_n(acks, writer, segments, window_size, rto, packet_format, protocol, fast_retransmit)
+        checksum_val = file_checksum.value
+    except (OSError, ConnectionError) as e:
+        print(f"An error occurred: {e}")
+    finally:
+        acks.close()
+        writer.close()
+
+    if verbose:
+        print("File checksum: {}".format(checksum_val))
+        print("Total packet sent: {}".format(stats[0]))
+        print("Total packet recv: {}".format(stats[1]))
+        print("Total corrupted packet recv: {}".format(stats[2]))
+        print("Total timeout: {}".format(stats[3]))
+        print("Total duplicate ACK recv: {}".format(stats[4]))
+        print("Total fast retransmit: {}".format(stats[5]))
+    return SenderStats((checksum_val, *stats[:4]), *stats[4:])
+
+
+async def start_receiver_async(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt_rate=0.0, max_delay=0.0,
+                               protocol=PROTOCOL_STOP_AND_WAIT, window_size=DEFAULT_WINDOW_SIZE, output=None,
+                               packet_format=FORMAT_TEXT, segment_size=DEFAULT_MSS, checksum_algorithm=None,
+                               ack_every=DEFAULT_ACK_EVERY, ack_delay=DEFAULT_ACK_DELAY, compression=None, fec=False,
+                               verbose=False):
+    """
+     Coroutine version of PA2_receiver.start_receiver with the same arguments and the same result.
+
+     Output:
+        checksum_val - the checksum value of the file received (String that always has 5 digits)
+    """
+    checksum_val = "00000"
+
+    loss_rate = 0.0 if not (0.0 <= float(loss_rate) <= 1.0) else float(loss_rate)
+    corrupt_rate = 0.0 if not (0.0 <= float(corrupt_rate) <= 1.0) else float(corrupt_rate)
+    max_delay = 0 if not (0 <= int(max_delay) <= 5) else int(max_delay)
+    protocol = PROTOCOL_STOP_AND_WAIT if protocol not in PROTOCOLS else protocol
+    packet_format = FORMAT_TEXT if packet_format not in FORMATS else packet_format
+    segment_size = DEFAULT_MSS if not (1 <= int(segment_size) <= MAX_MSS) else int(segment_size)
+    checksum_algorithm = None if checksum_algorithm not in ALGORITHMS else checksum_algorithm
+    compression = None if compression not in COMPRESSIONS else compression
+
+    fec = bool(fec) and protocol == PROTOCOL_SELECTIVE_REPEAT
+
+    sink = open_sink(output)
+    options = hello_options(packet_format, segment_size, checksum_algorithm, compression=compression, fec=fec)
+    try:
+        connection = await establish_connection_async(server_ip, server_port, connection_ID, "R", loss_rate, corrupt_rate,
+                                                      max_delay, options)
+    except BaseException:
+        sink.close()
+        raise
+    if connection is None:
+        sink.close()
+        raise ConnectionError(f"Failed to establish connection {connection_ID}")
+    reader, writer = connection
+    packet_format = negotiated_format(options)
+    if negotiated_compression(options) is not None:
+        sink = DecompressingSink(sink, negotiated_compression(options))
+
+    packets = PacketQueue(reader, packet_format)
+    try:
+        await receive_packets(packets, writer, packet_format, protocol, window_size, sink, ack_every, ack_delay,
+                              negotiated_fec(options))
+        sink.finish()
+        checksum_val = sink.checksum.value
+    except (OSError, ConnectionError) as e:
+        print(f"An error occurred: {e}")
+    finally:
+        packets.close()
+        writer.close()
+        sink.close()
+
+    if verbose:
+        print("File checksum: {}".format(checksum_val))
+    return checksum_val
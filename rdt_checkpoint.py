@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# Resumable transfers: the receiver keeps a checkpoint (bytes delivered so far and their checksum) next
+# to the partial output file, and when the same connection ID connects again both sides agree in the
+# handshake to continue from there instead of from byte zero
+
+import os
+import json
+from checksum import Checksum
+from rdt_io import CHUNK_SIZE, OutputSink, iter_file_segments
+
+CHECKPOINT_SUFFIX = ".ckpt"
+CHECKPOINT_INTERVAL = 256 * 1024  # bytes delivered between two checkpoints, besides the one on close
+
+
+def checkpoint_path(filename):
+    return filename + CHECKPOINT_SUFFIX
+
+
+class Checkpoint:
+    """ The first offset bytes of the output were received intact for connection_ID and sum to checksum """
+
+    def __init__(self, connection_ID, offset, checksum):
+        self.connection_ID = connection_ID
+        self.offset = offset
+        self.checksum = checksum
+
+    def __eq__(self, other):
+        return isinstance(other, Checkpoint) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return f"Checkpoint({self.connection_ID!r}, {self.offset}, {self.checksum})"
+
+
+def load_checkpoint(filename, connection_ID):
+    """
+     Returns the Checkpoint saved for the output file filename, or None if there is none, it
+     belongs to another connection ID, or the file is shorter than it says
+    """
+    try:
+        with open(checkpoint_path(filename)) as file:
+            saved = json.load(file)
+        checkpoint = Checkpoint(saved["connection_id"], int(saved["offset"]), int(saved["checksum"]))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if checkpoint.connection_ID != str(connection_ID) or not 0 <= checkpoint.offset <= os.path.getsize(filename):
+        return None
+    return checkpoint
+
+
+def save_checkpoint(filename, checkpoint):
+    """ Replaces the checkpoint of filename atomically, so a crash leaves the old one or the new one """
+    path = checkpoint_path(filename)
+    with open(path + ".tmp", 'w') as file:
+        json.dump({"connection_id": str(checkpoint.connection_ID), "offset": checkpoint.offset,
+                   "checksum": checkpoint.checksum}, file)
+    os.replace(path + ".tmp", path)
+
+
+def remove_checkpoint(filename):
+    try:
+        os.remove(checkpoint_path(filename))
+    except FileNotFoundError:
+        pass
+
+
+def prefix_checksum(filename, offset):
+    """ Returns a checksum.Checksum of the first offset bytes of the file, for a sender that resumes there """
+    running_checksum = Checksum()
+    for _ in iter_file_segments(filename, running_checksum, CHUNK_SIZE, offset):
+        pass
+    return running_checksum
+
+
+class ResumableSink(OutputSink):
+    """
+     Writes the received data to a file that may hold the start of an interrupted transfer.
+     offset is where the saved checkpoint says to continue; nothing in the file changes until
+     start() is called with the offset agreed in the handshake and, when the transfer resumes,
+     the sender's first segment says where it continues from. From then on a checkpoint is
+     saved every interval bytes and on close. An empty write is the sender's end-of-file mark:
+     the transfer is complete and close removes the checkpoint.
+    """
+
+    def __init__(self, filename, connection_ID, interval=CHECKPOINT_INTERVAL):
+        super().__init__()
+        self.filename = filename
+        self.connection_ID = connection_ID
+        self.interval = interval
+        self.checkpoint = load_checkpoint(filename, connection_ID)
+        self.offset = self.checkpoint.offset if self.checkpoint is not None else 0
+        self.saved = self.offset
+        self.enabled = False  # checkpoints are only kept once start() agreed to resume
+        self.awaiting_offset = False  # the next segment is the offset the sender continues from
+        self.complete = False
+        self.file = open(filename, 'r+b' if os.path.exists(filename) else 'w+b', buffering=CHUNK_SIZE)
+
+    @property
+    def position(self):
+        """ Size of the file received so far, resumed part included """
+        return self.offset + self.bytes_written
+
+    @property
+    def interrupted(self):
+        """ The transfer stopped before the sender's end-of-file mark; the checkpoint is kept """
+        return self.enabled and not self.complete
+
+    def start(self, offset):
+        """
+         Takes the offset agreed in the handshake. None means the sender does not resume: the file
+         starts over and no checkpoint is kept. Otherwise the sender's first segment holds the
+         offset it continues from: the agreed one, or 0 if its file no longer matches the checksum
+         of the checkpoint, and the file is truncated there when it arrives.
+        """
+        self.enabled = offset is not None
+        if offset is None:
+            remove_checkpoint(self.filename)
+            self.resume_at(0)
+        else:
+            self.awaiting_offset = True
+
+    def resume_at(self, offset):
+        """ Truncates the file to offset, at most the checkpoint's, and restores the checksum of what stays """
+        if self.checkpoint is not None and offset == self.checkpoint.offset:
+            self.checksum.total = self.checkpoint.checksum
+        else:
+            self.file.seek(0)
+            remaining = offset
+            while remaining > 0:
+                chunk = self.file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                self.checksum.update(chunk)
+                remaining -= len(chunk)
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.offset = self.saved = offset
+
+    def write(self, data):
+        if self.awaiting_offset:
+            self.awaiting_offset = False
+            self.resume_at(int(bytes(data)))
+            return
+        if not len(data):
+            self.complete = True
+            return
+        super().write(data)
+        if self.enabled and self.position - self.saved >= self.interval:
+            self.save()
+
+    def _write(self, data):
+        self.file.write(data)
+
+    def save(self):
+        """ Makes the data durable, then records it in the checkpoint """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        save_checkpoint(self.filename, Checkpoint(self.connection_ID, self.position, self.checksum.total))
+        self.saved = self.position
+
+    def close(self):
+        if self.enabled and self.complete:
+            remove_checkpoint(self.filename)
+        elif self.enabled and not self.awaiting_offset:  # until then the file and the old checkpoint are untouched
+            self.save()
+        self.file.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Codec of the course's 30-byte text packet, "<seq> <ack> <20 bytes of data> <5-digit checksum>", working on
+# bytes only: every ACK is built once and cached, a data packet is formatted straight into its final bytes
+# object from preallocated padding, and incoming packets are checked at fixed byte offsets, without
+# split() or str decoding.
+# rdt_packet.TextFormat and the stop-and-wait loop of PA2_sender.py encode and decode through it.
+
+import string
+from checksum import compute, SUM
+
+# The sequence number travels in a single character of the packet, so the
+# pipelined protocols use every alphanumeric character instead of just "0"/"1".
+SEQ_CHARS = string.digits + string.ascii_uppercase + string.ascii_lowercase
+SEQ_MODULUS = len(SEQ_CHARS)
+
+# Fills the data field of the last, shorter segment of a file. The receiver does not strip it by
+# content, since the file may hold the same byte: the unused ACK field of a data packet says how
+# much of the field is data, "0" for a full segment as in the course's packets, "1" to "K" for 0 to 19 bytes
+PAD_CHAR = "\0"
+
+TEXT_PACKET_SIZE = 30
+TEXT_SEGMENT_SIZE = 20
+
+# Byte offsets of the fields: sequence (window in ACKs), ACK number, data, checksum
+SEQ_OFFSET = 0
+ACK_OFFSET = 2
+DATA_OFFSET = 4
+DATA_END = DATA_OFFSET + TEXT_SEGMENT_SIZE
+CHECKSUM_OFFSET = TEXT_PACKET_SIZE - 5
+
+SEQ_BYTES = SEQ_CHARS.encode('ascii')
+SEQ_VALUES = [SEQ_BYTES.find(byte) for byte in range(256)]  # byte -> sequence number, -1 if it is not one
+LENGTH_MARKS = SEQ_BYTES[1:TEXT_SEGMENT_SIZE + 1] + b"0"  # data length -> byte in the ACK field of a data packet
+LENGTHS = [LENGTH_MARKS.find(byte) for byte in range(256)]  # byte -> data length, -1 if it is not a length mark
+PADDING = [PAD_CHAR.encode() * (TEXT_SEGMENT_SIZE - length) for length in range(TEXT_SEGMENT_SIZE + 1)]  # by data length
+
+
+class TextCodec:
+    """
+     Encodes and decodes text packets with the given per-packet checksum algorithm ("sum" or "inet").
+     Packets come in as bytes, bytearray or memoryview and go out as bytes.
+    """
+
+    def __init__(self, algorithm=SUM):
+        self.algorithm = algorithm
+        # With the byte sum, the NUL padding adds nothing and the separators always add the same
+        self._separators = sum(b"   ")
+        self._acks = {}  # (ack_num, window) -> ACK packet
+        for ack_num in range(SEQ_MODULUS):
+            self.ack_packet(ack_num)  # the ones without a window, which is every ACK of stop-and-wait and Go-Back-N
+
+    def _checksum(self, packet):
+        return b"%05d" % compute(packet[:CHECKSUM_OFFSET], self.algorithm)
+
+    def ack_packet(self, ack_num, window=None):
+        """ ACK of ack_num; window, if given, goes in the otherwise unused sequence field """
+        key = (ack_num, window)
+        packet = self._acks.get(key)
+        if packet is None:
+            window_char = b" " if window is None else SEQ_CHARS[window % SEQ_MODULUS].encode()
+            ack_char = SEQ_CHARS[ack_num % SEQ_MODULUS].encode()
+            packet = window_char + b" " + ack_char + b" " + b" " * TEXT_SEGMENT_SIZE + b" "  # Data field is blank in ACKs
+            packet = self._acks[key] = packet + self._checksum(packet)
+        return packet
+
+    def data_packet(self, seq_num, data):
+        """ Data packet carrying up to 20 bytes (or ASCII characters), padded with PAD_CHAR and marked with its length """
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        if len(data) > TEXT_SEGMENT_SIZE:
+            raise ValueError(f"a text packet carries at most {TEXT_SEGMENT_SIZE} bytes, not {len(data)}")
+        seq_byte = SEQ_BYTES[seq_num % SEQ_MODULUS]
+        length_mark = LENGTH_MARKS[len(data)]
+        if self.algorithm == SUM:
+            # One formatting operation writes the whole packet, checksum included
+            return b"%c %c %b%b %05d" % (seq_byte, length_mark, data, PADDING[len(data)],
+                                         self._separators + seq_byte + length_mark + sum(data))
+        packet = b"%c %c %b%b " % (seq_byte, length_mark, data, PADDING[len(data)])
+        return packet + self._checksum(packet)
+
+    def _valid(self, packet):
+        """ The packet as bytes if its length and checksum are right, else None """
+        packet = bytes(packet)  # one 30-byte copy: summing and slicing bytes is faster than a memoryview
+        if len(packet) != TEXT_PACKET_SIZE:
+            return None
+        if self.algorithm == SUM:
+            total = sum(packet[:CHECKSUM_OFFSET])
+        else:
+            total = compute(packet[:CHECKSUM_OFFSET], self.algorithm)
+        return packet if b"%05d" % total == packet[CHECKSUM_OFFSET:] else None
+
+    def verify(self, packet):
+        """ Same check as checksum.checksum_verifier, on bytes and with the codec's algorithm """
+        return self._valid(packet) is not None
+
+    def parse_data(self, packet):
+        """
+         Returns (seq_num, payload) of a valid data packet, seq_num is -1 if unreadable; None if
+         corrupted or without a length mark
+        """
+        packet = self._valid(packet)
+        if packet is None:
+            return None
+        length = LENGTHS[packet[ACK_OFFSET]]
+        if length < 0:
+            return None
+        return SEQ_VALUES[packet[SEQ_OFFSET]], packet[DATA_OFFSET:DATA_OFFSET + length]
+
+    def ack_number(self, packet):
+        """ The ACK number field (-1 if unreadable), without checking the packet """
+        return SEQ_VALUES[packet[ACK_OFFSET]]
+
+    def parse_ack(self, packet):
+        """ Returns the acknowledged sequence number (-1 if unreadable), or None if corrupted """
+        packet = self._valid(packet)
+        return None if packet is None else SEQ_VALUES[packet[ACK_OFFSET]]
+
+    def ack_window(self, packet):
+        """ Returns the receive window advertised by an ACK, or None if it carries none """
+        window = SEQ_VALUES[packet[SEQ_OFFSET]]
+        return window if window >= 1 else None
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# Streaming payload compression: the sender compresses the file before cutting it into segments and the
+# receiver decompresses the in-order payloads as they are delivered. Both file checksums stay on the
+# original bytes.
+
+import lzma
+import zlib
+from rdt_io import OutputSink
+
+ZLIB = "zlib"
+LZMA = "lzma"
+COMPRESSIONS = (ZLIB, LZMA)
+ZLIB_LEVEL = 6
+
+
+def new_compressor(algorithm):
+    if algorithm == ZLIB:
+        return zlib.compressobj(ZLIB_LEVEL)
+    if algorithm == LZMA:
+        return lzma.LZMACompressor()
+    raise ValueError(f"unknown compression: {algorithm}")
+
+
+def new_decompressor(algorithm):
+    if algorithm == ZLIB:
+        return zlib.decompressobj()
+    if algorithm == LZMA:
+        return lzma.LZMADecompressor()
+    raise ValueError(f"unknown compression: {algorithm}")
+
+
+def compress_segments(chunks, algorithm, segment_size):
+    """
+     Compresses the bytes chunks of a file as one stream and yields it in segments of
+     segment_size bytes (the last one may be shorter), as soon as the compressor produces them
+    """
+    compressor = new_compressor(algorithm)
+    pending = bytearray()
+    for chunk in chunks:
+        pending += compressor.compress(chunk)
+        while len(pending) >= segment_size:
+            yield bytes(pending[:segment_size])
+            del pending[:segment_size]
+    pending += compressor.flush()
+    for offset in range(0, len(pending), segment_size):
+        yield bytes(pending[offset:offset + segment_size])
+
+
+class TruncatedStreamError(ConnectionError):
+    """ The transfer ended before the end of the compressed stream, or carried data after it """
+
+
+class DecompressingSink(OutputSink):
+    """
+     Receives the compressed stream in order and writes the decompressed bytes to sink, so that
+     checksum is the one of the original file. bytes_written counts the compressed bytes.
+    """
+
+    def __init__(self, sink, algorithm):
+        self.sink = sink
+        self.decompressor = new_decompressor(algorithm)
+        self.bytes_written = 0
+
+    @property
+    def checksum(self):
+        return self.sink.checksum
+
+    def write(self, data):
+        if self.decompressor.eof:
+            raise TruncatedStreamError("data after the end of the compressed stream")
+        self.sink.write(self.decompressor.decompress(data))
+        self.bytes_written += len(data)
+
+    def finish(self):
+        """ The decompressed data is only the whole file if the compressed stream reached its end """
+        if not self.decompressor.eof:
+            raise TruncatedStreamError(f"compressed stream ended after {self.bytes_written} bytes, before its end")
+        if self.decompressor.unused_data:
+            raise TruncatedStreamError(f"{len(self.decompressor.unused_data)} bytes after the end of the compressed stream")
+        self.sink.finish()
+
+    def close(self):
+        self.sink.close()
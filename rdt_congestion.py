@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# AIMD congestion window for the pipelined senders, bounded by the window the receiver advertises
+
+INITIAL_WINDOW = 1  # packets in flight when a transfer starts
+MIN_SSTHRESH = 2
+
+
+class CongestionWindow:
+    """
+     TCP-style congestion control counted in packets:
+        slow start - the window grows by one packet per acknowledged packet (doubling every RTT)
+                     until it reaches ssthresh,
+        congestion avoidance - then by one packet per window's worth of ACKs (additive increase),
+        fast retransmit - halves the window (multiplicative decrease),
+        timeout - halves ssthresh and restarts slow start from INITIAL_WINDOW.
+     window is never larger than max_window (the sender's own limit) nor than the window the
+     receiver last advertised.
+    """
+
+    def __init__(self, max_window, ssthresh=None):
+        self.max_window = max(int(max_window), 1)
+        self.cwnd = float(INITIAL_WINDOW)
+        self.ssthresh = float(ssthresh if ssthresh is not None else self.max_window)
+        self.receiver_window = None  # packets the receiver can take, once it advertised it
+
+    @property
+    def window(self):
+        """ Packets the sender may have in flight right now """
+        window = min(int(self.cwnd), self.max_window)
+        if self.receiver_window is not None:
+            window = min(window, self.receiver_window)
+        return max(window, 1)
+
+    def on_ack(self, acked=1):
+        """ Grows the window for acked newly acknowledged packets """
+        for _ in range(acked):
+            if self.cwnd < self.ssthresh:
+                self.cwnd += 1
+            else:
+                self.cwnd += 1 / self.cwnd
+        self.cwnd = min(self.cwnd, float(self.max_window))
+
+    def on_fast_retransmit(self):
+        self.ssthresh = max(self.cwnd / 2, MIN_SSTHRESH)
+        self.cwnd = self.ssthresh
+
+    def on_timeout(self):
+        self.ssthresh = max(self.cwnd / 2, MIN_SSTHRESH)
+        self.cwnd = float(INITIAL_WINDOW)
+
+    def advertise(self, receiver_window):
+        """ Records the receive window carried by an ACK (None if the ACK did not carry one) """
+        if receiver_window is not None:
+            self.receiver_window = max(int(receiver_window), 1)
+
+
+class FixedWindow(CongestionWindow):
+    """ A constant window of max_window packets, still bounded by the receiver's advertised window """
+
+    def __init__(self, max_window):
+        super().__init__(max_window)
+        self.cwnd = float(self.max_window)
+
+    def on_ack(self, acked=1):
+        pass
+
+    def on_fast_retransmit(self):
+        pass
+
+    def on_timeout(self):
+        pass
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# Connection manager shared by the endpoints: the HELLO/WAITING/OK/ERROR handshake with retries,
+# a deadline and responses that arrive in fragments, and a pool of connections established ahead of time
+
+import time
+import random
+import select
+import socket
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from rdt_packet import format_options, parse_options
+
+CONNECTION_TIMEOUT = 60  # seconds to wait for the relay to pair us with the other client
+DEFAULT_RETRIES = 5  # new attempts after the relay could not be reached or hung up mid-handshake
+BACKOFF_BASE = 0.1  # seconds, the longest wait before the first retry
+BACKOFF_MAX = 5.0  # seconds, the longest wait before any retry
+RESPONSES = (b"WAITING", b"OK", b"ERROR")
+LINE_ENDS = b"\r\n"
+
+
+class HandshakeError(ConnectionError):
+    """ The relay refused the connection or answered something that is not a handshake response """
+
+
+def hello_message(connection_ID, role, loss_rate, corrupt_rate, max_delay, options=None):
+    message = f"HELLO {role} {loss_rate} {corrupt_rate} {max_delay} {connection_ID}"
+    if options:
+        # Clients that negotiate end HELLO with a newline, as the relay does its answers to them
+        message += " " + format_options(options) + "\n"
+    return message.encode()
+
+
+def parse_response(buffer, lines):
+    """
+     Finds the first handshake response in buffer, the bytes received so far. Line ends left over
+     from a previous response are skipped. Clients that negotiated options (lines=True) get one
+     response per line; the others get bare keywords, and packets may follow OK right away.
+
+     Output:
+        (response, size) once the whole response arrived, size being the bytes of buffer it takes up,
+        or None while it is still incomplete; raises HandshakeError if it cannot be a response
+    """
+    message = buffer.lstrip(LINE_ENDS)
+    start = len(buffer) - len(message)
+    keyword = next((response for response in RESPONSES if message.startswith(response)), None)
+    if keyword is None:
+        if any(response.startswith(message) for response in RESPONSES):
+            return None
+        raise HandshakeError(f"Unexpected response: {bytes(message)!r}")
+    if lines or keyword == b"ERROR":
+        end = message.find(b"\n")
+        if end < 0:
+            return None
+        size = end + 1
+    else:
+        size = len(keyword)
+    return bytes(message[:size]).strip().decode(errors="replace"), start + size
+
+
+def backoff_delay(attempt, rng=random):
+    """ Seconds to wait before retry number attempt (from 0): exponential backoff with full jitter """
+    return rng.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def recv_response(sock, lines, deadline):
+    """ Reads one handshake response byte by byte, so that no packet sent right after OK is consumed """
+    buffer = b''
+    while True:
+        parsed = parse_response(buffer, lines)
+        if parsed is not None:
+            return parsed[0]
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("no response from the relay before the handshake deadline")
+        sock.settimeout(remaining)
+        byte = sock.recv(1)
+        if not byte:
+            if buffer.lstrip(LINE_ENDS).startswith(b"ERROR"):
+                return buffer.strip().decode(errors="replace")  # ERROR and hang up, without a line end
+            raise ConnectionResetError("the relay closed the connection during the handshake")
+        buffer += byte
+
+
+def discard_line_end(sock):
+    """ Drops a line end the relay may have sent after a bare OK, if it already arrived """
+    if not select.select([sock], [], [], 0)[0]:
+        return
+    pending = sock.recv(len(LINE_ENDS), socket.MSG_PEEK)
+    count = len(pending) - len(pending.lstrip(LINE_ENDS))
+    if count:
+        sock.recv(count)
+
+
+def handshake(server_ip, server_port, message, options, deadline):
+    """ One connection attempt: returns the connected socket once the relay says OK """
+    sock = socket.create_connection((server_ip, server_port), timeout=max(deadline - time.monotonic(), 0.001))
+    try:
+        sock.sendall(message)
+        while True:
+            response = recv_response(sock, bool(options), deadline)
+            if response.startswith("OK"):
+                if options:
+                    # An option only one side asked for is absent from the agreed ones
+                    agreed = parse_options(response)
+                    options.clear()
+                    options.update(agreed)
+                else:
+                    discard_line_end(sock)
+                sock.settimeout(None)
+                return sock
+            if response.startswith("ERROR"):
+                raise HandshakeError(response)
+            print("Waiting for the other client to connect.")
+    except BaseException:
+        sock.close()
+        raise
+
+
+def establish_connection(server_ip, server_port, connection_ID, role, loss_rate, corrupt_rate, max_delay, options=None,
+                         timeout=CONNECTION_TIMEOUT, retries=DEFAULT_RETRIES):
+    """
+     Establishes a connection to the relay (gaia.cs.umass.edu or rdt_relay.py) and waits until it is
+     paired with the other client. If the relay cannot be reached or hangs up before answering, the
+     attempt is repeated up to retries times after a jittered exponential backoff. The whole handshake,
+     retries included, must finish within timeout seconds.
+
+     Input:
+        options - dict of KEY=value HELLO options to negotiate (only the local rdt_relay.py understands them);
+                  it is replaced in place by the values both sides agreed on
+
+     Output:
+        the connected socket, or None if the relay refused the connection or the deadline passed
+    """
+    deadline = time.monotonic() + float(timeout)
+    message = hello_message(connection_ID, role, loss_rate, corrupt_rate, max_delay, options)
+    attempt = 0
+    while True:
+        try:
+            sock = handshake(server_ip, server_port, message, options, deadline)
+            print("Connection Established with ID:", connection_ID)
+            return sock
+        except HandshakeError as e:
+            print("Error received from server:", e)
+            return None
+        except socket.timeout:
+            print(f"No connection with ID {connection_ID} within {timeout} seconds")
+            return None
+        except OSError as e:
+            print(f"Failed to connect to server: {e}")
+        except KeyboardInterrupt:
+            return None
+        delay = backoff_delay(attempt)
+        if attempt >= retries or time.monotonic() + delay >= deadline:
+            return None
+        attempt += 1
+        time.sleep(delay)
+
+
+async def read_response(reader, lines):
+    """ Coroutine version of recv_response; StreamReader keeps whatever follows the response buffered """
+    buffer = b''
+    while True:
+        parsed = parse_response(buffer, lines)
+        if parsed is not None:
+            return parsed[0]
+        byte = await reader.read(1)
+        if not byte:
+            if buffer.lstrip(LINE_ENDS).startswith(b"ERROR"):
+                return buffer.strip().decode(errors="replace")
+            raise ConnectionResetError("the relay closed the connection during the handshake")
+        buffer += byte
+
+
+async def handshake_async(server_ip, server_port, message, options):
+    reader, writer = await asyncio.open_connection(server_ip, server_port)
+    try:
+        writer.write(message)
+        while True:
+            response = await read_response(reader, bool(options))
+            if response.startswith("OK"):
+                if options:
+                    agreed = parse_options(response)
+                    options.clear()
+                    options.update(agreed)
+                return reader, writer
+            if response.startswith("ERROR"):
+                raise HandshakeError(response)
+    except BaseException:
+        writer.close()
+        raise
+
+
+async def establish_connection_async(server_ip, server_port, connection_ID, role, loss_rate, corrupt_rate, max_delay,
+                                     options=None, timeout=CONNECTION_TIMEOUT, retries=DEFAULT_RETRIES):
+    """
+     Same handshake, retries and deadline as establish_connection over asyncio streams.
+     Returns (reader, writer), or None if the relay refused the connection or the deadline passed.
+    """
+    deadline = time.monotonic() + float(timeout)
+    message = hello_message(connection_ID, role, loss_rate, corrupt_rate, max_delay, options)
+    attempt = 0
+    while True:
+        try:
+            return await asyncio.wait_for(handshake_async(server_ip, server_port, message, options),
+                                          max(deadline - time.monotonic(), 0))
+        except HandshakeError as e:
+            print("Error received from server:", e)
+            return None
+        except asyncio.TimeoutError:
+            print(f"No connection with ID {connection_ID} within {timeout} seconds")
+            return None
+        except OSError as e:
+            print(f"Failed to connect to server: {e}")
+        delay = backoff_delay(attempt)
+        if attempt >= retries or time.monotonic() + delay >= deadline:
+            return None
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+class ConnectionPool:
+    """
+     Connections whose handshake runs ahead of time in background threads, keyed by
+     (connection_ID, role), so that a transfer starts the moment it is asked for instead of
+     waiting for the relay and the peer. The relay pairs a connection for a single transfer,
+     so acquire() hands a connection over and forgets it; prepare() again for the next one.
+    """
+
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.lock = threading.Lock()
+        self.pending = {}  # (connection_ID, role) -> (future of the socket, options)
+
+    def prepare(self, server_ip, server_port, connection_ID, role, loss_rate=0, corrupt_rate=0, max_delay=0, options=None,
+                timeout=CONNECTION_TIMEOUT):
+        """ Starts establishing a connection; options are the HELLO options the transfer will use """
+        options = dict(options) if options else None
+        key = (connection_ID, role)
+        with self.lock:
+            if key in self.pending:
+                raise ValueError(f"a connection for {key} is already prepared")
+            future = self.executor.submit(establish_connection, server_ip, server_port, connection_ID, role,
+                                          loss_rate, corrupt_rate, max_delay, options, timeout)
+            self.pending[key] = (future, options)
+
+    def acquire(self, connection_ID, role, timeout=None):
+        """
+         Returns (socket, agreed options) of the connection prepared for connection_ID and role,
+         waiting up to timeout seconds for its handshake; None if there is none or it failed
+        """
+        with self.lock:
+            entry = self.pending.pop((connection_ID, role), None)
+        if entry is None:
+            return None
+        future, options = entry
+        sock = future.result(timeout)
+        return None if sock is None else (sock, options)
+
+    def close(self):
+        """ Closes every connection that was not acquired, once its handshake is over """
+        with self.lock:
+            entries = list(self.pending.values())
+            self.pending.clear()
+        for future, _ in entries:
+            future.add_done_callback(lambda done: done.result() and done.result().close())
+        self.executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# Protocol core without I/O: the sender and receiver state machines of stop-and-wait, Go-Back-N and
+# selective repeat. They are fed events (a packet arrived, the timer fired) together with the current
+# time, and return the packets to send; the caller owns the socket, the clock and the timer.
+# PA2_sender.py and PA2_receiver.py drive them over blocking sockets, rdt_async.py over asyncio
+# streams, and rdt_sim.py through rdt_async.py in virtual time.
+
+from rdt_packet import PROTOCOL_GO_BACK_N, PROTOCOL_SELECTIVE_REPEAT, DEFAULT_WINDOW_SIZE
+from rdt_congestion import CongestionWindow, FixedWindow
+from rdt_fec import DEFAULT_CAPACITY, ParityDecoder, NullParityEncoder, NullParityDecoder
+from rdt_ack import DelayedAck, DEFAULT_ACK_EVERY, DEFAULT_ACK_DELAY, DUP_ACK_THRESHOLD
+
+
+class RdtSender:
+    """
+     Base of the sender state machines; segments is an iterable of payloads, sent in order.
+     start() returns the first burst of packets. After that, ack_received() with every packet
+     from the receiver and timer_expired() once deadline has passed return the packets to send
+     next, retransmissions first. done is True once every segment is acknowledged.
+     window_size is a number of packets or an rdt_congestion.CongestionWindow that adapts it
+     to losses; either way it never exceeds the window the receiver advertises in its ACKs.
+    """
+
+    def __init__(self, segments, packet_format, modulus, window_size, rto, fast_retransmit=True):
+        self.packet_format = packet_format
+        self.modulus = modulus
+        self.congestion = window_size if isinstance(window_size, CongestionWindow) else FixedWindow(window_size)
+        self.segments = iter(segments)
+        self.rto = rto
+        self.fast_retransmit = fast_retransmit
+        self.packets = {}  # index -> packet, for every unacknowledged segment
+        self.base = 0  # index of the oldest unacknowledged segment
+        self.next_index = 0  # index of the next segment to send for the first time
+        self.total_packet_sent = 0
+        self.total_packet_recv = 0
+        self.total_corrupted_pkt_recv = 0
+        self.total_timeout = 0
+        self.total_duplicate_ack = 0
+        self.total_fast_retransmit = 0
+
+    @property
+    def done(self):
+        return self.base == self.next_index
+
+    @property
+    def deadline(self):
+        """ Time at which timer_expired() is due, None once done """
+        raise NotImplementedError
+
+    def stats(self):
+        """
+         Output:
+            total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout,
+            total_duplicate_ack, total_fast_retransmit (int)
+        """
+        return (self.total_packet_sent, self.total_packet_recv, self.total_corrupted_pkt_recv, self.total_timeout,
+                self.total_duplicate_ack, self.total_fast_retransmit)
+
+    def start(self, now):
+        return self._fill([], now)
+
+    def ack_received(self, packet, now):
+        """ Handles one packet from the receiver, which may be corrupted or not an ACK at all """
+        self.total_packet_recv += 1
+        burst = []
+        ack_seq = self.packet_format.parse_ack(packet)
+        if ack_seq is None:
+            self.total_corrupted_pkt_recv += 1
+        elif ack_seq >= 0:
+            self.congestion.advertise(self.packet_format.ack_window(packet))
+            self._acknowledge(ack_seq, packet, burst, now)
+        return self._fill(burst, now)
+
+    def timer_expired(self, now):
+        self.total_timeout += 1
+        self.rto.backoff()
+        self.congestion.on_timeout()
+        return self._fill(self._retransmit(now), now)
+
+    def _fill(self, burst, now):
+        """ Appends to burst the new packets that the window lets out, and returns it """
+        raise NotImplementedError
+
+    def _acknowledge(self, ack_seq, packet, burst, now):
+        raise NotImplementedError
+
+    def _retransmit(self, now):
+        raise NotImplementedError
+
+
+class GoBackNSender(RdtSender):
+    """
+     Go-Back-N: the receiver acknowledges cumulatively and a timeout resends every unacknowledged
+     packet. With protocol "saw" and a window of one this is stop-and-wait, numbered in the
+     alternating-bit sequence space the receiver expects. With fast_retransmit, DUP_ACK_THRESHOLD
+     duplicate ACKs resend the window without waiting for the timer.
+    """
+
+    def __init__(self, segments, packet_format, window_size, rto, protocol=PROTOCOL_GO_BACK_N, fast_retransmit=True):
+        super().__init__(segments, packet_format, packet_format.seq_modulus(protocol), window_size, rto, fast_retransmit)
+        self.timer_start = None
+        self.first_sent_at = {}  # index -> send time, only for packets that were never retransmitted
+        self.duplicate_run = 0  # duplicate ACKs in a row for the current base
+
+    @property
+    def deadline(self):
+        return None if self.done else self.timer_start + self.rto.timeout
+
+    def _fill(self, burst, now):
+        while self.next_index < self.base + self.congestion.window:
+            segment = next(self.segments, None)
+            if segment is None:
+                break
+            self.packets[self.next_index] = self.packet_format.data_packet(self.next_index % self.modulus, segment)
+            burst.append(self.packets[self.next_index])
+            self.total_packet_sent += 1
+            self.first_sent_at[self.next_index] = now
+            if self.base == self.next_index:
+                self.timer_start = now
+            self.next_index += 1
+        return burst
+
+    def _send_again(self, burst, now):
+        """ Go back N: resends everything that is still in flight """
+        for i in range(self.base, self.next_index):
+            burst.append(self.packets[i])
+            self.total_packet_sent += 1
+            self.first_sent_at.pop(i, None)  # Karn's rule: no RTT samples from retransmitted packets
+        self.timer_start = now
+
+    def _retransmit(self, now):
+        burst = []
+        self._send_again(burst, now)
+        return burst
+
+    def _acknowledge(self, ack_seq, packet, burst, now):
+        # The window is smaller than the sequence space, so the distance from base is unambiguous
+        acked = (ack_seq - self.base) % self.modulus
+        if acked < self.next_index - self.base:
+            if self.base + acked in self.first_sent_at:
+                self.rto.sample(now - self.first_sent_at[self.base + acked])
+            for i in range(self.base, self.base + acked + 1):
+                self.first_sent_at.pop(i, None)
+                del self.packets[i]
+            self.base += acked + 1
+            self.timer_start = now
+            self.duplicate_run = 0
+            self.congestion.on_ack(acked + 1)
+        elif acked == self.modulus - 1:
+            # The receiver acknowledged base - 1 again: something after a gap reached it
+            self.total_duplicate_ack += 1
+            self.duplicate_run += 1
+            if self.fast_retransmit and self.duplicate_run == DUP_ACK_THRESHOLD:
+                self.total_fast_retransmit += 1
+                self.congestion.on_fast_retransmit()
+                self._send_again(burst, now)
+
+
+class SelectiveRepeatSender(RdtSender):
+    """
+     Selective Repeat: the receiver acknowledges each packet individually and every packet has its
+     own timer, so only the packets that were actually lost are sent again. With fast_retransmit,
+     the oldest packet is resent as soon as DUP_ACK_THRESHOLD packets after it are acknowledged.
+     fec is an rdt_fec.ParityEncoder: every group of segments is then followed by a parity packet
+     from which the receiver can rebuild one lost segment of the group without a retransmission.
+    """
+
+    def __init__(self, segments, packet_format, window_size, rto, fast_retransmit=True, fec=None):
+        super().__init__(segments, packet_format, packet_format.seq_modulus(PROTOCOL_SELECTIVE_REPEAT), window_size, rto,
+                         fast_retransmit)
+        self.fec = NullParityEncoder() if fec is None else fec
+        self.sent_at = {}  # index -> time of the last transmission, for every unacknowledged packet
+        self.retransmitted = set()  # Karn's rule: no RTT samples from these
+        self.acked = set()  # indexes acknowledged ahead of base
+
+    @property
+    def deadline(self):
+        return None if self.done else min(self.sent_at.values()) + self.rto.timeout
+
+    def _fill(self, burst, now):
+        while self.next_index < self.base + self.congestion.window:
+            segment = next(self.segments, None)
+            if segment is None:
+                parity = self.fec.flush()  # the last group may be short
+            else:
+                self.packets[self.next_index] = self.packet_format.data_packet(self.next_index % self.modulus, segment)
+                burst.append(self.packets[self.next_index])
+                self.total_packet_sent += 1
+                self.sent_at[self.next_index] = now
+                parity = self.fec.add(self.next_index % self.modulus, segment)
+                self.next_index += 1
+            if parity is not None:
+                burst.append(parity)  # never retransmitted, it has no timer
+                self.total_packet_sent += 1
+            if segment is None:
+                break
+        return burst
+
+    def _send_again(self, index, burst, now):
+        burst.append(self.packets[index])
+        self.total_packet_sent += 1
+        self.sent_at[index] = now
+        self.retransmitted.add(index)
+
+    def _retransmit(self, now):
+        # Only the packet whose timer fired is sent again
+        burst = []
+        self._send_again(min(self.sent_at, key=self.sent_at.get), burst, now)
+        return burst
+
+    def _acknowledge(self, ack_seq, packet, burst, now):
+        offset = (ack_seq - self.base) % self.modulus
+        if offset >= self.next_index - self.base or self.base + offset in self.acked:
+            self.total_duplicate_ack += 1  # acknowledged already, the first ACK or the window slid past it
+            return
+        index = self.base + offset
+        if index in self.sent_at and index not in self.retransmitted:
+            self.rto.sample(now - self.sent_at[index])
+        # Adapts the parity group size
+        self.fec.observe(index in self.retransmitted or self.packet_format.ack_recovered(packet))
+        self.sent_at.pop(index, None)
+        self.acked.add(index)
+        self.congestion.on_ack()
+        while self.base in self.acked:
+            self.acked.discard(self.base)
+            self.retransmitted.discard(self.base)
+            del self.packets[self.base]
+            self.base += 1
+        # The parity of its group may still rebuild base, so FEC waits for a group more
+        if (self.fast_retransmit and len(self.acked) >= DUP_ACK_THRESHOLD + self.fec.group_size
+                and self.base not in self.retransmitted):
+            # Packets after base keep arriving while base does not: resend it now
+            self.total_fast_retransmit += 1
+            self.congestion.on_fast_retransmit()
+            self._send_again(self.base, burst, now)
+
+
+def make_sender(segments, packet_format, protocol, window_size, rto, fast_retransmit=True, fec=None):
+    """ Returns the RdtSender of protocol; fec (an rdt_fec.ParityEncoder) only applies to selective repeat """
+    if protocol == PROTOCOL_SELECTIVE_REPEAT:
+        return SelectiveRepeatSender(segments, packet_format, window_size, rto, fast_retransmit, fec)
+    return GoBackNSender(segments, packet_format, window_size, rto, protocol, fast_retransmit)
+
+
+class RdtReceiver:
+    """
+     The receiver state machine of every protocol. packet_received() takes each packet from the
+     sender and returns (acks, payloads): the ACK packets to send and the payloads delivered in
+     order, possibly none of either. With Go-Back-N, in-order packets are acknowledged after
+     ack_every of them or ack_delay seconds, whichever comes first: timer_expired() is then due
+     at deadline and returns the pending cumulative ACK. With fec, selective repeat rebuilds
+     segments from the sender's parity packets.
+    """
+
+    def __init__(self, packet_format, protocol, window_size=DEFAULT_WINDOW_SIZE, ack_every=DEFAULT_ACK_EVERY,
+                 ack_delay=DEFAULT_ACK_DELAY, fec=False):
+        self.packet_format = packet_format
+        self.selective = protocol == PROTOCOL_SELECTIVE_REPEAT
+        self.modulus = packet_format.seq_modulus(protocol)
+        self.expected_seq_num = 0
+        self.last_ack_sent = self.modulus - 1
+        # Validate and set default for the Selective Repeat receive window
+        window_size = DEFAULT_WINDOW_SIZE if not (1 <= int(window_size) <= packet_format.max_window_size(protocol)) else int(window_size)
+        self.window_size = window_size
+        self.out_of_order = {}  # seq -> payload buffered ahead of expected_seq_num
+        # Segments rebuilt from parity packets are processed as if they had arrived
+        self.decoder = ParityDecoder(packet_format, self.modulus, window_size + DEFAULT_CAPACITY) if fec else NullParityDecoder()
+        # Go-Back-N ACKs are cumulative, so one can cover several in-order packets
+        self.now = 0.0
+        self.delayed_ack = DelayedAck(ack_every if protocol == PROTOCOL_GO_BACK_N else 1, ack_delay, self._clock)
+
+    def _clock(self):
+        return self.now  # the time of the event being handled
+
+    @property
+    def deadline(self):
+        """ Time at which timer_expired() is due, None while no ACK is pending """
+        return self.delayed_ack.deadline
+
+    def timer_expired(self, now):
+        self.now = now
+        self.delayed_ack.sent()
+        return [self.packet_format.ack_packet(self.last_ack_sent)]
+
+    def packet_received(self, packet, now):
+        self.now = now
+        acks = []
+        payloads = []
+        # Extract sequence number and payload, None if the checksum does not match
+        parsed = self.packet_format.parse_data(packet)
+
+        if self.selective:
+            # Corrupted packets are dropped silently, the sender's per-packet timer or a parity packet recovers them
+            for seq, payload, recovered in self.decoder.receive(packet, parsed):
+                if (seq - self.expected_seq_num) % self.modulus < self.window_size:
+                    self.out_of_order.setdefault(seq, payload)
+                    while self.expected_seq_num in self.out_of_order:
+                        payloads.append(self.out_of_order.pop(self.expected_seq_num))
+                        self.expected_seq_num = (self.expected_seq_num + 1) % self.modulus
+                elif (self.expected_seq_num - seq) % self.modulus > self.window_size:
+                    continue  # neither in the current nor in the previous window
+                # Acknowledge each packet individually, including ones delivered already whose ACK was lost;
+                # the ACK advertises the buffer, the sender must not exceed it
+                acks.append(self.packet_format.ack_packet(seq, self.window_size, recovered))
+            self.delayed_ack.sent()
+            return acks, payloads
+
+        if parsed is not None and parsed[0] == self.expected_seq_num:
+            payloads.append(parsed[1])
+            self.last_ack_sent = self.expected_seq_num
+            self.expected_seq_num = (self.expected_seq_num + 1) % self.modulus
+            if not self.delayed_ack.received_in_order():
+                return acks, payloads  # acknowledged later, together with the next ones
+        acks.append(self.packet_format.ack_packet(self.last_ack_sent))
+        self.delayed_ack.sent()
+        return acks, payloads
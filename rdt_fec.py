@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# Forward error correction for selective repeat: the sender follows every group of k data segments with
+# one XOR parity packet, and the receiver rebuilds a segment lost or corrupted in its group from the
+# others and the parity, without waiting for a timeout and a retransmission. k follows the loss rate
+# the sender observes, so a clean link carries few parity packets and a lossy one many.
+
+from collections import OrderedDict
+from rdt_packet import PARITY_HEADER
+
+MIN_GROUP = 2
+MAX_GROUP = 16
+INITIAL_LOSS = 0.1  # loss rate assumed before the first ACK
+LOSS_GAIN = 1 / 16  # weight of the newest segment in the loss estimate, like the RTT estimator's alpha
+LOSSES_PER_GROUP = 0.5  # segments lost per group aimed at; the parity can only rebuild one
+DEFAULT_CAPACITY = 4 * MAX_GROUP  # segments and parities a decoder keeps, on top of the receive window
+
+
+def group_size_for(loss_rate):
+    """ Returns the number of data segments a parity packet should cover at the given loss rate """
+    if loss_rate <= 0:
+        return MAX_GROUP
+    return max(MIN_GROUP, min(MAX_GROUP, int(LOSSES_PER_GROUP / loss_rate)))
+
+
+class ParityEncoder:
+    """
+     Builds the parity packets of a sender. add() takes every data segment the first time it is
+     sent and returns a parity packet once the group is full; flush() returns the parity of a
+     partial group at the end of the file. With group_size None, the group size adapts to the
+     share of segments that had to be retransmitted or rebuilt, reported through observe().
+    """
+
+    def __init__(self, packet_format, group_size=None):
+        self.packet_format = packet_format
+        self.adaptive = group_size is None
+        self.loss = INITIAL_LOSS
+        self.group_size = group_size_for(self.loss) if self.adaptive else max(1, min(int(group_size), MAX_GROUP))
+        self.parity_sent = 0
+        self._start(None)
+
+    def _start(self, first_seq):
+        self.first_seq = first_seq
+        self.count = 0
+        self.parity = 0  # XOR of the segments as little-endian integers, so shorter ones are zero-padded
+        self.lengths = 0
+        self.longest = 0
+
+    def add(self, seq_num, segment):
+        """ Returns the parity packet that closes the group of this segment, or None """
+        if not self.count:
+            self._start(seq_num)
+        self.count += 1
+        self.parity ^= int.from_bytes(segment, 'little')
+        self.lengths ^= len(segment)
+        self.longest = max(self.longest, len(segment))
+        if self.count >= self.group_size:
+            return self.flush()
+        return None
+
+    def flush(self):
+        """ Returns the parity packet of the segments added since the last one, or None if there are none """
+        if not self.count:
+            return None
+        payload = PARITY_HEADER.pack(self.count, self.lengths) + self.parity.to_bytes(self.longest, 'little')
+        packet = self.packet_format.parity_packet(self.first_seq, payload)
+        self.parity_sent += 1
+        self._start(None)
+        return packet
+
+    def observe(self, lost):
+        """ Counts one acknowledged segment, lost if it was retransmitted or rebuilt by the receiver """
+        if self.adaptive:
+            self.loss += LOSS_GAIN * ((1.0 if lost else 0.0) - self.loss)
+            self.group_size = group_size_for(self.loss)
+
+
+class NullParityEncoder:
+    """ Sends no parity; what the senders use without FEC """
+
+    group_size = 0
+    parity_sent = 0
+
+    def add(self, seq_num, segment):
+        return None
+
+    def flush(self):
+        return None
+
+    def observe(self, lost):
+        pass
+
+
+class ParityDecoder:
+    """
+     Rebuilds the data segments of a receiver from parity packets. It keeps the most recent
+     segments received and the parities still waiting for more than one of theirs; a parity
+     with exactly one segment of its group missing gives that segment back.
+    """
+
+    def __init__(self, packet_format, modulus, capacity=DEFAULT_CAPACITY):
+        self.packet_format = packet_format
+        self.modulus = modulus
+        self.capacity = capacity
+        self.segments = OrderedDict()  # seq -> payload
+        self.parities = OrderedDict()  # first seq -> (count, lengths, parity)
+        self.recovered = 0
+
+    def receive(self, packet, parsed):
+        """
+         Takes every packet with the result of packet_format.parse_data for it and returns the
+         segments to process, as (seq_num, payload, recovered) tuples: the packet's own, if it is
+         a valid data packet, then the segment it let the decoder rebuild, if any
+        """
+        if parsed is not None:
+            if parsed[0] < 0:
+                return []
+            seq, payload = parsed
+            result = [(seq, payload, False)]
+            rebuilt = self._data(seq, payload)
+        else:
+            result = []
+            parity = self.packet_format.parse_parity(packet)
+            rebuilt = None if parity is None else self._parity(*parity)
+        if rebuilt is not None:
+            result.append((*rebuilt, True))
+        return result
+
+    def _store(self, seq, payload):
+        self.segments[seq] = payload
+        while len(self.segments) > self.capacity:
+            self.segments.popitem(last=False)
+
+    def _data(self, seq, payload):
+        if seq in self.segments:
+            return None
+        self._store(seq, payload)
+        for first, (count, _, _) in self.parities.items():
+            if (seq - first) % self.modulus < count:
+                return self._rebuild(first)
+        return None
+
+    def _parity(self, first, payload):
+        if first in self.parities or len(payload) < PARITY_HEADER.size:
+            return None
+        count, lengths = PARITY_HEADER.unpack_from(payload)
+        self.parities[first] = (count, lengths, int.from_bytes(payload[PARITY_HEADER.size:], 'little'))
+        while len(self.parities) > self.capacity:
+            self.parities.popitem(last=False)
+        return self._rebuild(first)
+
+    def _rebuild(self, first):
+        """ Returns (seq, payload) if exactly one segment of the group is missing; forgets complete groups """
+        count, lengths, parity = self.parities[first]
+        missing = None
+        for i in range(count):
+            seq = (first + i) % self.modulus
+            if seq in self.segments:
+                parity ^= int.from_bytes(self.segments[seq], 'little')
+                lengths ^= len(self.segments[seq])
+            elif missing is not None:
+                return None  # two or more missing, wait for the retransmissions
+            else:
+                missing = seq
+        del self.parities[first]
+        if missing is None or parity.bit_length() > 8 * lengths:
+            return None
+        payload = parity.to_bytes(lengths, 'little')
+        self._store(missing, payload)
+        self.recovered += 1
+        return missing, payload
+
+
+class NullParityDecoder:
+    """ Rebuilds nothing; what the receivers use without FEC """
+
+    recovered = 0
+
+    def receive(self, packet, parsed):
+        if parsed is None or parsed[0] < 0:
+            return []
+        return [(parsed[0], parsed[1], False)]
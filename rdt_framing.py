@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# Reassembles the packets of an rdt_packet format from a TCP byte stream, and sends bursts of packets
+# with one vectored write
+
+import socket
+
+READ_SIZE = 64 * 1024  # bytes asked from the socket per recv_into call
+MAX_IOV = 1024  # buffers per sendmsg call, the usual IOV_MAX
+HAVE_SENDMSG = hasattr(socket.socket, "sendmsg")  # not on Windows
+
+
+def send_packets(sock, packets):
+    """
+     Sends a list of packets with as few syscalls as possible: one sendmsg gathers up to MAX_IOV
+     of them straight from their buffers, without joining them into a new bytes object first.
+     Like sendall, it only returns once everything is sent.
+    """
+    if packets and hasattr(sock, "packets_sent"):
+        sock.packets_sent(len(packets))  # an rdt_metrics.MeteredSocket counts packets, not syscalls
+    if len(packets) <= 1 or not HAVE_SENDMSG:
+        if packets:
+            sock.sendall(packets[0] if len(packets) == 1 else b''.join(packets))
+        return
+    buffers = [memoryview(packet) for packet in packets]
+    first = 0  # first buffer not completely sent
+    while first < len(buffers):
+        sent = sock.sendmsg(buffers[first:first + MAX_IOV])
+        # Skip what went out; a packet cut short is resumed from where it stopped
+        while first < len(buffers) and sent >= len(buffers[first]):
+            sent -= len(buffers[first])
+            first += 1
+        if sent:
+            buffers[first] = buffers[first][sent:]
+
+
+class PacketReader:
+    """
+     Reads a connection into one preallocated bytearray with recv_into and hands out complete
+     packets as memoryview slices of it. One syscall may bring in several coalesced packets,
+     which are then returned without touching the socket again, and the start of a packet
+     that arrives split stays in the buffer until the rest comes in.
+
+     A returned packet is only valid until the next call to read_packet, which may reuse its
+     bytes; copy it (bytes(packet)) to keep it longer.
+    """
+
+    def __init__(self, sock, packet_format, capacity=READ_SIZE):
+        self.sock = sock
+        self.packet_format = packet_format
+        self.buffer = bytearray(max(capacity, 2 * packet_format.max_packet_size))
+        self.view = memoryview(self.buffer)
+        self.start = 0  # first byte not yet returned
+        self.end = 0  # end of the bytes received so far
+        # An rdt_metrics.MeteredSocket counts every packet handed out, however the bytes arrived
+        self.on_packet = getattr(sock, "packet_received", None)
+
+    def read_packet(self):
+        """
+         Returns the next complete packet as a memoryview, or b'' once the peer closes the connection.
+         socket.timeout propagates from the socket and leaves any partial packet buffered.
+        """
+        while True:
+            size = self.packet_format.packet_size(self.view[self.start:self.end])
+            if size is not None and self.end - self.start >= size:
+                packet = self.view[self.start:self.start + size]
+                self.start += size
+                if self.on_packet is not None:
+                    self.on_packet()
+                return packet
+            if size is not None and size > len(self.buffer):
+                raise ConnectionError(f"packet of {size} bytes does not fit the {len(self.buffer)}-byte buffer")
+            if not self._fill():
+                return b''
+
+    def buffered(self):
+        """ True if the next packet has arrived already, so read_packet returns it without a syscall """
+        size = self.packet_format.packet_size(self.view[self.start:self.end])
+        return size is not None and self.end - self.start >= size
+
+    def _fill(self):
+        """ Moves a partial packet to the front of the buffer and receives after it; False on EOF """
+        if self.start:
+            pending = self.end - self.start
+            self.buffer[:pending] = bytes(self.view[self.start:self.end])  # less than one packet
+            self.start, self.end = 0, pending
+        received = self.sock.recv_into(self.view[self.end:])
+        if not received:
+            return False
+        self.end += received
+        return True
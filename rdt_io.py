@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# File sources for the sender that keep memory flat regardless of the file size
+
+import os
+import mmap
+from checksum import Checksum
+
+SEGMENT_SIZE = 20  # payload bytes in one packet
+CHUNK_SIZE = 64 * 1024  # bytes read from disk at a time
+MMAP_THRESHOLD = 16 * 1024 * 1024  # files at least this large are memory-mapped instead of read
+
+
+def iter_file_segments(filename, running_checksum=None, segment_size=SEGMENT_SIZE, limit=None, offset=0):
+    """
+     Lazily yields the file as bytes segments of segment_size (the last one may be shorter).
+     Small files are read through a CHUNK_SIZE buffer, large ones are memory-mapped, so only
+     one chunk or a few pages are resident at any time.
+
+     Input:
+        filename - the path + filename to read (String)
+        running_checksum - optional checksum.Checksum updated with every segment as it is produced
+        segment_size - payload size of one packet (int)
+        limit - only yield the first limit bytes of the file (int - default is the whole file)
+        offset - where in the file to start (int - default is 0); limit counts from there
+    """
+    with open(filename, 'rb', buffering=CHUNK_SIZE) as file:
+        end = os.fstat(file.fileno()).st_size
+        if limit is not None:
+            end = min(end, offset + limit)
+        if end >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for start in range(offset, end, segment_size):
+                    segment = view[start:min(start + segment_size, end)]
+                    if running_checksum is not None:
+                        running_checksum.update(segment)
+                    yield segment
+            return
+        file.seek(offset)
+        remaining = end - offset
+        while remaining > 0:
+            segment = file.read(min(segment_size, remaining))
+            if not segment:
+                return
+            remaining -= len(segment)
+            if running_checksum is not None:
+                running_checksum.update(segment)
+            yield segment
+
+
+class OutputSink:
+    """
+     Where the receiver puts the data it accepts, in order. This base sink only keeps the
+     running checksum and discards the data, so memory stays bounded for any file size.
+     Subclasses override _write to keep the data somewhere.
+    """
+
+    def __init__(self):
+        self.checksum = Checksum()
+        self.bytes_written = 0
+
+    def write(self, data):
+        """ Appends a bytes-like object to the output and updates the running checksum """
+        self.checksum.update(data)
+        self._write(data)
+        self.bytes_written += len(data)
+
+    def _write(self, data):
+        pass
+
+    def finish(self):
+        """ Called once the sender closed the connection; raises ConnectionError if the data is incomplete """
+
+    def close(self):
+        pass
+
+
+class FileSink(OutputSink):
+    """ Writes the received data to a file through a CHUNK_SIZE buffer """
+
+    def __init__(self, filename):
+        super().__init__()
+        self.file = open(filename, 'wb', buffering=CHUNK_SIZE)
+
+    def _write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class MmapSink(OutputSink):
+    """
+     Writes the received data into a memory-mapped file preallocated to size_hint bytes.
+     The mapping doubles when the data outgrows it and the file is truncated to the
+     number of bytes actually written on close.
+    """
+
+    def __init__(self, filename, size_hint=CHUNK_SIZE):
+        super().__init__()
+        self.file = open(filename, 'w+b')
+        self.capacity = 0
+        self.view = None
+        self._resize(max(int(size_hint), 1))
+
+    def _resize(self, capacity):
+        if self.view is not None:
+            self.view.close()
+        self.file.truncate(capacity)
+        self.view = mmap.mmap(self.file.fileno(), capacity)
+        self.capacity = capacity
+
+    def _write(self, data):
+        start = self.bytes_written
+        end = start + len(data)
+        if end > self.capacity:
+            self._resize(max(end, self.capacity * 2))
+        self.view[start:end] = data
+
+    def close(self):
+        self.view.close()
+        self.file.truncate(self.bytes_written)
+        self.file.close()
+
+
+class CallbackSink(OutputSink):
+    """ Hands every accepted segment to callback(data) """
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def _write(self, data):
+        self.callback(data)
+
+
+def open_sink(output):
+    """
+     Returns the OutputSink for the output argument of start_receiver:
+     None discards the data, a callable receives every segment, a string is a file to write
+     and an OutputSink is used as it is.
+    """
+    if output is None:
+        return OutputSink()
+    if isinstance(output, OutputSink):
+        return output
+    if callable(output):
+        return CallbackSink(output)
+    return FileSink(output)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# Transfer metrics: RTT histogram, throughput and goodput over time, retransmissions, time blocked in recv
+# and handshake latency, exported as JSON or in the Prometheus text format. Recording is a few integer
+# additions per packet, cheap enough to leave on.
+
+import json
+import time
+from bisect import bisect_left
+
+RTT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+DEFAULT_INTERVAL = 1.0  # seconds covered by one point of the throughput timeline
+PROMETHEUS_PREFIX = "rdt"
+
+
+class Histogram:
+    """ Counts observations in fixed buckets, each bucket holding the values up to its upper bound """
+
+    def __init__(self, bounds=RTT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # the last bucket is everything above the largest bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """ Upper bound of the bucket holding the q-quantile (inf if above every bound), None if empty """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.bounds + ("+Inf",), self.counts)},
+        }
+
+
+class MeteredSocket:
+    """
+     Wraps a socket and counts the bytes through it and the time recv calls block. Packets are
+     counted where they are framed: rdt_framing.send_packets and PacketReader call packets_sent
+     and packet_received, since one syscall may carry several packets or only part of one.
+    """
+
+    def __init__(self, sock, metrics):
+        self.sock = sock
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+    def packets_sent(self, count):
+        self.metrics.packets_sent += count
+
+    def packet_received(self):
+        self.metrics.packets_received += 1
+
+    def send(self, data):
+        sent = self.sock.send(data)
+        self.metrics.sent(sent)
+        return sent
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+        self.metrics.sent(len(data))
+
+    def sendmsg(self, buffers, *args):
+        sent = self.sock.sendmsg(buffers, *args)
+        self.metrics.sent(sent)
+        return sent
+
+    def recv(self, size, *flags):
+        started = time.perf_counter()
+        try:
+            data = self.sock.recv(size, *flags)
+        finally:
+            self.metrics.recv_blocked += time.perf_counter() - started
+        self.metrics.received(len(data))
+        return data
+
+    def recv_into(self, buffer, *args):
+        started = time.perf_counter()
+        try:
+            size = self.sock.recv_into(buffer, *args)
+        finally:
+            self.metrics.recv_blocked += time.perf_counter() - started
+        self.metrics.received(size)
+        return size
+
+
+class TransferMetrics:
+    """
+     Metrics of one transfer, filled in by start_sender or start_receiver when passed as their
+     metrics argument:
+        handshake_seconds - from the first connection attempt to the relay's OK
+        rtt - Histogram of the RTT samples the sender measured (Karn's rule applies)
+        packets_sent, bytes_sent, packets_received, bytes_received - everything on the wire
+        payload_bytes - goodput: new payload the sender put on the wire, or data the receiver delivered
+        segments - segments the sender sent at least once; the rest of packets_sent are retransmissions
+        recv_blocked - seconds spent waiting in recv
+        timeline - [wire bytes, payload bytes] per interval seconds since start
+    """
+
+    def __init__(self, role, connection_ID, interval=DEFAULT_INTERVAL):
+        self.role = role
+        self.connection_ID = connection_ID
+        self.interval = float(interval)
+        self.started = time.monotonic()
+        self.finished = None
+        self.handshake_seconds = None
+        self.rtt = Histogram()
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.packets_received = 0
+        self.bytes_received = 0
+        self.payload_bytes = 0
+        self.segments = 0
+        self.recv_blocked = 0.0
+        self.timeline = []
+
+    def _slot(self):
+        slot = int((time.monotonic() - self.started) / self.interval)
+        while len(self.timeline) <= slot:
+            self.timeline.append([0, 0])
+        return self.timeline[slot]
+
+    def socket(self, sock):
+        """ Returns sock wrapped so that its traffic is counted """
+        return MeteredSocket(sock, self)
+
+    def count_segments(self, segments):
+        """ Yields segments, counting each one as new payload as the sender takes it """
+        for segment in segments:
+            self.segments += 1
+            self.delivered(len(segment))
+            yield segment
+
+    def handshake(self, seconds):
+        self.handshake_seconds = seconds
+
+    def observe_rtt(self, seconds):
+        self.rtt.observe(seconds)
+
+    def sent(self, size):
+        """ Counts size bytes written to the socket, by one syscall """
+        self.bytes_sent += size
+        self._slot()[0] += size
+
+    def received(self, size):
+        """ Counts size bytes read from the socket, by one syscall """
+        self.bytes_received += size
+        self._slot()[0] += size
+
+    def delivered(self, size):
+        self.payload_bytes += size
+        self._slot()[1] += size
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    @property
+    def duration(self):
+        return (self.finished if self.finished is not None else time.monotonic()) - self.started
+
+    @property
+    def retransmission_ratio(self):
+        """ Share of the packets sent that were retransmissions, None for the receiver """
+        if not self.segments or not self.packets_sent:
+            return None
+        return max(self.packets_sent - self.segments, 0) / self.packets_sent
+
+    def to_dict(self):
+        duration = self.duration
+        return {
+            "role": self.role,
+            "connection_id": self.connection_ID,
+            "duration_seconds": duration,
+            "handshake_seconds": self.handshake_seconds,
+            "packets_sent": self.packets_sent,
+            "bytes_sent": self.bytes_sent,
+            "packets_received": self.packets_received,
+            "bytes_received": self.bytes_received,
+            "payload_bytes": self.payload_bytes,
+            "throughput_bytes_per_second": (self.bytes_sent + self.bytes_received) / duration if duration else None,
+            "goodput_bytes_per_second": self.payload_bytes / duration if duration else None,
+            "retransmission_ratio": self.retransmission_ratio,
+            "recv_blocked_seconds": self.recv_blocked,
+            "rtt_seconds": self.rtt.to_dict(),
+            "timeline": [{"start_seconds": slot * self.interval, "wire_bytes": wire, "payload_bytes": payload}
+                         for slot, (wire, payload) in enumerate(self.timeline)],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """ The metrics in the Prometheus text exposition format, labelled with role and connection ID """
+        labels = f'role="{self.role}",connection_id="{escape_label(self.connection_ID)}"'
+        lines = []
+
+        def metric(name, kind, value, help_text):
+            if value is None:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.append(f"{prefix}_{name}{{{labels}}} {value}")
+
+        metric("handshake_seconds", "gauge", self.handshake_seconds, "Time to establish the connection")
+        metric("duration_seconds", "gauge", self.duration, "Time since the transfer started")
+        metric("packets_sent_total", "counter", self.packets_sent, "Packets sent, retransmissions included")
+        metric("bytes_sent_total", "counter", self.bytes_sent, "Bytes sent on the wire")
+        metric("packets_received_total", "counter", self.packets_received, "Packets received")
+        metric("bytes_received_total", "counter", self.bytes_received, "Bytes received from the wire")
+        metric("payload_bytes_total", "counter", self.payload_bytes, "New payload sent or data delivered (goodput)")
+        metric("retransmission_ratio", "gauge", self.retransmission_ratio, "Share of the packets sent that were retransmissions")
+        metric("recv_blocked_seconds_total", "counter", self.recv_blocked, "Time spent waiting in recv")
+
+        name = f"{prefix}_rtt_seconds"
+        lines.append(f"# HELP {name} Round trip time of packets sent once")
+        lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(self.rtt.bounds + ("+Inf",), self.rtt.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.rtt.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.rtt.count}")
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics(TransferMetrics):
+    """ Records nothing and leaves the socket and segments unwrapped; what the endpoints use without metrics """
+
+    def __init__(self):
+        super().__init__(None, None)
+
+    def socket(self, sock):
+        return sock
+
+    def count_segments(self, segments):
+        return segments
+
+    def handshake(self, seconds):
+        pass
+
+    def observe_rtt(self, seconds):
+        pass
+
+    def delivered(self, size):
+        pass
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+# Packet formats and handshake options shared by PA2_sender.py, PA2_receiver.py and rdt_relay.py
+
+import struct
+from checksum import checksum, compute, ALGORITHMS, SUM, INTERNET, CRC32
+from rdt_compress import COMPRESSIONS
+# The text packet's layout lives with its codec
+from rdt_codec import SEQ_CHARS, SEQ_MODULUS, PAD_CHAR, LENGTH_MARKS, TEXT_PACKET_SIZE, TEXT_SEGMENT_SIZE, TextCodec
+
+# Protocols understood by start_sender/start_receiver
+PROTOCOL_STOP_AND_WAIT = "saw"
+PROTOCOL_GO_BACK_N = "gbn"
+PROTOCOL_SELECTIVE_REPEAT = "sr"
+PROTOCOLS = (PROTOCOL_STOP_AND_WAIT, PROTOCOL_GO_BACK_N, PROTOCOL_SELECTIVE_REPEAT)
+
+DEFAULT_WINDOW_SIZE = 8
+
+# Packet formats negotiated in the HELLO handshake
+FORMAT_TEXT = "text"
+FORMAT_BINARY = "bin"
+FORMATS = (FORMAT_TEXT, FORMAT_BINARY)
+
+# The text format's 5-digit field fits the byte sum and the 16-bit Internet checksum, not a CRC32
+TEXT_CHECKSUMS = (SUM, INTERNET)
+
+# Binary frame: payload length, kind, flags, sequence (or ACK) number, payload, checksum (CRC32 unless
+# another algorithm was negotiated) of everything before it
+BINARY_HEADER = struct.Struct("!HBBI")
+BINARY_TRAILER = struct.Struct("!I")
+BINARY_OVERHEAD = BINARY_HEADER.size + BINARY_TRAILER.size
+ACK_WINDOW = struct.Struct("!I")  # optional payload of a binary ACK: the receive window, in packets
+# Session frame: the same with a 16-bit stream ID before the sequence number
+SESSION_HEADER = struct.Struct("!HBBHI")
+MAX_STREAMS = 2 ** 16
+BINARY_SEQ_MODULUS = 2 ** 32
+KIND_DATA = 0
+KIND_ACK = 1
+KIND_PARITY = 2  # XOR of a group of data segments, see rdt_fec.py
+FLAG_RECOVERED = 1  # ACK flag: the receiver rebuilt the segment from a parity packet
+# Payload of a parity packet before the XOR: number of data segments covered, XOR of their lengths
+PARITY_HEADER = struct.Struct("!BH")
+DEFAULT_MSS = 1024  # payload bytes per binary packet offered in the handshake
+MAX_MSS = 65535  # largest payload length the header can carry
+MAX_FEC_MSS = MAX_MSS - PARITY_HEADER.size  # parity packets carry a header on top of a full segment
+
+
+def seq_modulus(protocol):
+    """ Returns the size of the sequence space used by the given protocol """
+    if protocol == PROTOCOL_STOP_AND_WAIT:
+        return 2  # alternating bit
+    return SEQ_MODULUS
+
+
+def max_window_size(protocol):
+    """ Returns the largest window that keeps sequence numbers unambiguous for the given protocol """
+    if protocol == PROTOCOL_GO_BACK_N:
+        return SEQ_MODULUS - 1
+    if protocol == PROTOCOL_SELECTIVE_REPEAT:
+        return SEQ_MODULUS // 2  # sender and receiver windows must not overlap
+    return 1
+
+
+def encode_seq(seq_num):
+    """ Returns the one-character representation of a sequence number """
+    return SEQ_CHARS[seq_num % SEQ_MODULUS]
+
+
+def decode_seq(seq_char):
+    """ Returns the sequence number of a one-character field, or -1 if it is not one """
+    if len(seq_char) != 1:
+        return -1
+    return SEQ_CHARS.find(seq_char)
+
+
+# str versions of the text packets, behind the course's create_packet and create_ack_packet;
+# the endpoints build and parse them on bytes with rdt_codec.TextCodec, which gives the same bytes
+def make_data_packet(seq_char, data, algorithm=SUM):
+    """ Creates a 30-byte text packet with a sequence number and data """
+    length_char = chr(LENGTH_MARKS[len(data)])  # ACK num is not used in sender packet, it says how long the data is
+    data = data.ljust(TEXT_SEGMENT_SIZE, PAD_CHAR)  # Ensure data is exactly 20 bytes
+    packet = f"{seq_char} {length_char} {data} "
+    packet_checksum = checksum(packet, algorithm)  # Calculate checksum
+    return f"{packet}{packet_checksum}"
+
+
+def make_ack_packet(ack_char, algorithm=SUM, window_char=" "):
+    """
+     Creates a 30-byte text ACK packet with the given acknowledgment number. The sequence field
+     is unused in ACKs; window_char, if given, puts the receive window there.
+    """
+    ack_packet = f"{window_char} {ack_char} {' ' * TEXT_SEGMENT_SIZE} "  # Data field is blank in ACK packet
+    ack_packet_checksum = checksum(ack_packet, algorithm)
+    return f"{ack_packet}{ack_packet_checksum}"
+
+
+class TextFormat:
+    """ The course's 30-byte ASCII packet: "<seq> <ack> <20 bytes of data> <5-digit checksum>" """
+
+    name = FORMAT_TEXT
+    min_packet_size = TEXT_PACKET_SIZE
+    max_packet_size = TEXT_PACKET_SIZE
+    segment_size = TEXT_SEGMENT_SIZE
+
+    def __init__(self, checksum_algorithm=SUM):
+        self.checksum_algorithm = checksum_algorithm
+        self.codec = TextCodec(checksum_algorithm)
+
+    def seq_modulus(self, protocol):
+        return seq_modulus(protocol)
+
+    def max_window_size(self, protocol):
+        return max_window_size(protocol)
+
+    def data_packet(self, seq_num, data):
+        return self.codec.data_packet(seq_num, data)
+
+    def ack_packet(self, ack_num, window=None, recovered=False):
+        return self.codec.ack_packet(ack_num, window)  # built once per ACK number and window
+
+    def packet_size(self, buffer):
+        """ Size of the packet at the start of buffer; every text packet has the same """
+        return TEXT_PACKET_SIZE
+
+    def verify(self, packet):
+        """ Same check as checksum.checksum_verifier, on bytes and with the negotiated algorithm """
+        return self.codec.verify(packet)
+
+    def parse_data(self, packet):
+        """ Returns (seq_num, payload) of a valid data packet, seq_num is -1 if unreadable; None if corrupted """
+        return self.codec.parse_data(packet)
+
+    def parse_ack(self, packet):
+        """ Returns the acknowledged sequence number (-1 if unreadable), or None if corrupted """
+        return self.codec.parse_ack(packet)
+
+    def ack_window(self, packet):
+        """ Returns the receive window advertised by a valid ACK, or None if it carries none """
+        return self.codec.ack_window(packet)
+
+    def ack_recovered(self, packet):
+        """ Text ACKs have no room for flags, and text packets carry no parity """
+        return False
+
+
+class BinaryFormat:
+    """
+     Length-prefixed binary frame with a 32-bit sequence number and a checksum, carrying up to
+     segment_size payload bytes. With the default 1024-byte segments 98.8% of every packet is
+     payload, against 67% for the text format.
+    """
+
+    name = FORMAT_BINARY
+    header = BINARY_HEADER
+
+    def __init__(self, segment_size=DEFAULT_MSS, checksum_algorithm=CRC32):
+        self.segment_size = segment_size
+        self.checksum_algorithm = checksum_algorithm
+        self.min_packet_size = self.header.size + BINARY_TRAILER.size
+        self.max_packet_size = segment_size + self.min_packet_size
+
+    def seq_modulus(self, protocol):
+        return BINARY_SEQ_MODULUS
+
+    def max_window_size(self, protocol):
+        if protocol == PROTOCOL_SELECTIVE_REPEAT:
+            return BINARY_SEQ_MODULUS // 2
+        if protocol == PROTOCOL_GO_BACK_N:
+            return BINARY_SEQ_MODULUS - 1
+        return 1
+
+    def pack_header(self, length, kind, number, stream_id, flags=0):
+        return BINARY_HEADER.pack(length, kind, flags, number)
+
+    def unpack_header(self, packet):
+        """ Returns (length, kind, stream_id, number) of the header at the start of packet """
+        length, kind, _, number = BINARY_HEADER.unpack_from(packet)
+        return length, kind, 0, number
+
+    def frame(self, kind, number, payload=b'', stream_id=0, flags=0):
+        body = self.pack_header(len(payload), kind, number % BINARY_SEQ_MODULUS, stream_id, flags) + bytes(payload)
+        return body + BINARY_TRAILER.pack(compute(body, self.checksum_algorithm) & 0xFFFFFFFF)
+
+    def data_packet(self, seq_num, data):
+        return self.frame(KIND_DATA, seq_num, data)
+
+    def ack_packet(self, ack_num, window=None, recovered=False):
+        payload = b'' if window is None else ACK_WINDOW.pack(window)
+        return self.frame(KIND_ACK, ack_num, payload, flags=FLAG_RECOVERED if recovered else 0)
+
+    def parity_packet(self, first_seq, payload):
+        """ Parity packet whose number is the sequence number of the first segment it covers """
+        return self.frame(KIND_PARITY, first_seq, payload)
+
+    def packet_size(self, buffer):
+        """ Size of the frame at the start of buffer, or None until its length prefix has arrived """
+        if len(buffer) < 2:
+            return None
+        return self.min_packet_size + int.from_bytes(buffer[:2], 'big')
+
+    def unpack_frame(self, packet, kind):
+        """ Returns (stream_id, number, payload) of a valid frame of the given kind, or None """
+        if len(packet) < self.min_packet_size:
+            return None
+        length, packet_kind, stream_id, number = self.unpack_header(packet)
+        end = self.header.size + length
+        if packet_kind != kind or len(packet) != end + BINARY_TRAILER.size:
+            return None
+        if compute(packet[:end], self.checksum_algorithm) & 0xFFFFFFFF != BINARY_TRAILER.unpack_from(packet, end)[0]:
+            return None
+        return stream_id, number, bytes(packet[self.header.size:end])
+
+    def unpack(self, packet, kind):
+        """ Returns (number, payload) of a valid frame of the given kind, or None """
+        frame = self.unpack_frame(packet, kind)
+        return None if frame is None else frame[1:]
+
+    def parse_data(self, packet):
+        return self.unpack(packet, KIND_DATA)
+
+    def parse_ack(self, packet):
+        frame = self.unpack(packet, KIND_ACK)
+        return None if frame is None else frame[0]
+
+    def parse_parity(self, packet):
+        """ Returns (first_seq, payload) of a valid parity packet, or None """
+        return self.unpack(packet, KIND_PARITY)
+
+    def ack_window(self, packet):
+        """ Returns the receive window advertised by a valid ACK, or None if it carries none """
+        frame = self.unpack(packet, KIND_ACK)
+        if frame is None or len(frame[1]) != ACK_WINDOW.size:
+            return None
+        return ACK_WINDOW.unpack(frame[1])[0] or None
+
+    def ack_recovered(self, packet):
+        """ True if a valid ACK says the receiver rebuilt the segment instead of receiving it """
+        return self.unpack(packet, KIND_ACK) is not None and bool(packet[3] & FLAG_RECOVERED)
+
+
+class SessionFormat(BinaryFormat):
+    """
+     Binary frame whose header also carries a 16-bit stream ID, so one connection can carry
+     many logical streams, each with its own sequence space (see rdt_session.py)
+    """
+
+    header = SESSION_HEADER
+
+    def pack_header(self, length, kind, number, stream_id, flags=0):
+        return SESSION_HEADER.pack(length, kind, flags, stream_id, number)
+
+    def unpack_header(self, packet):
+        length, kind, _, stream_id, number = SESSION_HEADER.unpack_from(packet)
+        return length, kind, stream_id, number
+
+    def stream(self, stream_id):
+        """ Returns a single-stream view of this format that tags every packet with stream_id """
+        return StreamView(self, stream_id)
+
+
+class StreamView:
+    """ One stream of a SessionFormat, usable wherever a single-stream packet format is expected """
+
+    def __init__(self, packet_format, stream_id):
+        self.packet_format = packet_format
+        self.stream_id = stream_id
+
+    def __getattr__(self, name):
+        return getattr(self.packet_format, name)
+
+    def data_packet(self, seq_num, data):
+        return self.packet_format.frame(KIND_DATA, seq_num, data, self.stream_id)
+
+    def ack_packet(self, ack_num, window=None, recovered=False):
+        payload = b'' if window is None else ACK_WINDOW.pack(window)
+        return self.packet_format.frame(KIND_ACK, ack_num, payload, self.stream_id, FLAG_RECOVERED if recovered else 0)
+
+
+def hello_options(packet_format, segment_size, checksum_algorithm=None, session=False, compression=None, fec=False,
+                  resume=None, resume_checksum=None):
+    """
+     Returns the HELLO options to request a packet format, checksum algorithm, session mode
+     (several streams on the connection, binary only), payload compression and parity packets
+     (both binary only), and to resume a transfer at byte offset resume at the latest, the
+     first resume bytes summing to resume_checksum if given, or None to send the plain course HELLO
+    """
+    options = {}
+    if packet_format == FORMAT_BINARY:
+        options.update(FORMAT=FORMAT_BINARY, MSS=str(segment_size))
+        if session:
+            options["SESSION"] = "1"
+        if compression is not None:
+            options["COMPRESS"] = compression
+        if fec:
+            options["FEC"] = "1"
+    if checksum_algorithm is not None:
+        options["CKSUM"] = checksum_algorithm
+    if resume is not None:
+        options["RESUME"] = format_resume(resume, resume_checksum)
+    return options or None
+
+
+def format_resume(offset, checksum=None):
+    """ Formats a RESUME option value, "<offset>" or "<offset>:<checksum>" """
+    return str(offset) if checksum is None else f"{offset}:{checksum}"
+
+
+def parse_resume(value):
+    """ Returns (offset, checksum) of a RESUME option value, checksum being None if absent; raises ValueError """
+    offset, separator, checksum = value.partition(":")
+    if not offset.isdigit() or (separator and not checksum.isdigit()):
+        raise ValueError(f"malformed RESUME value {value!r}")
+    return int(offset), int(checksum) if checksum else None
+
+
+def format_options(options):
+    """ Formats options as the "KEY=value" tokens appended to HELLO and OK messages """
+    return " ".join(f"{key}={value}" for key, value in options.items())
+
+
+def parse_options(tokens):
+    """ Returns the KEY=value tokens of a handshake message as a dict """
+    if isinstance(tokens, str):
+        tokens = tokens.split()
+    return dict(token.split("=", 1) for token in tokens if "=" in token)
+
+
+def negotiate_options(first, second):
+    """
+     Returns the options both ends of a connection agree on. The binary format is only used when
+     both sides ask for it, with the smaller of the two offered segment sizes. A checksum algorithm
+     is used when both sides ask for the same one and the agreed format can carry it, otherwise
+     the format's own (the byte sum for text, CRC32 for binary). Session mode, compression and
+     parity packets need both sides too, the same compression on both, and the binary format;
+     parity packets also a segment size that leaves room for their header. A transfer resumes
+     when both sides offer to, at the smaller of the two offsets: the receiver offers the bytes
+     it has with their checksum, the sender the size of its file. The checksum goes along when
+     the receiver's offset is the agreed one, for the sender to check its file did not change.
+    """
+    if first.get("FORMAT") == second.get("FORMAT") == FORMAT_BINARY:
+        mss = min(int(first.get("MSS", DEFAULT_MSS)), int(second.get("MSS", DEFAULT_MSS)), MAX_MSS)
+        agreed = {"FORMAT": FORMAT_BINARY, "MSS": str(max(mss, 1))}
+        if first.get("SESSION") == second.get("SESSION") == "1":
+            agreed["SESSION"] = "1"
+        if first.get("COMPRESS") == second.get("COMPRESS") in COMPRESSIONS:
+            agreed["COMPRESS"] = first["COMPRESS"]
+        if first.get("FEC") == second.get("FEC") == "1" and mss <= MAX_FEC_MSS:
+            agreed["FEC"] = "1"
+        supported, default = ALGORITHMS, CRC32
+    else:
+        agreed = {"FORMAT": FORMAT_TEXT, "MSS": str(TEXT_SEGMENT_SIZE)}
+        supported, default = TEXT_CHECKSUMS, SUM
+    algorithm = first.get("CKSUM")
+    agreed["CKSUM"] = algorithm if algorithm == second.get("CKSUM") and algorithm in supported else default
+    if "RESUME" in first and "RESUME" in second:
+        offers = sorted((parse_resume(first["RESUME"]), parse_resume(second["RESUME"])),
+                        key=lambda offer: (offer[0], offer[1] is None))
+        agreed["RESUME"] = format_resume(*offers[0])
+    return agreed
+
+
+def negotiated_compression(options):
+    """ Returns the payload compression agreed in the handshake, or None """
+    return (options or {}).get("COMPRESS")
+
+
+def negotiated_resume(options):
+    """ Returns the byte offset both sides agreed to resume the transfer at, or None if it is not resumed """
+    resume = (options or {}).get("RESUME")
+    return None if resume is None else parse_resume(resume)[0]
+
+
+def negotiated_resume_checksum(options):
+    """ Returns the checksum total the receiver has for the bytes before the agreed offset, or None """
+    resume = (options or {}).get("RESUME")
+    return None if resume is None else parse_resume(resume)[1]
+
+
+def negotiated_fec(options):
+    """ True if both sides agreed in the handshake to send and use parity packets """
+    return (options or {}).get("FEC") == "1"
+
+
+def negotiated_format(options):
+    """ Returns the packet format object for the options agreed in the handshake """
+    options = options or {}
+    if options.get("FORMAT") == FORMAT_BINARY:
+        binary_format = SessionFormat if options.get("SESSION") == "1" else BinaryFormat
+        return binary_format(int(options.get("MSS", DEFAULT_MSS)), options.get("CKSUM", CRC32))
+    return TextFormat(options.get("CKSUM", SUM))
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# Local stand-in for the gaia.cs.umass.edu relay: pairs a sender and a receiver by connection ID
+# and forwards their packets after possibly losing, corrupting or delaying (but not reordering) them.
+
+import sys
+import random
+import asyncio
+import argparse
+import threading
+from checksum import ALGORITHMS, SUM
+from rdt_compress import COMPRESSIONS, ZLIB
+from rdt_packet import FORMAT_BINARY, format_options, parse_options, parse_resume, negotiate_options, negotiated_format
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 20008
+READ_SIZE = 65536
+HELLO_PAUSE = 0.1  # seconds without new bytes that end a HELLO sent without a newline
+WAIT_TIMEOUT = 60  # seconds a client waits for its peer, same as CONNECTION_TIMEOUT of the endpoints
+ROLES = ("S", "R")
+
+
+class HelloError(ValueError):
+    """ Raised for a HELLO message the relay cannot accept """
+
+
+def parse_hello(message):
+    """
+     Parses "HELLO <role> <loss_rate> <corrupt_rate> <max_delay> <connection_ID> [KEY=value ...]"
+
+     Output: (role, loss_rate, corrupt_rate, max_delay, connection_ID, options)
+    """
+    parts = message.split()
+    if len(parts) < 6 or parts[0] != "HELLO":
+        raise HelloError("malformed HELLO message")
+    role, loss_rate, corrupt_rate, max_delay, connection_ID = parts[1:6]
+    options = parse_options(parts[6:])
+    if len(options) != len(parts) - 6:
+        raise HelloError("options must be KEY=value")
+    if not options.get("MSS", "1").isdigit():
+        raise HelloError("MSS must be a number")
+    try:
+        parse_resume(options.get("RESUME", "0"))
+    except ValueError:
+        raise HelloError("RESUME must be a byte offset, optionally followed by :<checksum>")
+    if options.get("CKSUM", SUM) not in ALGORITHMS:
+        raise HelloError(f"unknown checksum algorithm {options['CKSUM']}")
+    if options.get("COMPRESS", ZLIB) not in COMPRESSIONS:
+        raise HelloError(f"unknown compression {options['COMPRESS']}")
+    if role not in ROLES:
+        raise HelloError(f"unknown role {role}")
+    try:
+        loss_rate = float(loss_rate)
+        corrupt_rate = float(corrupt_rate)
+        max_delay = float(max_delay)
+    except ValueError:
+        raise HelloError("loss rate, corrupt rate and max delay must be numbers")
+    if not (0.0 <= loss_rate <= 1.0 and 0.0 <= corrupt_rate <= 1.0 and 0 <= max_delay <= 5):
+        raise HelloError("loss rate, corrupt rate and max delay out of range")
+    return role, loss_rate, corrupt_rate, max_delay, connection_ID, options
+
+
+async def read_hello(reader):
+    """
+     Reads one HELLO. Clients that negotiate options end it with a newline; the course clients
+     send none and wait for the answer, so a HELLO without one is complete once HELLO_PAUSE
+     seconds pass without new bytes.
+    """
+    try:
+        return await asyncio.wait_for(reader.readuntil(b"\n"), HELLO_PAUSE)
+    except asyncio.IncompleteReadError as e:
+        return e.partial  # the client hung up; parse_hello rejects whatever it sent
+    except asyncio.LimitOverrunError:
+        raise HelloError("HELLO message too long")
+    except asyncio.TimeoutError:
+        pass  # the bytes received so far are still in the reader's buffer
+    hello = await asyncio.wait_for(reader.read(1024), WAIT_TIMEOUT)
+    while hello and not hello.endswith(b"\n"):
+        try:
+            more = await asyncio.wait_for(reader.read(1024), HELLO_PAUSE)
+        except asyncio.TimeoutError:
+            break
+        if not more:
+            break
+        hello += more
+    return hello
+
+
+def corrupt_binary_packet(packet, rng):
+    """ Flips bits in one byte of a binary frame; the length prefix is left alone as it models framing """
+    index = rng.randrange(2, len(packet))
+    return packet[:index] + bytes([packet[index] ^ rng.randrange(1, 256)]) + packet[index + 1:]
+
+
+def corrupt_packet(packet, rng):
+    """
+     Replaces one byte of the packet with a different printable ASCII character. The stop-and-wait
+     sender counts such an ACK as corrupted and waits for its timer, as it does with gaia.
+    """
+    index = rng.randrange(len(packet))
+    replacement = rng.randrange(32, 126)
+    if replacement >= packet[index]:
+        replacement += 1  # never pick the original byte
+    return packet[:index] + bytes([replacement]) + packet[index + 1:]
+
+
+class Endpoint:
+    """ One connected client and the impairments it asked for on the packets it sends """
+
+    def __init__(self, reader, writer, role, loss_rate, corrupt_rate, max_delay, connection_ID, options):
+        self.reader = reader
+        self.writer = writer
+        self.role = role
+        self.loss_rate = loss_rate
+        self.corrupt_rate = corrupt_rate
+        self.max_delay = max_delay
+        self.connection_ID = connection_ID
+        self.options = options  # empty for clients that sent the plain course HELLO
+        self.paired = asyncio.get_running_loop().create_future()
+
+
+class RelayServer:
+    """
+     asyncio relay speaking the HELLO/WAITING/OK/ERROR handshake of the course server.
+     Every (connection ID, direction) gets its own random.Random derived from seed, so a run
+     with the same seed makes the same loss/corruption/delay decisions regardless of how many
+     other pairs share the process.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, seed=None, verbose=False):
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.verbose = verbose
+        self.waiting = {}  # connection_ID -> Endpoint waiting for its peer
+        self.active = set()  # connection IDs currently relaying
+        self.server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        """ Starts listening; self.port is the bound port afterwards (useful with port 0) """
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.log(f"Relay listening on {self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def rng_for(self, connection_ID, role):
+        if self.seed is None:
+            return random.Random()
+        return random.Random(f"{self.seed}:{connection_ID}:{role}")
+
+    async def handle_client(self, reader, writer):
+        try:
+            hello = await read_hello(reader)
+            endpoint = Endpoint(reader, writer, *parse_hello(hello.decode(errors="replace")))
+        except (HelloError, asyncio.TimeoutError, ConnectionError) as e:
+            await self.reject(writer, str(e) or "no HELLO received")
+            return
+
+        connection_ID = endpoint.connection_ID
+        peer = self.waiting.get(connection_ID)
+        if connection_ID in self.active:
+            await self.reject(writer, f"connection ID {connection_ID} is in use")
+            return
+        if peer is None:
+            self.waiting[connection_ID] = endpoint
+            writer.write(b"WAITING\n" if endpoint.options else b"WAITING")
+            self.log(f"{endpoint.role} waiting on connection ID {connection_ID}")
+            try:
+                await asyncio.wait_for(asyncio.shield(endpoint.paired), WAIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                if self.waiting.get(connection_ID) is endpoint:
+                    del self.waiting[connection_ID]
+                await self.reject(writer, "no peer connected")
+            return
+        if peer.role == endpoint.role:
+            await self.reject(writer, f"role {endpoint.role} already connected for ID {connection_ID}")
+            return
+
+        del self.waiting[connection_ID]
+        self.active.add(connection_ID)
+        try:
+            await self.relay_pair(peer, endpoint)
+        finally:
+            self.active.discard(connection_ID)
+            if not peer.paired.done():
+                peer.paired.set_result(None)
+
+    async def reject(self, writer, reason):
+        self.log(f"Rejecting client: {reason}")
+        try:
+            writer.write(f"ERROR {reason}".encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def relay_pair(self, first, second):
+        agreed = negotiate_options(first.options, second.options)
+        self.log(f"Relaying connection ID {first.connection_ID} with {format_options(agreed)}")
+        for endpoint in (first, second):
+            # Clients that negotiated get the agreed options on a line of their own
+            endpoint.writer.write(f"OK {format_options(agreed)}\n".encode() if endpoint.options else b"OK")
+        # The relay forwards, loses and corrupts whole packets of the agreed format
+        packet_format = negotiated_format(agreed)
+        pumps = [
+            asyncio.create_task(self.pump(first, second, packet_format)),
+            asyncio.create_task(self.pump(second, first, packet_format)),
+        ]
+        # Once either side hangs up the transfer is over; closing both tells the other side
+        await asyncio.wait(pumps, return_when=asyncio.FIRST_COMPLETED)
+        for endpoint in (first, second):
+            endpoint.writer.close()
+        for task in pumps:
+            task.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        self.log(f"Finished connection ID {first.connection_ID}")
+
+    async def pump(self, source, destination, packet_format):
+        """ Forwards the packets sent by source, applying the impairments source asked for """
+        binary = packet_format.name == FORMAT_BINARY
+        rng = self.rng_for(source.connection_ID, source.role)
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue() if source.max_delay else None
+        delivery = asyncio.create_task(self.deliver(pending, destination.writer)) if pending is not None else None
+        last_delivery = 0.0
+        buffer = bytearray()
+        try:
+            while True:
+                data = await source.reader.read(READ_SIZE)
+                if not data:
+                    break
+                buffer += data
+                while True:
+                    size = packet_format.packet_size(buffer)
+                    if size is None or len(buffer) < size:
+                        break
+                    packet = bytes(buffer[:size])
+                    del buffer[:size]
+                    if rng.random() < source.loss_rate:
+                        continue
+                    if rng.random() < source.corrupt_rate:
+                        packet = corrupt_binary_packet(packet, rng) if binary else corrupt_packet(packet, rng)
+                    if pending is None:
+                        destination.writer.write(packet)
+                    else:
+                        # Never deliver before the previous packet, so delay does not reorder
+                        last_delivery = max(last_delivery, loop.time() + rng.uniform(0, source.max_delay))
+                        pending.put_nowait((last_delivery, packet))
+                if pending is None:
+                    await destination.writer.drain()
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            if delivery is not None:
+                delivery.cancel()
+            raise
+        if delivery is not None:
+            # Let the packets still being delayed reach the other side before hanging up
+            pending.put_nowait((None, None))
+            await delivery
+
+    async def deliver(self, pending, writer):
+        loop = asyncio.get_running_loop()
+        while True:
+            deliver_at, packet = await pending.get()
+            if packet is None:
+                return
+            await asyncio.sleep(max(0.0, deliver_at - loop.time()))
+            try:
+                writer.write(packet)
+                await writer.drain()
+            except ConnectionError:
+                return
+
+    def start_in_thread(self):
+        """ Runs the relay on its own event loop in a daemon thread and returns once it listens """
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self.server.close()
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """ Stops a relay started with start_in_thread """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local unreliable relay for the RDT sender and receiver")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--seed", help="seed for reproducible loss, corruption and delay")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    relay = RelayServer(args.host, args.port, args.seed, verbose=not args.quiet)
+    try:
+        asyncio.run(relay.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    sys.exit(main())
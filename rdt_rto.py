@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# Retransmission timeout estimation from measured round trip times (RFC 6298)
+
+MIN_TIMEOUT = 0.05  # seconds, keeps a burst of tiny samples from causing spurious retransmits
+
+
+class RtoEstimator:
+    """
+     Keeps the retransmission timeout of a sender.
+
+     With adaptive=False the timeout is always initial_timeout, which is how the sender has
+     always behaved. With adaptive=True the timeout is computed from RTT samples as
+     SRTT + 4 * RTTVAR, doubled on every timeout, and never goes above initial_timeout.
+     Callers must follow Karn's rule and only pass samples of packets that were sent once.
+     on_sample, if given, is called with every sample, adaptive or not (see rdt_metrics.py).
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial_timeout, adaptive=False, min_timeout=MIN_TIMEOUT, on_sample=None):
+        self.adaptive = adaptive
+        self.on_sample = on_sample
+        self.max_timeout = float(initial_timeout)
+        self.min_timeout = min(min_timeout, self.max_timeout)
+        self.srtt = None
+        self.rttvar = None
+        self.rto = self.max_timeout
+        self.backoff_count = 0
+
+    @property
+    def timeout(self):
+        """ Current retransmission timeout in seconds """
+        return self.rto
+
+    def sample(self, rtt):
+        """ Updates the estimate with the round trip time of a packet that was not retransmitted """
+        if self.on_sample is not None:
+            self.on_sample(rtt)
+        if not self.adaptive:
+            return
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.backoff_count = 0
+        self.rto = self._clamp(self.srtt + self.K * self.rttvar)
+
+    def backoff(self):
+        """ Doubles the timeout after the retransmission timer fired """
+        if not self.adaptive:
+            return
+        self.backoff_count += 1
+        self.rto = self._clamp(self.rto * 2)
+
+    def _clamp(self, timeout):
+        return max(self.min_timeout, min(timeout, self.max_timeout))
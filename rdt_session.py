@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# Session mode: one relay connection carries many independent streams, each tagged with a stream ID
+# in the packet header and with its own sequence space, so many files cost a single handshake
+
+import os
+import asyncio
+from checksum import Checksum, ALGORITHMS
+from rdt_packet import (PROTOCOLS, PROTOCOL_SELECTIVE_REPEAT, DEFAULT_WINDOW_SIZE, FORMAT_BINARY, DEFAULT_MSS, MAX_MSS,
+                        MAX_STREAMS, KIND_DATA, KIND_ACK, SessionFormat, hello_options, negotiated_format)
+from rdt_rto import RtoEstimator
+from rdt_io import iter_file_segments, open_sink
+from rdt_ack import SenderStats
+from rdt_async import PacketQueue, read_packet, receive_packets, send_go_back_n, send_selective_repeat
+from rdt_connection import establish_connection_async
+
+MAX_CONCURRENT_STREAMS = 16  # streams in flight at once; the others wait for a free slot
+
+
+class Demultiplexer:
+    """
+     Reads the packets of a session connection and routes each one to the PacketQueue of its
+     stream. Packets whose checksum fails cannot be trusted to name their stream and are only
+     counted in corrupted. on_new_stream(stream_id), if given, is called for a packet of a
+     stream that has no queue yet and returns the queue to use (or None to drop it).
+    """
+
+    def __init__(self, reader, packet_format, kind, on_new_stream=None):
+        self.packet_format = packet_format
+        self.kind = kind
+        self.on_new_stream = on_new_stream
+        self.queues = {}  # stream_id -> PacketQueue
+        self.corrupted = 0
+        self.closed = False
+        self.task = asyncio.create_task(self._read(reader))
+
+    def open(self, stream_id):
+        """ Returns a new PacketQueue that receives the packets of stream_id """
+        queue = PacketQueue()
+        self.queues[stream_id] = queue
+        if self.closed:
+            queue.put(b'')
+        return queue
+
+    def discard(self, stream_id):
+        """ Drops the packets of a finished stream from now on """
+        self.queues.pop(stream_id, None)
+
+    async def _read(self, reader):
+        while True:
+            packet = await read_packet(reader, self.packet_format)
+            if not packet:
+                break
+            frame = self.packet_format.unpack_frame(packet, self.kind)
+            if frame is None:
+                self.corrupted += 1
+                continue
+            queue = self.queues.get(frame[0])
+            if queue is None and self.on_new_stream is not None:
+                queue = self.on_new_stream(frame[0])
+            if queue is not None:
+                queue.put(packet)
+        # Tell every stream that the connection is gone
+        self.closed = True
+        for queue in self.queues.values():
+            queue.put(b'')
+
+    def close(self):
+        self.task.cancel()
+
+
+async def connect_session(server_ip, server_port, connection_ID, role, loss_rate, corrupt_rate, max_delay, segment_size,
+                          checksum_algorithm):
+    """ Opens a connection in session mode; returns (reader, writer, packet_format) or raises ConnectionError """
+    options = hello_options(FORMAT_BINARY, segment_size, checksum_algorithm, session=True)
+    connection = await establish_connection_async(server_ip, server_port, connection_ID, role, loss_rate, corrupt_rate,
+                                                  max_delay, options)
+    if connection is None:
+        raise ConnectionError(f"Failed to establish connection {connection_ID}")
+    reader, writer = connection
+    packet_format = negotiated_format(options)
+    if not isinstance(packet_format, SessionFormat):
+        writer.close()
+        raise ConnectionError("the other side did not agree to session mode")
+    return reader, writer, packet_format
+
+
+async def send_session(server_ip, server_port, connection_ID, filenames, loss_rate=0, corrupt_rate=0, max_delay=0,
+                       transmission_timeout=60, protocol=PROTOCOL_SELECTIVE_REPEAT, window_size=DEFAULT_WINDOW_SIZE,
+                       adaptive_timeout=False, segment_size=DEFAULT_MSS, checksum_algorithm=None,
+                       max_streams=MAX_CONCURRENT_STREAMS):
+    """
+     Sends every file of filenames, whole, over one connection: file i becomes stream i, and up to
+     max_streams streams are interleaved on the connection at once. The receiver must run
+     receive_session with the same protocol.
+
+     Input:
+        filenames - the files to send (list of String, at most 65536)
+        the other arguments are the same as for PA2_sender.start_sender
+
+     Output:
+        list with (checksum_val, total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout)
+        for every file, in the order of filenames. Corrupted ACKs cannot be told apart by stream, so they are
+        not counted per file.
+    """
+    filenames = list(filenames)
+    if len(filenames) > MAX_STREAMS:
+        raise ValueError(f"a session carries at most {MAX_STREAMS} streams")
+    loss_rate = 0.0 if not (0.0 <= float(loss_rate) <= 1.0) else float(loss_rate)
+    corrupt_rate = 0.0 if not (0.0 <= float(corrupt_rate) <= 1.0) else float(corrupt_rate)
+    max_delay = 0 if not (0 <= int(max_delay) <= 5) else int(max_delay)
+    transmission_timeout = 3 if not (float(transmission_timeout) > 0) else float(transmission_timeout)
+    protocol = PROTOCOL_SELECTIVE_REPEAT if protocol not in PROTOCOLS else protocol
+    segment_size = DEFAULT_MSS if not (1 <= int(segment_size) <= MAX_MSS) else int(segment_size)
+    checksum_algorithm = None if checksum_algorithm not in ALGORITHMS else checksum_algorithm
+    max_streams = MAX_CONCURRENT_STREAMS if not (int(max_streams) >= 1) else int(max_streams)
+
+    reader, writer, packet_format = await connect_session(server_ip, server_port, connection_ID, "S", loss_rate, corrupt_rate,
+                                                          max_delay, segment_size, checksum_algorithm)
+    max_window = packet_format.max_window_size(protocol)
+    window_size = min(DEFAULT_WINDOW_SIZE, max_window) if not (1 <= int(window_size) <= max_window) else int(window_size)
+    demultiplexer = Demultiplexer(reader, packet_format, KIND_ACK)
+    slots = asyncio.Semaphore(max_streams)
+
+    async def send_stream(stream_id, filename):
+        async with slots:
+            acks = demultiplexer.open(stream_id)
+            file_checksum = Checksum()
+            segments = iter_file_segments(filename, file_checksum, packet_format.segment_size)
+            if os.path.getsize(filename) == 0:
+                segments = [b'']  # an empty segment, so that the stream of an empty file still opens on the receiver
+            rto = RtoEstimator(transmission_timeout, adaptive=bool(adaptive_timeout))
+            stream_format = packet_format.stream(stream_id)
+            try:
+                if protocol == PROTOCOL_SELECTIVE_REPEAT:
+                    stats = await send_selective_repeat(acks, writer, segments, window_size, rto, stream_format)
+                else:
+                    stats = await send_go_back_n(acks, writer, segments, window_size, rto, stream_format, protocol)
+            finally:
+                demultiplexer.discard(stream_id)
+            return SenderStats((file_checksum.value, *stats[:4]), *stats[4:])
+
+    try:
+        return list(await asyncio.gather(*(send_stream(i, filename) for i, filename in enumerate(filenames))))
+    finally:
+        demultiplexer.close()
+        writer.close()
+
+
+async def receive_session(server_ip, server_port, connection_ID, loss_rate=0.0, corrupt_rate=0.0, max_delay=0.0,
+                          protocol=PROTOCOL_SELECTIVE_REPEAT, window_size=DEFAULT_WINDOW_SIZE, outputs=None,
+                          segment_size=DEFAULT_MSS, checksum_algorithm=None):
+    """
+     Receives the streams of a send_session until the sender closes the connection.
+
+     Input:
+        outputs - outputs(stream_id) returns where that stream goes, as the output argument of
+                  PA2_receiver.start_receiver (default is None, the streams are only checksummed)
+        the other arguments are the same as for PA2_receiver.start_receiver
+
+     Output:
+        dict of stream_id -> checksum_val of every stream, empty files included
+    """
+    loss_rate = 0.0 if not (0.0 <= float(loss_rate) <= 1.0) else float(loss_rate)
+    corrupt_rate = 0.0 if not (0.0 <= float(corrupt_rate) <= 1.0) else float(corrupt_rate)
+    max_delay = 0 if not (0 <= int(max_delay) <= 5) else int(max_delay)
+    protocol = PROTOCOL_SELECTIVE_REPEAT if protocol not in PROTOCOLS else protocol
+    segment_size = DEFAULT_MSS if not (1 <= int(segment_size) <= MAX_MSS) else int(segment_size)
+    checksum_algorithm = None if checksum_algorithm not in ALGORITHMS else checksum_algorithm
+
+    reader, writer, packet_format = await connect_session(server_ip, server_port, connection_ID, "R", loss_rate, corrupt_rate,
+                                                          max_delay, segment_size, checksum_algorithm)
+    sinks = {}  # stream_id -> OutputSink
+    receivers = []
+
+    def on_new_stream(stream_id):
+        packets = demultiplexer.open(stream_id)
+        sinks[stream_id] = open_sink(outputs(stream_id) if outputs is not None else None)
+        receivers.append(asyncio.create_task(
+            receive_packets(packets, writer, packet_format.stream(stream_id), protocol, window_size, sinks[stream_id])))
+        return packets
+
+    demultiplexer = Demultiplexer(reader, packet_format, KIND_DATA, on_new_stream)
+    try:
+        await demultiplexer.task
+        await asyncio.gather(*receivers, return_exceptions=True)
+    finally:
+        demultiplexer.close()
+        writer.close()
+        for sink in sinks.values():
+            sink.close()
+    return {stream_id: sink.checksum.value for stream_id, sink in sorted(sinks.items())}
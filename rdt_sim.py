@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# Deterministic discrete-event simulation of the RDT sender and receiver: the coroutines of rdt_async.py
+# run on an event loop whose clock is virtual, over an in-memory channel that loses, corrupts and delays
+# packets like rdt_relay.py. Nothing sleeps and no socket is opened, so thousands of scenarios take
+# seconds, and a scenario replays exactly from its seed.
+
+import sys
+import random
+import asyncio
+import argparse
+import selectors
+from rdt_packet import (PROTOCOLS, PROTOCOL_STOP_AND_WAIT, PROTOCOL_SELECTIVE_REPEAT, DEFAULT_WINDOW_SIZE, FORMAT_BINARY,
+                        TextFormat)
+from rdt_rto import RtoEstimator
+from rdt_io import CallbackSink
+from rdt_ack import SenderStats, DEFAULT_ACK_EVERY, DEFAULT_ACK_DELAY
+from rdt_congestion import CongestionWindow
+from rdt_fec import ParityEncoder
+from rdt_relay import corrupt_packet, corrupt_binary_packet
+from rdt_async import PacketQueue, receive_packets, send_go_back_n, send_selective_repeat
+
+DEFAULT_LATENCY = 0.01  # seconds, one-way propagation delay of the simulated link
+DEFAULT_TIME_LIMIT = 24 * 3600.0  # virtual seconds after which a transfer counts as stuck
+
+
+class SimulationStalled(RuntimeError):
+    """ Every task waits for something that can never happen: no packet in flight and no timer set """
+
+
+class VirtualSelector:
+    """
+     Selector of a VirtualClockLoop. When the loop would block until its next timer, the
+     virtual clock jumps to that timer instead, and only ready I/O (the loop's own wakeup
+     pipe) is reported.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.selector = selectors.DefaultSelector()
+
+    def __getattr__(self, name):
+        return getattr(self.selector, name)
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise SimulationStalled("nothing is scheduled and nothing is in flight")
+        if timeout > 0:
+            self.loop.now += timeout
+        return self.selector.select(0)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """ Event loop whose time() starts at 0 and only moves when every task is waiting for a timer """
+
+    def __init__(self):
+        self.now = 0.0
+        super().__init__(VirtualSelector(self))
+
+    def time(self):
+        return self.now
+
+
+class Channel:
+    """
+     One direction of the simulated link, used as the writer of the side that sends into it.
+     Every packet is lost with loss_rate, otherwise corrupted with corrupt_rate, and delivered
+     into destination latency plus up to max_delay seconds later, never before the previous one.
+    """
+
+    def __init__(self, destination, loss_rate, corrupt_rate, max_delay, latency, rng, binary):
+        self.destination = destination
+        self.loss_rate = loss_rate
+        self.corrupt_rate = corrupt_rate
+        self.max_delay = max_delay
+        self.latency = latency
+        self.rng = rng
+        self.binary = binary
+        self.loop = asyncio.get_running_loop()
+        self.last_delivery = 0.0
+        self.sent = 0
+        self.lost = 0
+        self.corrupted = 0
+
+    def write(self, packet):
+        self.sent += 1
+        if self.rng.random() < self.loss_rate:
+            self.lost += 1
+            return
+        if self.rng.random() < self.corrupt_rate:
+            self.corrupted += 1
+            packet = corrupt_binary_packet(packet, self.rng) if self.binary else corrupt_packet(packet, self.rng)
+        delay = self.latency + (self.rng.uniform(0, self.max_delay) if self.max_delay else 0.0)
+        self.last_delivery = max(self.last_delivery, self.loop.time() + delay)
+        self.loop.call_at(self.last_delivery, self.destination.put, packet)
+
+    def writelines(self, packets):
+        for packet in packets:
+            self.write(packet)
+
+    def close(self):
+        """ Tells the other side the connection is over, once the packets in flight have arrived """
+        self.loop.call_at(max(self.last_delivery, self.loop.time()), self.destination.put, b'')
+
+    async def drain(self):
+        pass
+
+
+class SimulationResult:
+    """
+     Outcome of one simulated transfer:
+        completed - the sender got every segment acknowledged before the time limit
+        received - the bytes the receiver delivered, in order
+        stats - (total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout) of the
+                sender, with duplicate_acks and fast_retransmits attributes (rdt_ack.SenderStats)
+        elapsed - virtual seconds the transfer took
+        lost, corrupted - packets the channel lost or corrupted, both directions together
+    """
+
+    def __init__(self, data, completed, received, stats, elapsed, lost, corrupted):
+        self.data = data
+        self.completed = completed
+        self.received = received
+        self.stats = stats
+        self.elapsed = elapsed
+        self.lost = lost
+        self.corrupted = corrupted
+
+    @property
+    def ok(self):
+        """ The transfer finished and the receiver delivered exactly the data that was sent """
+        return self.completed and self.received == self.data
+
+    def __repr__(self):
+        return (f"SimulationResult(ok={self.ok}, elapsed={self.elapsed:.3f}, stats={tuple(self.stats)}, "
+                f"lost={self.lost}, corrupted={self.corrupted})")
+
+
+async def run_transfer(data, protocol, window_size, loss_rate, corrupt_rate, max_delay, seed, rto, packet_format, latency,
+                       ack_every, ack_delay, fast_retransmit, congestion_control, time_limit, fec):
+    loop = asyncio.get_running_loop()
+    binary = packet_format.name == FORMAT_BINARY
+    acks = PacketQueue()
+    packets = PacketQueue()
+    to_receiver = Channel(packets, loss_rate, corrupt_rate, max_delay, latency, random.Random(f"{seed}:S"), binary)
+    to_sender = Channel(acks, loss_rate, corrupt_rate, max_delay, latency, random.Random(f"{seed}:R"), binary)
+    received = bytearray()
+    fec = fec and binary and protocol == PROTOCOL_SELECTIVE_REPEAT
+    receiver = loop.create_task(receive_packets(packets, to_sender, packet_format, protocol, window_size,
+                                                CallbackSink(received.extend), ack_every, ack_delay, fec))
+
+    segments = (data[i:i + packet_format.segment_size] for i in range(0, len(data), packet_format.segment_size))
+    window = CongestionWindow(window_size) if congestion_control and protocol != PROTOCOL_STOP_AND_WAIT else window_size
+    if protocol == PROTOCOL_SELECTIVE_REPEAT:
+        sending = send_selective_repeat(acks, to_receiver, segments, window, rto, packet_format, fast_retransmit,
+                                        ParityEncoder(packet_format) if fec else None)
+    else:
+        sending = send_go_back_n(acks, to_receiver, segments, window, rto, packet_format, protocol, fast_retransmit)
+    completed = True
+    stats = (0, 0, 0, 0, 0, 0)
+    try:
+        stats = await asyncio.wait_for(sending, time_limit)
+    except asyncio.TimeoutError:
+        completed = False
+    elapsed = loop.time()
+    to_receiver.close()
+    try:
+        await asyncio.wait_for(receiver, latency + max_delay + 1)
+    except asyncio.TimeoutError:
+        pass
+    return SimulationResult(bytes(data), completed, bytes(received), SenderStats(stats[:4], *stats[4:]), elapsed,
+                            to_receiver.lost + to_sender.lost, to_receiver.corrupted + to_sender.corrupted)
+
+
+def simulate(data, protocol=PROTOCOL_SELECTIVE_REPEAT, window_size=DEFAULT_WINDOW_SIZE, loss_rate=0.0, corrupt_rate=0.0,
+             max_delay=0.0, seed=0, transmission_timeout=1.0, adaptive_timeout=False, packet_format=None,
+             latency=DEFAULT_LATENCY, ack_every=DEFAULT_ACK_EVERY, ack_delay=DEFAULT_ACK_DELAY, fast_retransmit=True,
+             congestion_control=False, time_limit=DEFAULT_TIME_LIMIT, fec=False):
+    """
+     Runs one transfer of data from a simulated sender to a simulated receiver, in virtual time.
+
+     Input:
+        data - the bytes to send (ASCII only with the text format)
+        seed - seeds the channel of each direction; the same arguments always give the same result
+        packet_format - an rdt_packet format object (default is None, the 30-byte text format)
+        latency - one-way delay of the link in seconds, on top of the random 0 to max_delay
+        time_limit - virtual seconds after which the transfer is abandoned as stuck
+        fec - send parity packets (selective repeat with a binary format only)
+        the other arguments are the same as for PA2_sender.start_sender and PA2_receiver.start_receiver
+
+     Output:
+        SimulationResult
+    """
+    protocol = PROTOCOL_SELECTIVE_REPEAT if protocol not in PROTOCOLS else protocol
+    packet_format = TextFormat() if packet_format is None else packet_format
+    max_window = packet_format.max_window_size(protocol)
+    window_size = min(DEFAULT_WINDOW_SIZE, max_window) if not (1 <= int(window_size) <= max_window) else int(window_size)
+    rto = RtoEstimator(transmission_timeout, adaptive=bool(adaptive_timeout))
+    loop = VirtualClockLoop()
+    try:
+        return loop.run_until_complete(run_transfer(
+            data, protocol, window_size, loss_rate, corrupt_rate, max_delay, seed, rto, packet_format, latency,
+            ack_every, ack_delay, fast_retransmit, congestion_control, time_limit, fec))
+    finally:
+        loop.close()
+
+
+def sweep(data, seeds, **scenario):
+    """ Simulates the scenario once per seed; returns the seeds whose transfer failed, each with its result """
+    failures = []
+    for seed in seeds:
+        result = simulate(data, seed=seed, **scenario)
+        if not result.ok:
+            failures.append((seed, result))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate many RDT transfers in virtual time")
+    parser.add_argument("--file", default="declaration.txt")
+    parser.add_argument("--bytes", type=int, default=200, help="bytes of the file to send")
+    parser.add_argument("--protocol", choices=PROTOCOLS, default=PROTOCOL_SELECTIVE_REPEAT)
+    parser.add_argument("--window-size", type=int, default=DEFAULT_WINDOW_SIZE)
+    parser.add_argument("--loss-rate", type=float, default=0.1)
+    parser.add_argument("--corrupt-rate", type=float, default=0.1)
+    parser.add_argument("--max-delay", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--adaptive-timeout", action="store_true")
+    parser.add_argument("--scenarios", type=int, default=1000, help="number of seeds to run, from --seed on")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    with open(args.file, 'rb') as file:
+        data = file.read(args.bytes)
+    failures = sweep(data, range(args.seed, args.seed + args.scenarios), protocol=args.protocol,
+                     window_size=args.window_size, loss_rate=args.loss_rate, corrupt_rate=args.corrupt_rate,
+                     max_delay=args.max_delay, transmission_timeout=args.timeout, adaptive_timeout=args.adaptive_timeout)
+    for seed, result in failures:
+        print(f"seed {seed}: {result}")
+    print(f"{args.scenarios - len(failures)} of {args.scenarios} scenarios delivered the data")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
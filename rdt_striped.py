@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Striped transfers: the file is cut into N contiguous stripes that travel at the same time over N
+# connection IDs derived from the one given, so a transfer is no longer bound to a single RTT-bound pipe
+
+import os
+import sys
+import asyncio
+import argparse
+import tempfile
+from rdt_packet import (PROTOCOLS, PROTOCOL_SELECTIVE_REPEAT, DEFAULT_WINDOW_SIZE, FORMAT_TEXT, TEXT_SEGMENT_SIZE,
+                        DEFAULT_MSS)
+from rdt_io import CHUNK_SIZE, CallbackSink, open_sink
+from rdt_ack import SenderStats, DEFAULT_ACK_EVERY, DEFAULT_ACK_DELAY
+from rdt_async import start_receiver_async, start_sender_async
+
+DEFAULT_STRIPES = 4
+MAX_STRIPES = 64
+
+
+def stripe_connection_id(connection_ID, index):
+    """ Connection ID of stripe index; both sides derive the same ones from the ID of the transfer """
+    return f"{connection_ID}-{index}"
+
+
+def stripe_ranges(size, stripes, segment_size):
+    """
+     Cuts size bytes into stripes contiguous (offset, length) ranges, as even as possible in whole
+     segments, so only the last packet of the last stripe is short. Stripes may be empty.
+    """
+    segments = -(-size // segment_size)
+    ranges = []
+    for index in range(stripes):
+        first = segments * index // stripes
+        last = segments * (index + 1) // stripes
+        offset = min(first * segment_size, size)
+        ranges.append((offset, min(last * segment_size, size) - offset))
+    return ranges
+
+
+def stripe_error(result):
+    """ True if a stripe's transfer raised; exceptions that are not errors, such as cancellation, are raised again """
+    if isinstance(result, BaseException) and not isinstance(result, Exception):
+        raise result
+    if isinstance(result, Exception):
+        print(f"An error occurred: {result}")
+        return True
+    return False
+
+
+class StripeSink(CallbackSink):
+    """ CallbackSink of one stripe, complete once the empty segment send_striped puts after its data arrived """
+
+    def __init__(self, callback):
+        super().__init__(callback)
+        self.complete = False
+
+    def write(self, data):
+        if not len(data):
+            self.complete = True
+            return
+        super().write(data)
+
+    def finish(self):
+        if not self.complete:
+            raise ConnectionError("Stripe ended before its end mark")
+
+
+async def send_striped(server_ip, server_port, connection_ID, filename, stripes=DEFAULT_STRIPES, loss_rate=0, corrupt_rate=0,
+                       max_delay=0, transmission_timeout=60, protocol=PROTOCOL_SELECTIVE_REPEAT, window_size=DEFAULT_WINDOW_SIZE,
+                       adaptive_timeout=False, packet_format=FORMAT_TEXT, segment_size=DEFAULT_MSS, checksum_algorithm=None,
+                       fast_retransmit=True, congestion_control=False):
+    """
+     Sends the whole file as stripes concurrent transfers, stripe i over connection ID
+     stripe_connection_id(connection_ID, i). The receiver must run receive_striped with the same
+     connection ID, number of stripes and packet format.
+
+     Input:
+        stripes - number of stripes (int - default is 4, the value should be between 1 to 64)
+        the other arguments are the same as for PA2_sender.start_sender
+
+     Output:
+        (checksum_val, total_packet_sent, total_packet_recv, total_corrupted_pkt_recv, total_timeout)
+        of the whole file, the counters summed over the stripes (rdt_ack.SenderStats);
+        checksum_val is "00000" if any stripe failed
+    """
+    stripes = DEFAULT_STRIPES if not (1 <= int(stripes) <= MAX_STRIPES) else int(stripes)
+    protocol = PROTOCOL_SELECTIVE_REPEAT if protocol not in PROTOCOLS else protocol
+    # Text packets always carry 20 bytes, whatever segment size the binary format would use
+    stripe_segment = segment_size if packet_format != FORMAT_TEXT else TEXT_SEGMENT_SIZE
+    ranges = stripe_ranges(os.path.getsize(filename), stripes, stripe_segment)
+
+    results = await asyncio.gather(*(
+        start_sender_async(server_ip, server_port, stripe_connection_id(connection_ID, index), loss_rate, corrupt_rate,
+                           max_delay, transmission_timeout, filename, protocol, window_size, adaptive_timeout,
+                           packet_format=packet_format, segment_size=segment_size, checksum_algorithm=checksum_algorithm,
+                           fast_retransmit=fast_retransmit, congestion_control=congestion_control,
+                           offset=offset, length=length, end_mark=True)
+        for index, (offset, length) in enumerate(ranges)), return_exceptions=True)
+
+    # start_sender_async keeps its counters at zero when the transfer fails, so a stripe with data and
+    # no packet sent did not go through; one failed stripe fails the whole file
+    failed = [index for index, (stats, (offset, length)) in enumerate(zip(results, ranges))
+              if stripe_error(stats) or (length and not stats[1])]
+    results = [stats for stats in results if not isinstance(stats, BaseException)]
+    totals = [sum(stats[i] for stats in results) for i in range(1, 5)]
+    if failed:
+        print(f"Stripes {failed} of {connection_ID} failed")
+        checksum_val = "00000"
+    else:
+        # The file checksum is a plain byte sum, so the whole file's is the sum of the stripes'
+        checksum_val = format(sum(int(stats[0]) for stats in results), '05d')
+    return SenderStats((checksum_val, *totals), sum(stats.duplicate_acks for stats in results),
+                       sum(stats.fast_retransmits for stats in results))
+
+
+async def receive_striped(server_ip, server_port, connection_ID, stripes=DEFAULT_STRIPES, loss_rate=0.0, corrupt_rate=0.0,
+                          max_delay=0.0, protocol=PROTOCOL_SELECTIVE_REPEAT, window_size=DEFAULT_WINDOW_SIZE, output=None,
+                          packet_format=FORMAT_TEXT, segment_size=DEFAULT_MSS, checksum_algorithm=None,
+                          ack_every=DEFAULT_ACK_EVERY, ack_delay=DEFAULT_ACK_DELAY):
+    """
+     Receives the stripes of a send_striped and reassembles them in order into output. The first
+     stripe goes straight to output, the others are spooled to temporary files until it is done.
+     A stripe is only complete once the empty segment its sender puts after the data arrived.
+
+     Input:
+        stripes - number of stripes, as given to send_striped (int - default is 4, the value should be between 1 to 64)
+        the other arguments are the same as for PA2_receiver.start_receiver
+
+     Output:
+        checksum_val - the checksum value of the whole file received (String that always has 5 digits),
+                       "00000" if any stripe failed; the output then holds the first stripe at most
+    """
+    stripes = DEFAULT_STRIPES if not (1 <= int(stripes) <= MAX_STRIPES) else int(stripes)
+    protocol = PROTOCOL_SELECTIVE_REPEAT if protocol not in PROTOCOLS else protocol
+    sink = open_sink(output)
+    spools = [tempfile.TemporaryFile() for _ in range(stripes - 1)]
+    try:
+        outputs = [StripeSink(sink.write)] + [StripeSink(spool.write) for spool in spools]
+        results = await asyncio.gather(*(
+            start_receiver_async(server_ip, server_port, stripe_connection_id(connection_ID, index), loss_rate, corrupt_rate,
+                                 max_delay, protocol, window_size, stripe_output, packet_format, segment_size,
+                                 checksum_algorithm, ack_every, ack_delay)
+            for index, stripe_output in enumerate(outputs)), return_exceptions=True)
+        # A stripe whose sender stopped early, even before any of its data, never got its end mark
+        failed = [index for index, (checksum_val, stripe_output) in enumerate(zip(results, outputs))
+                  if stripe_error(checksum_val) or not stripe_output.complete]
+        if failed:
+            print(f"Stripes {failed} of {connection_ID} failed")
+            return "00000"
+        for spool in spools:
+            spool.seek(0)
+            while chunk := spool.read(CHUNK_SIZE):
+                sink.write(chunk)
+        return sink.checksum.value
+    finally:
+        for spool in spools:
+            spool.close()
+        sink.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send or receive one file as parallel stripes")
+    parser.add_argument("role", choices=("send", "receive"))
+    parser.add_argument("server_ip")
+    parser.add_argument("server_port", type=int)
+    parser.add_argument("connection_id")
+    parser.add_argument("filename", help="file to send, or where to write the received file")
+    parser.add_argument("--stripes", type=int, default=DEFAULT_STRIPES)
+    parser.add_argument("--protocol", choices=PROTOCOLS, default=PROTOCOL_SELECTIVE_REPEAT)
+    parser.add_argument("--window-size", type=int, default=DEFAULT_WINDOW_SIZE)
+    parser.add_argument("--format", dest="packet_format", default=FORMAT_TEXT)
+    args = parser.parse_args(argv)
+    if args.role == "send":
+        stats = asyncio.run(send_striped(args.server_ip, args.server_port, args.connection_id, args.filename, args.stripes,
+                                         protocol=args.protocol, window_size=args.window_size, adaptive_timeout=True,
+                                         packet_format=args.packet_format))
+        print("File checksum: {}".format(stats[0]))
+        print("Total packet sent: {}".format(stats[1]))
+    else:
+        checksum_val = asyncio.run(receive_striped(args.server_ip, args.server_port, args.connection_id, args.stripes,
+                                                   protocol=args.protocol, window_size=args.window_size, output=args.filename,
+                                                   packet_format=args.packet_format))
+        print("File checksum: {}".format(checksum_val))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,36 @@
+import asyncio
+
+from rdt_async import start_receiver_async, start_sender_async
+from rdt_relay import RelayServer
+
+FILENAME = "declaration.txt"
+CHECKSUM_VAL = "18693"
+RELAY_SEED = 11
+
+
+async def transfer(port: int, connection_id: str, protocol: str, loss: float, sender_kwargs: dict, **kwargs):
+    return await asyncio.gather(
+        start_sender_async("127.0.0.1", port, connection_id, loss, loss, 0, 1, FILENAME, protocol, 8, **sender_kwargs, **kwargs),
+        start_receiver_async("127.0.0.1", port, connection_id, loss, loss, 0, protocol, 8, **kwargs),
+    )
+
+
+def test_many_transfers_on_one_loop(relay: RelayServer) -> None:
+    async def run_all():
+        return await asyncio.gather(*(
+            transfer(relay.port, f"async{i}", ("saw", "gbn", "sr")[i % 3], 0.1, {"adaptive_timeout": True}) for i in range(60)
+        ))
+
+    results = asyncio.run(run_all())
+    for sender_stats, receiver_checksum in results:
+        assert sender_stats[0] == receiver_checksum == CHECKSUM_VAL
+        assert len(sender_stats) == 5 and sender_stats[1] >= 10
+
+
+def test_binary_stream(relay: RelayServer) -> None:
+    with open(FILENAME, "rb") as file:
+        expected = format(sum(file.read()), "05d")
+    sender_stats, receiver_checksum = asyncio.run(
+        transfer(relay.port, "asyncbin", "sr", 0.1, {"stream": True}, packet_format="bin", segment_size=256)
+    )
+    assert sender_stats[0] == receiver_checksum == expected
@@ -0,0 +1,98 @@
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+import PA2_sender
+from checksum import checksum
+from rdt_metrics import TransferMetrics
+from rdt_checkpoint import Checkpoint, ResumableSink, checkpoint_path, load_checkpoint
+from rdt_packet import negotiate_options
+from rdt_relay import RelayServer
+from PA2_receiver import start_receiver
+from PA2_sender import start_sender
+
+FILENAME = "declaration.txt"
+RELAY_SEED = 23
+
+
+def test_resumable_sink(tmp_path: Path) -> None:
+    output = str(tmp_path / "received.txt")
+    sink = ResumableSink(output, "ckpt")
+    assert sink.offset == 0
+    sink.start(0)
+    sink.write(b"0")  # the sender's first segment: where it continues from
+    sink.write(b"hello ")
+    sink.close()
+    assert load_checkpoint(output, "ckpt") == Checkpoint("ckpt", 6, sum(b"hello "))
+    assert load_checkpoint(output, "other") is None
+
+    sink = ResumableSink(output, "ckpt")
+    assert sink.offset == 6
+    sink.start(6)
+    sink.close()  # dropped before the sender said where it continues from: nothing changes
+    assert load_checkpoint(output, "ckpt") == Checkpoint("ckpt", 6, sum(b"hello "))
+
+    sink = ResumableSink(output, "ckpt")
+    sink.start(6)
+    sink.write(b"4")  # the sender could only go back further
+    sink.write(b"o world")
+    sink.write(b"")
+    assert not sink.interrupted
+    sink.close()
+    assert Path(output).read_bytes() == b"hello world"
+    assert sink.checksum.value == checksum(b"hello world")
+    assert not Path(checkpoint_path(output)).exists()
+
+
+def test_resume_offset_is_negotiated() -> None:
+    assert negotiate_options({"RESUME": "8053"}, {"RESUME": "4096:1234"})["RESUME"] == "4096:1234"
+    assert negotiate_options({"RESUME": "4096:1234"}, {"RESUME": "4096"})["RESUME"] == "4096:1234"
+    # A sender with less than the receiver's checkpoint has another file: no checksum to resume with
+    assert negotiate_options({"RESUME": "2048"}, {"RESUME": "4096:1234"})["RESUME"] == "2048"
+    assert "RESUME" not in negotiate_options({"RESUME": "8053"}, {"FORMAT": "bin"})
+
+
+@pytest.mark.parametrize("source_changes", [False, True])
+def test_interrupted_transfer_resumes(relay: RelayServer, tmp_path: Path, monkeypatch: pytest.MonkeyPatch,
+                                      source_changes: bool) -> None:
+    source = tmp_path / "source.txt"
+    source.write_bytes(Path(FILENAME).read_bytes())
+    output = tmp_path / "received.txt"
+    connection_id = f"resume{int(source_changes)}"
+    kwargs = {"packet_format": "bin", "segment_size": 256, "resume": True}
+    iter_file_segments = PA2_sender.iter_file_segments
+
+    def dropping_segments(*args, **kwargs):
+        for index, segment in enumerate(iter_file_segments(*args, **kwargs)):
+            if index == 16:
+                raise ConnectionResetError("connection dropped")
+            yield segment
+
+    def transfer(metrics=None):
+        with ThreadPool(2) as pool:
+            receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, "sr", 8),
+                                        dict(kwargs, output=str(output), metrics=metrics))
+            sender = pool.apply_async(start_sender, ("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, 1, str(source),
+                                                     "sr", 8), dict(kwargs, adaptive_timeout=True))
+            return sender.get(timeout=60), receiver.get(timeout=60)
+
+    monkeypatch.setattr(PA2_sender, "iter_file_segments", dropping_segments)
+    first_stats, first_checksum = transfer()
+    assert first_stats[0] == first_checksum == "00000"
+    checkpoint = load_checkpoint(str(output), connection_id)
+    assert checkpoint is not None and 0 < checkpoint.offset <= 16 * 256
+
+    monkeypatch.setattr(PA2_sender, "iter_file_segments", iter_file_segments)
+    if source_changes:
+        # Same size, different bytes before the checkpoint: resuming would splice two files
+        source.write_bytes(source.read_bytes().upper())
+    receiver_metrics = TransferMetrics("receiver", connection_id)
+    stats, checksum_val = transfer(receiver_metrics)
+    data = source.read_bytes()
+    assert stats[0] == checksum_val == checksum(data)
+    assert output.read_bytes() == data
+    assert not Path(checkpoint_path(str(output))).exists()
+    # Only the rest of the file went out the second time, after the offset the sender continued from
+    offset = 0 if source_changes else checkpoint.offset
+    assert receiver_metrics.payload_bytes == len(data) - offset + len(str(offset))
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from checksum import ALGORITHMS, CRC32, INTERNET, SUM, Checksum, checksum, checksum_verifier, compute
+from rdt_packet import BinaryFormat, TextFormat, negotiate_options
+
+
+def test_course_checksum_is_unchanged() -> None:
+    assert checksum("1 0 That was the time fo ") == "02018"
+    assert checksum_verifier("1 0 That was the time fo 02018")
+    assert not checksum_verifier("1 0 That was the time fo 02019")
+
+
+def test_known_values() -> None:
+    # RFC 1071 section 3 example, and the standard CRC-32 check value
+    assert compute(bytes.fromhex("0001f203f4f5f6f7"), INTERNET) == 0x220D
+    assert compute(b"123456789", CRC32) == 0xCBF43926
+    assert compute(b"\x01", INTERNET) == 0xFEFF
+
+
+@pytest.mark.parametrize("algorithm", ALGORITHMS)
+def test_incremental_matches_one_shot(algorithm: str) -> None:
+    rng = random.Random(algorithm)
+    data = bytes(rng.randrange(256) for _ in range(1001))
+    running = Checksum(algorithm)
+    offset = 0
+    while offset < len(data):
+        step = rng.randrange(0, 8)  # odd and empty pieces included
+        running.update(data[offset:offset + step])
+        offset += step
+    assert running.digest() == compute(data, algorithm)
+
+
+def test_internet_checksum_detects_reordering() -> None:
+    assert compute(b"abcd", SUM) == compute(b"badc", SUM)
+    assert compute(b"abcd", INTERNET) != compute(b"badc", INTERNET)
+
+
+def test_checksum_is_negotiated() -> None:
+    text = negotiate_options({"CKSUM": INTERNET}, {"CKSUM": INTERNET})
+    assert text["CKSUM"] == INTERNET
+    # CRC32 does not fit the five digits of a text packet, and both sides must ask
+    assert negotiate_options({"CKSUM": CRC32}, {"CKSUM": CRC32})["CKSUM"] == SUM
+    assert negotiate_options({"FORMAT": "bin", "CKSUM": INTERNET}, {"FORMAT": "bin"})["CKSUM"] == CRC32
+
+
+@pytest.mark.parametrize("packet_format", [TextFormat(INTERNET), BinaryFormat(64, INTERNET), BinaryFormat(64, SUM)])
+def test_formats_use_the_negotiated_checksum(packet_format) -> None:
+    packet = packet_format.data_packet(5, b"twenty bytes of data")
+    assert packet_format.parse_data(packet) == (5, b"twenty bytes of data")
+    assert packet_format.parse_ack(packet_format.ack_packet(7)) == 7
+    corrupted = packet[:6] + bytes([packet[6] ^ 0x20]) + packet[7:]
+    assert packet_format.parse_data(corrupted) is None
@@ -0,0 +1,50 @@
+import pytest
+
+from checksum import checksum_verifier
+from rdt_codec import SEQ_MODULUS, TextCodec
+from rdt_packet import encode_seq, make_ack_packet, make_data_packet
+
+
+@pytest.mark.parametrize("algorithm", ["sum", "inet"])
+def test_same_bytes_as_the_string_packets(algorithm: str) -> None:
+    codec = TextCodec(algorithm)
+    for seq_num in range(SEQ_MODULUS):
+        for data in ("", "When in the Course", "x" * 20):
+            expected = make_data_packet(encode_seq(seq_num), data, algorithm).encode()
+            assert codec.data_packet(seq_num, data.encode()) == expected
+        assert codec.ack_packet(seq_num) == make_ack_packet(encode_seq(seq_num), algorithm).encode()
+        assert codec.ack_packet(seq_num, 31) == make_ack_packet(encode_seq(seq_num), algorithm, encode_seq(31)).encode()
+    assert checksum_verifier(TextCodec().data_packet(1, b"That was the time fo").decode())
+
+
+def test_acks_are_cached() -> None:
+    codec = TextCodec()
+    assert codec.ack_packet(1) is codec.ack_packet(1)
+    first = codec.data_packet(0, b"a long first segment")
+    second = codec.data_packet(1, b"short")
+    assert first[4:24] == b"a long first segment"  # not changed by the next packet
+    assert codec.parse_data(second) == (1, b"short")
+    with pytest.raises(ValueError):
+        codec.data_packet(0, b"x" * 21)
+
+
+def test_parse_views_without_decoding() -> None:
+    codec = TextCodec()
+    packet = bytearray(codec.data_packet(5, b"payload"))
+    assert codec.parse_data(memoryview(packet)) == (5, b"payload")
+    packet[7] ^= 1
+    assert codec.parse_data(memoryview(packet)) is None
+    ack = memoryview(bytearray(codec.ack_packet(7, 12)))
+    assert (codec.parse_ack(ack), codec.ack_number(ack), codec.ack_window(ack)) == (7, 7, 12)
+    assert codec.parse_ack(ack[:29]) is None
+    assert codec.parse_ack(b"\xff" + codec.ack_packet(7)[1:]) is None
+
+
+def test_trailing_nul_bytes_are_data() -> None:
+    codec = TextCodec()
+    for data in (b"ends with NULs\0\0", b"\0" * 20, b"\0" * 3, b"", b"x" * 20):
+        assert codec.parse_data(codec.data_packet(7, data)) == (7, data)
+    # The empty end-of-file segment of a resumed transfer is not a segment of NULs
+    assert codec.data_packet(0, b"") != codec.data_packet(0, b"\0" * 20)
+    # Full segments keep the course's "0" in the ACK field
+    assert codec.data_packet(1, b"That was the time fo")[:4] == b"1 0 "
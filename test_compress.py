@@ -0,0 +1,105 @@
+import asyncio
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+from checksum import checksum
+from rdt_io import CallbackSink
+import PA2_sender
+from rdt_compress import DecompressingSink, TruncatedStreamError, compress_segments
+from rdt_packet import negotiate_options
+from rdt_relay import RelayServer
+from rdt_async import start_receiver_async, start_sender_async
+from PA2_receiver import start_receiver
+from PA2_sender import start_sender
+
+FILENAME = "declaration.txt"
+RELAY_SEED = 20
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "lzma"])
+def test_compress_round_trip(algorithm: str) -> None:
+    data = Path(FILENAME).read_bytes()
+    segments = list(compress_segments((data[i:i + 1000] for i in range(0, len(data), 1000)), algorithm, 100))
+    assert all(len(segment) == 100 for segment in segments[:-1])
+    received = bytearray()
+    sink = DecompressingSink(CallbackSink(received.extend), algorithm)
+    for segment in segments:
+        sink.write(segment)
+    assert bytes(received) == data
+    assert sink.checksum.value == checksum(data)
+    assert sink.bytes_written == sum(map(len, segments)) < len(data)
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "lzma"])
+def test_truncated_stream_is_detected(algorithm: str) -> None:
+    data = Path(FILENAME).read_bytes()
+    segments = list(compress_segments([data], algorithm, 100))
+    for received in (segments[:-1], segments + [b"trailing"]):
+        sink = DecompressingSink(CallbackSink(lambda data: None), algorithm)
+        with pytest.raises(TruncatedStreamError):
+            for segment in received:
+                sink.write(segment)
+            sink.finish()
+
+
+def test_compression_needs_both_sides_and_binary() -> None:
+    binary = {"FORMAT": "bin", "MSS": "512"}
+    assert negotiate_options(dict(binary, COMPRESS="zlib"), dict(binary, COMPRESS="zlib"))["COMPRESS"] == "zlib"
+    assert "COMPRESS" not in negotiate_options(dict(binary, COMPRESS="zlib"), dict(binary, COMPRESS="lzma"))
+    assert "COMPRESS" not in negotiate_options(dict(binary, COMPRESS="zlib"), binary)
+    assert "COMPRESS" not in negotiate_options({"COMPRESS": "zlib"}, {"COMPRESS": "zlib"})
+
+
+@pytest.mark.parametrize("receiver_compression", ["zlib", "lzma", None])
+def test_compressed_transfer(relay: RelayServer, tmp_path: Path, receiver_compression: str) -> None:
+    output = tmp_path / "received.txt"
+    connection_id = f"compress{receiver_compression}"
+    common = {"packet_format": "bin", "segment_size": 512}
+
+    async def run():
+        return await asyncio.gather(
+            start_sender_async("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, 1, FILENAME, "sr", 8,
+                               adaptive_timeout=True, stream=True, compression=receiver_compression or "zlib", **common),
+            start_receiver_async("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, "sr", 8, str(output),
+                                 compression=receiver_compression, **common),
+        )
+
+    sender_stats, checksum_val = asyncio.run(run())
+    data = Path(FILENAME).read_bytes()
+    assert sender_stats[0] == checksum_val == checksum(data)
+    assert output.read_bytes() == data
+
+
+def test_compression_sends_fewer_packets(relay: RelayServer) -> None:
+    sent = {}
+    for compression in ("zlib", None):
+        connection_id = f"fewer{compression}"
+        kwargs = {"packet_format": "bin", "segment_size": 256, "compression": compression}
+        with ThreadPool(2) as pool:
+            receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, connection_id, 0.0, 0.0, 0, "gbn", 8), kwargs)
+            sender = pool.apply_async(
+                start_sender, ("127.0.0.1", relay.port, connection_id, 0.0, 0.0, 0, 1, FILENAME, "gbn", 8),
+                dict(kwargs, stream=True)
+            )
+            stats = sender.get(timeout=60)
+            assert receiver.get(timeout=60) == stats[0] == checksum(Path(FILENAME).read_bytes())
+        sent[compression] = stats[1]
+    assert sent["zlib"] < sent[None] / 2
+
+
+def test_truncated_transfer_fails(relay: RelayServer, monkeypatch: pytest.MonkeyPatch) -> None:
+    def truncated_segments(*args):
+        *segments, _ = PA2_sender_compress_segments(*args)
+        return iter(segments)  # the sender stops one segment short of the end of the compressed stream
+
+    PA2_sender_compress_segments = PA2_sender.compress_segments
+    monkeypatch.setattr(PA2_sender, "compress_segments", truncated_segments)
+    kwargs = {"packet_format": "bin", "segment_size": 256, "compression": "zlib"}
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, "truncated", 0.0, 0.0, 0, "gbn", 8), kwargs)
+        sender = pool.apply_async(start_sender, ("127.0.0.1", relay.port, "truncated", 0.0, 0.0, 0, 1, FILENAME, "gbn", 8),
+                                  dict(kwargs, stream=True))
+        assert sender.get(timeout=60)[0] == checksum(Path(FILENAME).read_bytes())
+        assert receiver.get(timeout=60) == "00000"
@@ -0,0 +1,46 @@
+from rdt_congestion import CongestionWindow, FixedWindow
+from rdt_packet import BinaryFormat, TextFormat
+
+
+def test_slow_start_then_additive_increase() -> None:
+    congestion = CongestionWindow(32, ssthresh=4)
+    assert congestion.window == 1
+    congestion.on_ack(3)
+    assert congestion.window == 4
+    # Past ssthresh a whole window of ACKs adds a single packet
+    congestion.on_ack(4)
+    assert congestion.window == 4 and congestion.cwnd > 4.9
+    congestion.on_ack()
+    assert congestion.window == 5
+
+
+def test_losses_shrink_the_window() -> None:
+    congestion = CongestionWindow(32)
+    congestion.on_ack(15)
+    assert congestion.window == 16
+    congestion.on_fast_retransmit()
+    assert (congestion.window, congestion.ssthresh) == (8, 8)
+    congestion.on_timeout()
+    assert (congestion.window, congestion.ssthresh) == (1, 4)
+
+
+def test_window_is_bounded_by_sender_and_receiver() -> None:
+    congestion = CongestionWindow(8)
+    congestion.on_ack(100)
+    assert congestion.window == 8
+    congestion.advertise(3)
+    assert congestion.window == 3
+    congestion.advertise(None)  # an ACK without a window keeps the last one
+    assert congestion.window == 3
+    fixed = FixedWindow(16)
+    fixed.on_timeout()
+    assert fixed.window == 16
+    fixed.advertise(4)
+    assert fixed.window == 4
+
+
+def test_ack_carries_receive_window() -> None:
+    for packet_format in (TextFormat(), BinaryFormat()):
+        assert packet_format.ack_window(packet_format.ack_packet(5, 12)) == 12
+        assert packet_format.parse_ack(packet_format.ack_packet(5, 12)) == 5
+        assert packet_format.ack_window(packet_format.ack_packet(5)) is None
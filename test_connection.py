@@ -0,0 +1,67 @@
+import random
+import socket
+import threading
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from checksum import checksum
+from PA2_receiver import start_receiver
+from PA2_sender import start_sender
+from rdt_connection import ConnectionPool, HandshakeError, backoff_delay, establish_connection, parse_response
+from rdt_relay import RelayServer
+
+FILENAME = "declaration.txt"
+
+
+def test_responses_in_fragments() -> None:
+    assert parse_response(b"WAI", False) is None
+    assert parse_response(b"WAITINGOK", False) == ("WAITING", 7)
+    # A bare OK is complete at once: what follows is already a packet
+    assert parse_response(b"\nOK0 0 data", False) == ("OK", 3)
+    assert parse_response(b"OK FORMAT=bin", True) is None
+    assert parse_response(b"OK FORMAT=bin\n", True) == ("OK FORMAT=bin", 14)
+    assert parse_response(b"ERROR no peer", False) is None
+    with pytest.raises(HandshakeError):
+        parse_response(b"HELLO", False)
+
+
+def test_backoff_is_jittered_and_capped() -> None:
+    rng = random.Random(1)
+    delays = [backoff_delay(attempt, rng) for attempt in range(12)]
+    assert len(set(delays)) == len(delays)
+    assert all(0 <= delay <= 5 for delay in delays)
+    assert max(delays[:2]) <= 0.2
+
+
+def test_retries_until_the_relay_is_up() -> None:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    relay = RelayServer(port=port)
+    threading.Timer(0.3, relay.start_in_thread).start()
+    try:
+        with ThreadPool(2) as pool:
+            connections = [
+                pool.apply_async(establish_connection, ("127.0.0.1", port, "retry", role, 0, 0, 0), {"retries": 10})
+                for role in ("S", "R")
+            ]
+            sockets = [connection.get(timeout=30) for connection in connections]
+        assert all(sockets)
+        for sock in sockets:
+            sock.close()
+    finally:
+        relay.stop()
+
+
+@pytest.mark.parametrize("relay", [3], indirect=True)
+def test_pooled_connections_skip_the_handshake(relay: RelayServer) -> None:
+    with ConnectionPool() as connections, ThreadPool(2) as pool:
+        for role in ("S", "R"):
+            connections.prepare("127.0.0.1", relay.port, "pooled", role)
+        receiver = pool.apply_async(start_receiver, ("127.0.0.1", 1, "pooled"), {"pool": connections})
+        sender = pool.apply_async(start_sender, ("127.0.0.1", 1, "pooled", 0, 0, 0, 1, FILENAME), {"pool": connections})
+        # Port 1 is never contacted: both connections come from the pool
+        with open(FILENAME) as file:
+            expected = checksum(file.read(200))
+        assert sender.get(timeout=30)[0] == receiver.get(timeout=30) == expected
@@ -0,0 +1,142 @@
+import pytest
+
+from rdt_core import GoBackNSender, RdtReceiver, make_sender
+from rdt_packet import BinaryFormat, TextFormat
+from rdt_rto import RtoEstimator
+
+with open("declaration.txt", "rb") as file:
+    DATA = file.read(2000)
+
+
+def transfer(sender, receiver, lost, duplicated=()):
+    """
+     Runs both state machines against each other without I/O, losing the data packets numbered in
+     lost and delivering those numbered in duplicated twice
+    """
+    now, sent, delivered = 0.0, 0, bytearray()
+    packets = sender.start(now)
+    while not sender.done:
+        acks = []
+        for packet in packets:
+            sent += 1
+            if sent in lost:
+                continue
+            for _ in range(2 if sent in duplicated else 1):
+                new_acks, payloads = receiver.packet_received(packet, now)
+                acks += new_acks
+                delivered += b"".join(payloads)
+        if receiver.deadline is not None:
+            now = max(now, receiver.deadline)
+            acks += receiver.timer_expired(now)
+        now += 0.01  # one way, for every round
+        packets = [packet for ack in acks for packet in sender.ack_received(ack, now)]
+        if not acks:
+            now = max(now, sender.deadline)
+            packets = sender.timer_expired(now)
+    return bytes(delivered)
+
+
+@pytest.mark.parametrize("protocol,window_size", [("saw", 1), ("gbn", 8), ("sr", 8)])
+@pytest.mark.parametrize("packet_format", [TextFormat(), BinaryFormat(64)])
+def test_state_machines_recover_losses(protocol: str, window_size: int, packet_format) -> None:
+    segments = [DATA[i:i + packet_format.segment_size] for i in range(0, len(DATA), packet_format.segment_size)]
+    sender = make_sender(segments, packet_format, protocol, window_size, RtoEstimator(1.0))
+    receiver = RdtReceiver(packet_format, protocol, window_size)
+    assert transfer(sender, receiver, lost={2, 9, 10, 30}) == DATA
+    total_packet_sent, _, _, total_timeout, _, total_fast_retransmit = sender.stats()
+    assert total_packet_sent > len(segments)
+    assert total_timeout + total_fast_retransmit > 0
+
+
+def test_timer_resends_the_window() -> None:
+    packet_format = TextFormat()
+    sender = GoBackNSender([b"a", b"b", b"c"], packet_format, 4, RtoEstimator(2.0))
+    burst = sender.start(10.0)
+    assert [packet_format.parse_data(packet)[0] for packet in burst] == [0, 1, 2]
+    assert sender.deadline == 12.0
+    assert sender.ack_received(packet_format.ack_packet(0), 10.5) == []
+    assert sender.deadline == 12.5
+    assert sender.timer_expired(12.5) == burst[1:]
+    assert sender.ack_received(packet_format.ack_packet(2), 13.0) == [] and sender.done
+    assert sender.deadline is None
+
+
+def test_go_back_n_receiver_delivers_in_order_only() -> None:
+    packet_format = TextFormat()
+    receiver = RdtReceiver(packet_format, "gbn", ack_every=1)
+    data = [packet_format.data_packet(seq, b"segment %d" % seq) for seq in range(4)]
+    assert receiver.packet_received(data[0], 0.0) == ([packet_format.ack_packet(0)], [b"segment 0"])
+    # Packet 1 is lost: 2 and 3 are discarded and only repeat the ACK of 0
+    assert receiver.packet_received(data[2], 0.1) == ([packet_format.ack_packet(0)], [])
+    assert receiver.packet_received(data[3], 0.1) == ([packet_format.ack_packet(0)], [])
+    assert receiver.packet_received(data[1], 0.2) == ([packet_format.ack_packet(1)], [b"segment 1"])
+    # A duplicate is not delivered again, and gets the cumulative ACK at once
+    assert receiver.packet_received(data[1], 0.3) == ([packet_format.ack_packet(1)], [])
+    assert receiver.packet_received(data[2], 0.4) == ([packet_format.ack_packet(2)], [b"segment 2"])
+
+
+def test_go_back_n_receiver_wraps_the_sequence_space() -> None:
+    packet_format = TextFormat()
+    receiver = RdtReceiver(packet_format, "gbn", ack_every=1)
+    modulus = packet_format.seq_modulus("gbn")
+    assert modulus == 62
+    for index in range(modulus + 2):
+        acks, payloads = receiver.packet_received(packet_format.data_packet(index, b"%d" % index), 0.0)
+        assert payloads == [b"%d" % index] and acks == [packet_format.ack_packet(index % modulus)]
+    # A late copy of packet 61 of the first lap is a duplicate, not the next segment
+    assert receiver.packet_received(packet_format.data_packet(61, b"61"), 0.0) == ([packet_format.ack_packet(1)], [])
+
+
+@pytest.mark.parametrize("window_size", [16, 61])
+def test_go_back_n_recovers_loss_and_duplicates_across_wraps(window_size: int) -> None:
+    packet_format = TextFormat()
+    segments = [DATA[i:i + 10] for i in range(0, len(DATA), 10)]  # 200 segments, over three laps of 62
+    sender = GoBackNSender(segments, packet_format, window_size, RtoEstimator(1.0))
+    receiver = RdtReceiver(packet_format, "gbn", window_size)
+    delivered = transfer(sender, receiver, lost={5, 61, 62, 63, 120, 190}, duplicated={3, 40, 62, 64, 100, 150})
+    assert delivered == DATA
+
+
+def test_selective_repeat_receiver_buffers_out_of_order() -> None:
+    packet_format = TextFormat()
+    receiver = RdtReceiver(packet_format, "sr", 8)
+    data = [packet_format.data_packet(seq, b"segment %d" % seq) for seq in range(13)]
+
+    def ack(seq):
+        return packet_format.ack_packet(seq, 8)  # every ACK advertises the receive window
+
+    assert receiver.packet_received(data[0], 0.0) == ([ack(0)], [b"segment 0"])
+    # Packet 1 is lost: 2 and 3 are acknowledged one by one and held back
+    assert receiver.packet_received(data[2], 0.1) == ([ack(2)], [])
+    assert receiver.packet_received(data[3], 0.1) == ([ack(3)], [])
+    assert receiver.packet_received(data[1], 0.2) == ([ack(1)], [b"segment 1", b"segment 2", b"segment 3"])
+    # A duplicate of a delivered packet is acknowledged again, as its ACK may have been lost
+    assert receiver.packet_received(data[2], 0.3) == ([ack(2)], [])
+    # Beyond the window and not in the previous one: dropped without an ACK, like a corrupted packet
+    assert receiver.packet_received(data[12], 0.4) == ([], [])
+    assert receiver.packet_received(b"#" + data[4][1:], 0.4) == ([], [])
+
+
+def test_selective_repeat_receiver_wraps_the_sequence_space() -> None:
+    packet_format = TextFormat()
+    receiver = RdtReceiver(packet_format, "sr", 31)
+    for seq in range(60):
+        assert receiver.packet_received(packet_format.data_packet(seq, b"first %d" % seq), 0.0)[1] == [b"first %d" % seq]
+    # 61, then 0 and 1 of the next lap, arrive ahead of 60 and wait for it
+    for seq, payload in ((61, b"first 61"), (0, b"second 0"), (1, b"second 1")):
+        assert receiver.packet_received(packet_format.data_packet(seq, payload), 0.1)[1] == []
+    delivered = receiver.packet_received(packet_format.data_packet(60, b"first 60"), 0.2)[1]
+    assert delivered == [b"first 60", b"first 61", b"second 0", b"second 1"]
+    # A late copy of packet 40 of the first lap is in the previous window: acknowledged, not delivered
+    late = packet_format.data_packet(40, b"first 40")
+    assert receiver.packet_received(late, 0.3) == ([packet_format.ack_packet(40, 31)], [])
+
+
+@pytest.mark.parametrize("window_size", [8, 31])
+def test_selective_repeat_recovers_loss_and_duplicates_across_wraps(window_size: int) -> None:
+    packet_format = TextFormat()
+    segments = [DATA[i:i + 10] for i in range(0, len(DATA), 10)]  # 200 segments, over three laps of 62
+    sender = make_sender(segments, packet_format, "sr", window_size, RtoEstimator(1.0))
+    receiver = RdtReceiver(packet_format, "sr", window_size)
+    delivered = transfer(sender, receiver, lost={5, 61, 62, 63, 120, 190}, duplicated={3, 40, 62, 64, 100, 150})
+    assert delivered == DATA
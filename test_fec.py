@@ -0,0 +1,90 @@
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+from checksum import checksum
+from rdt_fec import MAX_GROUP, MIN_GROUP, ParityDecoder, ParityEncoder, group_size_for
+from rdt_packet import BinaryFormat, negotiate_options
+from rdt_relay import RelayServer
+from rdt_sim import simulate
+from PA2_receiver import start_receiver
+from PA2_sender import start_sender
+
+FILENAME = "declaration.txt"
+RELAY_SEED = 21
+
+
+def test_group_size_follows_loss_rate() -> None:
+    assert group_size_for(0.0) == MAX_GROUP
+    assert group_size_for(0.05) == 10
+    assert group_size_for(0.5) == MIN_GROUP
+    encoder = ParityEncoder(BinaryFormat(16))
+    for _ in range(100):
+        encoder.observe(True)
+    assert encoder.group_size == MIN_GROUP
+    for _ in range(100):
+        encoder.observe(False)
+    assert encoder.group_size == MAX_GROUP
+
+
+@pytest.mark.parametrize("missing", [0, 1, 2])
+def test_rebuilds_one_missing_segment(missing: int) -> None:
+    packet_format = BinaryFormat(16)
+    segments = [b"a" * 16, b"b" * 16, b"\0tail\0"]  # the short last segment keeps its zero bytes
+    encoder = ParityEncoder(packet_format, group_size=3)
+    parities = [encoder.add(seq, segment) for seq, segment in enumerate(segments)]
+    assert parities[:2] == [None, None]
+
+    decoder = ParityDecoder(packet_format, packet_format.seq_modulus("sr"))
+    for seq, segment in enumerate(segments):
+        if seq != missing:
+            packet = packet_format.data_packet(seq, segment)
+            assert decoder.receive(packet, packet_format.parse_data(packet)) == [(seq, segment, False)]
+    assert decoder.receive(parities[2], packet_format.parse_data(parities[2])) == [(missing, segments[missing], True)]
+
+
+def test_waits_for_retransmission_when_two_are_missing() -> None:
+    packet_format = BinaryFormat(16)
+    encoder = ParityEncoder(packet_format, group_size=4)
+    segments = [bytes([i]) * 16 for i in range(4)]
+    parity = [encoder.add(seq, segment) for seq, segment in enumerate(segments)][-1]
+    decoder = ParityDecoder(packet_format, packet_format.seq_modulus("sr"))
+    assert decoder.receive(parity, None) == []
+    for seq in (0, 3):
+        packet = packet_format.data_packet(seq, segments[seq])
+        assert decoder.receive(packet, packet_format.parse_data(packet)) == [(seq, segments[seq], False)]
+    # The retransmission of one of the two leaves one missing, which the parity gives back
+    packet = packet_format.data_packet(1, segments[1])
+    assert decoder.receive(packet, packet_format.parse_data(packet)) == [(1, segments[1], False), (2, segments[2], True)]
+
+
+def test_fec_needs_both_sides_and_binary() -> None:
+    binary = {"FORMAT": "bin", "MSS": "512"}
+    assert negotiate_options(dict(binary, FEC="1"), dict(binary, FEC="1"))["FEC"] == "1"
+    assert "FEC" not in negotiate_options(dict(binary, FEC="1"), binary)
+    assert "FEC" not in negotiate_options({"FEC": "1"}, {"FEC": "1"})
+    assert "FEC" not in negotiate_options(dict(binary, FEC="1", MSS="65535"), dict(binary, FEC="1", MSS="65535"))
+
+
+def test_fec_shortens_lossy_transfers() -> None:
+    data = Path(FILENAME).read_bytes() * 4
+    scenario = dict(protocol="sr", window_size=16, loss_rate=0.1, transmission_timeout=2.0, latency=0.2,
+                    packet_format=BinaryFormat(256))
+    plain = [simulate(data, seed=seed, **scenario) for seed in range(20)]
+    fec = [simulate(data, seed=seed, fec=True, **scenario) for seed in range(20)]
+    assert all(result.ok for result in plain + fec)
+    assert sum(result.elapsed for result in fec) < 0.8 * sum(result.elapsed for result in plain)
+    assert sum(result.stats[3] for result in fec) < sum(result.stats[3] for result in plain)
+
+
+def test_fec_transfer(relay: RelayServer) -> None:
+    kwargs = {"packet_format": "bin", "segment_size": 256, "fec": True}
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, "fec", 0.2, 0.2, 0, "sr", 8), kwargs)
+        sender = pool.apply_async(
+            start_sender, ("127.0.0.1", relay.port, "fec", 0.2, 0.2, 0, 1, FILENAME, "sr", 8),
+            dict(kwargs, adaptive_timeout=True, stream=True)
+        )
+        stats = sender.get(timeout=120)
+        assert receiver.get(timeout=120) == stats[0] == checksum(Path(FILENAME).read_bytes())
@@ -0,0 +1,80 @@
+import socket
+
+import pytest
+
+from rdt_framing import HAVE_SENDMSG, MAX_IOV, PacketReader, send_packets
+from rdt_packet import BinaryFormat, TextFormat
+
+
+def test_coalesced_and_split_packets() -> None:
+    packet_format = TextFormat()
+    packets = [packet_format.data_packet(i, f"segment {i}".encode()) for i in range(3)]
+    stream = b"".join(packets)
+    left, right = socket.socketpair()
+    with left, right:
+        reader = PacketReader(right, packet_format, capacity=64)
+        left.sendall(stream[:45])  # one packet and a half
+        assert bytes(reader.read_packet()) == packets[0]
+        left.sendall(stream[45:])
+        assert bytes(reader.read_packet()) == packets[1]
+        assert bytes(reader.read_packet()) == packets[2]
+        left.close()
+        assert not reader.read_packet()
+
+
+def test_partial_packet_survives_a_timeout() -> None:
+    packet_format = BinaryFormat(segment_size=100)
+    packet = packet_format.data_packet(7, bytes(range(100)))
+    left, right = socket.socketpair()
+    with left, right:
+        right.settimeout(0.05)
+        reader = PacketReader(right, packet_format)
+        left.sendall(packet[:1])  # not even the whole length prefix
+        with pytest.raises(socket.timeout):
+            reader.read_packet()
+        left.sendall(packet[1:] + packet_format.ack_packet(3))
+        assert packet_format.parse_data(reader.read_packet()) == (7, bytes(range(100)))
+        assert packet_format.parse_ack(reader.read_packet()) == 3
+
+
+class CountingSocket:
+    """ Counts the sendmsg calls and hands out at most limit bytes per call, like a full send buffer """
+
+    def __init__(self, sock, limit):
+        self.sock = sock
+        self.limit = limit
+        self.calls = 0
+
+    def sendmsg(self, buffers):
+        self.calls += 1
+        data = b"".join(bytes(buffer) for buffer in buffers)[:self.limit]
+        self.sock.sendall(data)
+        return len(data)
+
+
+@pytest.mark.skipif(not HAVE_SENDMSG, reason="no sendmsg on this platform")
+@pytest.mark.parametrize("count,limit,calls", [(8, 10 ** 6, 1), (MAX_IOV + 1, 10 ** 6, 2), (8, 45, 6)])
+def test_send_packets_gathers_a_burst(count: int, limit: int, calls: int) -> None:
+    packet_format = TextFormat()
+    packets = [packet_format.data_packet(i % 10, b"x" * 20) for i in range(count)]
+    left, right = socket.socketpair()
+    with left, right:
+        counting = CountingSocket(left, limit)
+        send_packets(counting, packets)
+        assert counting.calls == calls
+        reader = PacketReader(right, packet_format)
+        assert [bytes(reader.read_packet()) for _ in packets] == packets
+        assert not reader.buffered()
+
+
+def test_buffered_packets_need_no_syscall() -> None:
+    packet_format = TextFormat()
+    left, right = socket.socketpair()
+    with left, right:
+        reader = PacketReader(right, packet_format)
+        send_packets(left, [packet_format.ack_packet(i) for i in range(3)])
+        reader.read_packet()
+        assert reader.buffered()
+        reader.read_packet()
+        reader.read_packet()
+        assert not reader.buffered()
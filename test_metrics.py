@@ -0,0 +1,72 @@
+import json
+import socket
+from multiprocessing.pool import ThreadPool
+
+import pytest
+
+from PA2_receiver import start_receiver
+from PA2_sender import start_sender
+import rdt_framing
+from rdt_framing import PacketReader, send_packets
+from rdt_metrics import Histogram, NullMetrics, TransferMetrics
+from rdt_packet import TextFormat
+from rdt_relay import RelayServer
+
+FILENAME = "declaration.txt"
+RELAY_SEED = 13
+
+
+def test_histogram() -> None:
+    histogram = Histogram((0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5, 20):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(1.0) == float("inf")
+
+
+@pytest.mark.parametrize("gather", [True, False])
+def test_packets_are_counted_not_syscalls(gather: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(rdt_framing, "HAVE_SENDMSG", gather and rdt_framing.HAVE_SENDMSG)
+    packet_format = TextFormat()
+    sending, receiving = TransferMetrics("sender", "count"), TransferMetrics("receiver", "count")
+    left, right = socket.socketpair()
+    with left, right:
+        send_packets(sending.socket(left), [packet_format.ack_packet(i) for i in range(3)])
+        left.shutdown(socket.SHUT_WR)
+        reader = PacketReader(receiving.socket(right), packet_format)
+        while reader.read_packet():
+            pass  # the three packets most likely arrive with one recv_into, then EOF
+    assert (sending.packets_sent, sending.bytes_sent) == (3, 90)
+    assert (receiving.packets_received, receiving.bytes_received) == (3, 90)
+
+
+def test_null_metrics_record_nothing() -> None:
+    metrics = NullMetrics()
+    metrics.observe_rtt(0.1)
+    assert metrics.rtt.count == 0
+
+
+def test_transfer_metrics(relay: RelayServer) -> None:
+    sender_metrics = TransferMetrics("sender", "metrics")
+    receiver_metrics = TransferMetrics("receiver", "metrics")
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, "metrics", 0.1, 0.1, 0, "sr"),
+                                    {"metrics": receiver_metrics})
+        sender = pool.apply_async(start_sender, ("127.0.0.1", relay.port, "metrics", 0.1, 0.1, 0, 1, FILENAME, "sr"),
+                                  {"adaptive_timeout": True, "metrics": sender_metrics})
+        sender_stats = sender.get(timeout=60)
+        assert receiver.get(timeout=60) == sender_stats[0]
+
+    assert sender_metrics.packets_sent == sender_stats[1] and sender_metrics.segments == 10
+    assert sender_metrics.bytes_sent == 30 * sender_stats[1]
+    assert sender_metrics.rtt.count > 0 and sender_metrics.handshake_seconds is not None
+    assert sender_metrics.retransmission_ratio == (sender_stats[1] - 10) / sender_stats[1]
+    assert receiver_metrics.payload_bytes == sender_metrics.payload_bytes == 200
+    assert receiver_metrics.retransmission_ratio is None and receiver_metrics.recv_blocked > 0
+
+    exported = json.loads(sender_metrics.to_json())
+    assert sum(point["payload_bytes"] for point in exported["timeline"]) == 200
+    text = receiver_metrics.to_prometheus()
+    assert 'rdt_payload_bytes_total{role="receiver",connection_id="metrics"} 200' in text
+    assert 'rdt_rtt_seconds_bucket{role="receiver",connection_id="metrics",le="+Inf"} 0' in text
@@ -1,3 +1,4 @@
+import os
 import random
 from dataclasses import dataclass
 from multiprocessing.pool import ThreadPool
@@ -8,8 +9,9 @@ import pytest
 from PA2_receiver import start_receiver
 from PA2_sender import start_sender
 
-SERVER_IP = "gaia.cs.umass.edu"
-SERVER_PORT = 20008
+# Point RDT_SERVER_IP/RDT_SERVER_PORT at a local rdt_relay.py to run without gaia.cs.umass.edu
+SERVER_IP = os.environ.get("RDT_SERVER_IP", "gaia.cs.umass.edu")
+SERVER_PORT = int(os.environ.get("RDT_SERVER_PORT", "20008"))
 FILENAME = "declaration.txt"
 CHECKSUM_VAL = "18693"
 TOTAL_NUMBER_OF_SEGMENTS = 10
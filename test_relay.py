@@ -0,0 +1,154 @@
+import socket
+import time
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+from checksum import checksum
+from PA2_receiver import start_receiver
+from PA2_sender import start_sender
+from rdt_io import MmapSink
+from rdt_relay import HelloError, RelayServer, parse_hello
+
+FILENAME = "declaration.txt"
+CHECKSUM_VAL = "18693"
+RELAY_SEED = 7
+
+
+def hello(port: int, message: str) -> str:
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+        sock.sendall(message.encode())
+        return sock.recv(1024).decode()
+
+
+def test_parse_hello() -> None:
+    assert parse_hello("HELLO S 0.25 0.0 2 1234") == ("S", 0.25, 0.0, 2.0, "1234", {})
+    assert parse_hello("HELLO R 0 0 0 1234 FORMAT=bin MSS=512")[-1] == {"FORMAT": "bin", "MSS": "512"}
+    with pytest.raises(HelloError):
+        parse_hello("HELLO X 0 0 0 1234")
+    with pytest.raises(HelloError):
+        parse_hello("HELLO S 2 0 0 1234")
+
+
+def test_malformed_hello_is_rejected(relay: RelayServer) -> None:
+    assert hello(relay.port, "HI there").startswith("ERROR")
+
+
+def test_same_role_twice_is_rejected(relay: RelayServer) -> None:
+    with socket.create_connection(("127.0.0.1", relay.port), timeout=5) as first:
+        first.sendall(b"HELLO S 0 0 0 4242")
+        assert first.recv(1024) == b"WAITING"
+        assert hello(relay.port, "HELLO S 0 0 0 4242").startswith("ERROR")
+
+
+def test_hello_split_across_segments(relay: RelayServer) -> None:
+    with socket.create_connection(("127.0.0.1", relay.port), timeout=5) as sock:
+        sock.sendall(b"HELLO S 0 0 0 split FORMAT=")
+        time.sleep(0.3)  # longer than HELLO_PAUSE: only the newline ends this HELLO
+        sock.sendall(b"bin MSS=64\n")
+        assert sock.recv(1024) == b"WAITING\n"
+
+
+@pytest.mark.parametrize(
+    "protocol,sender_loss,receiver_loss",
+    [("saw", 0.0, 0.0), ("gbn", 0.0, 0.0), ("sr", 0.0, 0.0), ("gbn", 0.2, 0.2), ("sr", 0.2, 0.2)],
+)
+def test_transfer_through_local_relay(relay: RelayServer, protocol: str, sender_loss: float, receiver_loss: float) -> None:
+    connection_id = f"{protocol}{int(sender_loss * 100)}"
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(
+            start_receiver, ("127.0.0.1", relay.port, connection_id, receiver_loss, 0.0, 0, protocol)
+        )
+        sender = pool.apply_async(
+            start_sender,
+            ("127.0.0.1", relay.port, connection_id, sender_loss, 0.0, 0, 1, FILENAME, protocol),
+            {"adaptive_timeout": True},
+        )
+        sender_stats = sender.get(timeout=60)
+        assert receiver.get(timeout=60) == CHECKSUM_VAL
+    assert sender_stats[0] == CHECKSUM_VAL
+    assert sender_stats[1] >= 10
+
+
+def test_stream_whole_file(relay: RelayServer, tmp_path: Path) -> None:
+    with open(FILENAME) as file:
+        whole_file_checksum = checksum(file.read())
+    output = tmp_path / "received.txt"
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(
+            start_receiver,
+            ("127.0.0.1", relay.port, "stream", 0.05, 0.0, 0, "sr", 16),
+            {"output": MmapSink(output, size_hint=1024)},
+        )
+        sender = pool.apply_async(
+            start_sender,
+            ("127.0.0.1", relay.port, "stream", 0.05, 0.0, 0, 1, FILENAME, "sr", 16),
+            {"adaptive_timeout": True, "stream": True},
+        )
+        assert sender.get(timeout=60)[0] == whole_file_checksum
+        assert receiver.get(timeout=60) == whole_file_checksum
+    assert output.read_bytes() == Path(FILENAME).read_bytes()
+
+
+@pytest.mark.parametrize("receiver_format,expected_sent", [("bin", 1), ("text", 10)])
+def test_binary_format_is_negotiated(relay: RelayServer, receiver_format: str, expected_sent: int) -> None:
+    connection_id = f"fmt{receiver_format}"
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(
+            start_receiver,
+            ("127.0.0.1", relay.port, connection_id, 0.0, 0.0, 0, "gbn"),
+            {"packet_format": receiver_format},
+        )
+        sender = pool.apply_async(
+            start_sender,
+            ("127.0.0.1", relay.port, connection_id, 0.0, 0.0, 0, 1, FILENAME, "gbn"),
+            {"packet_format": "bin", "segment_size": 512},
+        )
+        sender_stats = sender.get(timeout=60)
+        assert receiver.get(timeout=60) == CHECKSUM_VAL
+    # 200 bytes fit in one binary packet, the text fallback needs ten
+    assert sender_stats[:2] == (CHECKSUM_VAL, expected_sent)
+
+
+@pytest.mark.parametrize("packet_format,algorithm", [("text", "inet"), ("bin", "sum")])
+def test_checksum_algorithm_is_negotiated(relay: RelayServer, packet_format: str, algorithm: str) -> None:
+    connection_id = f"cksum{packet_format}"
+    kwargs = {"packet_format": packet_format, "checksum_algorithm": algorithm}
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, connection_id, 0.0, 0.2, 0), kwargs)
+        sender = pool.apply_async(
+            start_sender, ("127.0.0.1", relay.port, connection_id, 0.0, 0.2, 0, 1, FILENAME), dict(kwargs, adaptive_timeout=True)
+        )
+        assert sender.get(timeout=60)[0] == CHECKSUM_VAL
+        assert receiver.get(timeout=60) == CHECKSUM_VAL
+
+
+@pytest.mark.parametrize("ack_every,max_acks", [(1, 10), (4, 3)])
+def test_delayed_cumulative_acks(relay: RelayServer, ack_every: int, max_acks: int) -> None:
+    connection_id = f"delack{ack_every}"
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(
+            start_receiver, ("127.0.0.1", relay.port, connection_id, 0.0, 0.0, 0, "gbn", 10), {"ack_every": ack_every}
+        )
+        sender = pool.apply_async(start_sender, ("127.0.0.1", relay.port, connection_id, 0.0, 0.0, 0, 1, FILENAME, "gbn", 10))
+        sender_stats = sender.get(timeout=60)
+        assert receiver.get(timeout=60) == CHECKSUM_VAL
+    # Ten segments: every one acknowledged, or two full groups of four and the deadline for the rest
+    assert sender_stats[0] == CHECKSUM_VAL
+    assert sender_stats[2] <= max_acks and sender_stats[4] == 0
+
+
+@pytest.mark.parametrize("protocol,receiver_window", [("gbn", 10), ("sr", 10), ("sr", 2)])
+def test_congestion_control(relay: RelayServer, protocol: str, receiver_window: int) -> None:
+    connection_id = f"cwnd{protocol}{receiver_window}"
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(
+            start_receiver, ("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, protocol, receiver_window)
+        )
+        sender = pool.apply_async(
+            start_sender, ("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, 1, FILENAME, protocol, 16),
+            {"adaptive_timeout": True, "congestion_control": True},
+        )
+        assert sender.get(timeout=60)[0] == CHECKSUM_VAL
+        assert receiver.get(timeout=60) == CHECKSUM_VAL
@@ -0,0 +1,82 @@
+import pytest
+
+import PA2_sender
+from rdt_core import make_sender
+from rdt_packet import TextFormat
+from rdt_rto import MIN_TIMEOUT, RtoEstimator
+
+
+def test_samples_update_srtt_and_rttvar() -> None:
+    rto = RtoEstimator(3, adaptive=True)
+    assert rto.timeout == 3.0
+    rto.sample(0.2)
+    assert (rto.srtt, rto.rttvar) == pytest.approx((0.2, 0.1))
+    assert rto.timeout == pytest.approx(0.2 + 4 * 0.1)
+    rto.sample(0.4)
+    # RTTVAR = 3/4 * 0.1 + 1/4 * |0.2 - 0.4|, then SRTT = 7/8 * 0.2 + 1/8 * 0.4
+    assert (rto.srtt, rto.rttvar) == pytest.approx((0.225, 0.125))
+    assert rto.timeout == pytest.approx(0.225 + 4 * 0.125)
+
+
+def test_backoff_doubles_up_to_the_initial_timeout() -> None:
+    rto = RtoEstimator(3, adaptive=True)
+    rto.sample(0.2)
+    timeouts = []
+    for _ in range(4):
+        rto.backoff()
+        timeouts.append(rto.timeout)
+    assert timeouts == pytest.approx([1.2, 2.4, 3.0, 3.0])
+    assert rto.backoff_count == 4
+
+
+def test_timeout_never_goes_below_the_minimum() -> None:
+    rto = RtoEstimator(3, adaptive=True)
+    for _ in range(10):
+        rto.sample(0.001)
+    assert rto.timeout == MIN_TIMEOUT
+    # An initial timeout below the minimum is both bounds
+    assert RtoEstimator(0.01, adaptive=True).min_timeout == 0.01
+
+
+def test_new_sample_resets_the_backoff() -> None:
+    rto = RtoEstimator(3, adaptive=True)
+    rto.sample(0.2)
+    rto.backoff()
+    rto.backoff()
+    rto.sample(0.2)
+    assert rto.backoff_count == 0
+    assert rto.timeout == pytest.approx(rto.srtt + 4 * rto.rttvar)
+
+
+def test_fixed_timeout_still_reports_samples() -> None:
+    samples = []
+    rto = RtoEstimator(2.5, on_sample=samples.append)
+    rto.sample(0.3)
+    rto.backoff()
+    assert rto.timeout == 2.5 and samples == [0.3]
+
+
+@pytest.mark.parametrize("protocol", ["gbn", "sr"])
+def test_karn_rule_skips_retransmitted_packets(protocol: str) -> None:
+    packet_format = TextFormat()
+    samples = []
+    sender = make_sender([b"a", b"b"], packet_format, protocol, 2, RtoEstimator(1.0, adaptive=True, on_sample=samples.append))
+    sender.start(0.0)
+    sender.ack_received(packet_format.ack_packet(0), 0.3)
+    assert samples == pytest.approx([0.3])
+    assert sender.timer_expired(sender.deadline)  # packet 1 goes out a second time
+    sender.ack_received(packet_format.ack_packet(1), 2.5)
+    assert sender.done and samples == pytest.approx([0.3])
+
+
+def test_start_sender_keeps_a_fractional_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    class Stop(Exception):
+        pass
+
+    def recording_estimator(initial_timeout, **kwargs):
+        raise Stop(initial_timeout)
+
+    monkeypatch.setattr(PA2_sender, "RtoEstimator", recording_estimator)
+    with pytest.raises(Stop) as stopped:
+        PA2_sender.start_sender("127.0.0.1", 0, "rto", 0, 0, 0, "0.5")
+    assert stopped.value.args == (0.5,)
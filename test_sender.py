@@ -0,0 +1,81 @@
+import socket
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import pytest
+
+from checksum import checksum
+from PA2_receiver import start_receiver
+from PA2_sender import send_go_back_n, send_selective_repeat, start_sender
+from rdt_framing import PacketReader
+from rdt_packet import TextFormat
+from rdt_relay import RelayServer
+from rdt_rto import RtoEstimator
+
+SEGMENTS = [f"segment {i:02d}".encode() for i in range(8)]
+LOST = 1  # the first transmission of this segment never reaches the receiver
+RELAY_SEED = 17
+
+
+def lossy_receiver(sock: socket.socket, selective: bool) -> None:
+    """ Loses the first copy of segment LOST and acknowledges like the Go-Back-N or Selective Repeat receiver """
+    packet_format = TextFormat()
+    reader = PacketReader(sock, packet_format)
+    expected, received, lost = 0, set(), False
+    while expected < len(SEGMENTS):
+        seq, _ = packet_format.parse_data(reader.read_packet())
+        if seq == LOST and not lost:
+            lost = True
+            continue
+        if selective:
+            received.add(seq)
+            while expected in received:
+                expected += 1
+            sock.sendall(packet_format.ack_packet(seq))
+        else:
+            if seq == expected:
+                expected += 1
+            sock.sendall(packet_format.ack_packet(expected - 1))
+    sock.close()
+
+
+@pytest.mark.parametrize("selective", [False, True])
+def test_single_loss_is_fast_retransmitted(selective: bool) -> None:
+    sender_socket, receiver_socket = socket.socketpair()
+    receiver = threading.Thread(target=lossy_receiver, args=(receiver_socket, selective), daemon=True)
+    receiver.start()
+    started = time.monotonic()
+    with sender_socket:
+        send = send_selective_repeat if selective else send_go_back_n
+        stats = send(sender_socket, SEGMENTS, 6, RtoEstimator(30), TextFormat())
+    receiver.join(timeout=5)
+    sent, _, _, timeouts, duplicate_acks, fast_retransmits = stats
+    # Recovered long before the 30 second timer, by resending once
+    assert time.monotonic() - started < 5
+    assert (timeouts, fast_retransmits) == (0, 1)
+    if selective:
+        assert (duplicate_acks, sent) == (0, len(SEGMENTS) + 1)
+    else:
+        # Segments 2 to 6 each bring back the ACK of segment 0, and the window 1-6 goes again
+        assert (duplicate_acks, sent) == (5, len(SEGMENTS) + 6)
+
+
+@pytest.mark.parametrize("protocol", ["saw", "sr"])
+@pytest.mark.parametrize("content", [
+    "Ünïcödé déclaration, naïve café — « 20 bytes » ✓\n".encode() * 10,
+    b"segment with NULs\0\0\0" * 5 + b"\0" * 20 + b"short tail\0\0",  # NULs where padding would go
+])
+def test_text_stream_sends_any_bytes(relay: RelayServer, tmp_path: Path, protocol: str, content: bytes) -> None:
+    source = tmp_path / "source.txt"
+    source.write_bytes(content)
+    output = tmp_path / "received.txt"
+    connection_id = f"bytes{protocol}{content[:1].hex()}"
+    with ThreadPool(2) as pool:
+        receiver = pool.apply_async(start_receiver, ("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, protocol),
+                                    {"output": str(output)})
+        sender = pool.apply_async(start_sender, ("127.0.0.1", relay.port, connection_id, 0.1, 0.1, 0, 1, str(source),
+                                                 protocol), {"stream": True, "adaptive_timeout": True})
+        assert sender.get(timeout=60)[0] == receiver.get(timeout=60) == checksum(source.read_bytes())
+    assert output.read_bytes() == source.read_bytes()
@@ -0,0 +1,36 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from checksum import checksum
+from rdt_relay import RelayServer
+from rdt_session import receive_session, send_session
+
+RELAY_SEED = 5
+
+
+@pytest.mark.parametrize("protocol", ["gbn", "sr"])
+def test_many_files_over_one_connection(relay: RelayServer, tmp_path: Path, protocol: str) -> None:
+    files = []
+    for i in range(20):
+        path = tmp_path / f"file{i}.txt"
+        path.write_text(f"file number {i} " * (i * 7 + 1))
+        files.append(path)
+    files.append(tmp_path / "empty.txt")
+    files[-1].write_bytes(b"")
+    received = tmp_path / "received"
+    received.mkdir()
+
+    async def run():
+        return await asyncio.gather(
+            send_session("127.0.0.1", relay.port, f"session{protocol}", files, 0.1, 0.1, 0, 1, protocol, 4,
+                         adaptive_timeout=True, segment_size=64, max_streams=5),
+            receive_session("127.0.0.1", relay.port, f"session{protocol}", 0.1, 0.1, 0, protocol, 4,
+                            outputs=lambda stream_id: received / f"{stream_id}.txt", segment_size=64),
+        )
+
+    sent, checksums = asyncio.run(run())
+    for i, path in enumerate(files):
+        assert sent[i][0] == checksums[i] == checksum(path.read_text())
+        assert (received / f"{i}.txt").read_bytes() == path.read_bytes()
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from rdt_packet import BinaryFormat
+from rdt_sim import simulate, sweep
+
+with open("declaration.txt", "rb") as file:
+    DATA = file.read()
+
+
+def test_same_seed_same_transfer() -> None:
+    runs = [simulate(DATA, "sr", 16, 0.2, 0.1, 0.3, seed=42, adaptive_timeout=True) for _ in range(2)]
+    assert runs[0].ok
+    assert (tuple(runs[0].stats), runs[0].elapsed) == (tuple(runs[1].stats), runs[1].elapsed)
+    other = simulate(DATA, "sr", 16, 0.2, 0.1, 0.3, seed=43, adaptive_timeout=True)
+    assert (tuple(other.stats), other.elapsed) != (tuple(runs[0].stats), runs[0].elapsed)
+
+
+def test_virtual_time_does_not_sleep() -> None:
+    started = time.monotonic()
+    result = simulate(DATA[:200], "saw", loss_rate=0.3, seed=7, transmission_timeout=60)
+    assert result.ok and result.stats[3] > 0
+    assert result.elapsed >= 60 * result.stats[3]
+    assert time.monotonic() - started < 1
+
+
+def test_lost_link_gives_up_at_time_limit() -> None:
+    result = simulate(DATA[:200], "gbn", loss_rate=1.0, time_limit=30)
+    assert not result.completed and result.elapsed == pytest.approx(30)
+
+
+@pytest.mark.parametrize("protocol", ["saw", "gbn", "sr"])
+@pytest.mark.parametrize("packet_format", [None, BinaryFormat(64)])
+def test_sweep(protocol: str, packet_format) -> None:
+    # 100 seeded loss/corruption/delay scenarios per case, each replayable from its seed
+    assert sweep(DATA[:1000], range(100), protocol=protocol, loss_rate=0.2, corrupt_rate=0.2, max_delay=0.5,
+                 adaptive_timeout=True, packet_format=packet_format) == []
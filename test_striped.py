@@ -0,0 +1,88 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import rdt_striped
+from checksum import checksum
+from rdt_ack import SenderStats
+from rdt_relay import RelayServer
+from rdt_async import start_sender_async
+from rdt_striped import receive_striped, send_striped, stripe_ranges
+
+RELAY_SEED = 11
+
+
+def test_stripe_ranges() -> None:
+    assert stripe_ranges(100, 3, 20) == [(0, 20), (20, 40), (60, 40)]
+    assert stripe_ranges(45, 2, 20) == [(0, 20), (20, 25)]
+    assert stripe_ranges(10, 3, 20) == [(0, 0), (0, 0), (0, 10)]
+
+
+@pytest.mark.parametrize("packet_format,stripes,size", [("text", 3, 2000), ("bin", 4, 300_000), ("bin", 5, 3)])
+def test_striped_transfer(relay: RelayServer, tmp_path: Path, packet_format: str, stripes: int, size: int) -> None:
+    source = tmp_path / "source.txt"
+    source.write_bytes(bytes(ord("a") + i % 26 for i in range(size)))
+    received = tmp_path / "received.txt"
+    connection_id = f"striped{packet_format}{stripes}"
+
+    async def run():
+        return await asyncio.gather(
+            send_striped("127.0.0.1", relay.port, connection_id, str(source), stripes, 0.1, 0.1, 0, 1,
+                         adaptive_timeout=True, packet_format=packet_format, segment_size=512),
+            receive_striped("127.0.0.1", relay.port, connection_id, stripes, 0.1, 0.1, 0, output=str(received),
+                            packet_format=packet_format, segment_size=512),
+        )
+
+    sent, checksum_val = asyncio.run(run())
+    assert sent[0] == checksum_val == checksum(source.read_bytes())
+    assert received.read_bytes() == source.read_bytes()
+
+
+@pytest.mark.parametrize("failure", ["raise", "00000"])
+def test_failed_stripe_fails_the_transfer(monkeypatch: pytest.MonkeyPatch, tmp_path: Path, failure: str) -> None:
+    async def sender(server_ip, server_port, connection_id, *args, length=None, **kwargs):
+        if connection_id == "failing-1":
+            if failure == "raise":
+                raise ConnectionError("Failed to establish connection")
+            return SenderStats(("00000", 0, 0, 0, 0), 0, 0)
+        return SenderStats((checksum(b"x" * length), 1, 1, 0, 0), 0, 0)
+
+    async def receiver(server_ip, server_port, connection_id, loss_rate, corrupt_rate, max_delay, protocol, window_size,
+                       output, *args):
+        output.write(b"x" * 20)
+        if connection_id == "failing-1":
+            if failure == "raise":
+                raise ConnectionError("Failed to establish connection")
+            return "00000"  # what start_receiver_async returns when the connection drops mid-transfer
+        output.write(b"")  # end of the stripe
+        return output.checksum.value
+
+    monkeypatch.setattr(rdt_striped, "start_sender_async", sender)
+    monkeypatch.setattr(rdt_striped, "start_receiver_async", receiver)
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"x" * 100)
+    assert asyncio.run(send_striped("127.0.0.1", 0, "failing", str(source), 3))[0] == "00000"
+    assert asyncio.run(receive_striped("127.0.0.1", 0, "failing", 3, output=str(tmp_path / "received.txt"))) == "00000"
+
+
+def test_stripe_cut_short_fails_the_receiver(monkeypatch: pytest.MonkeyPatch, relay: RelayServer, tmp_path: Path) -> None:
+    async def sender(server_ip, server_port, connection_id, *args, length=None, end_mark=False, **kwargs):
+        if connection_id == "killed-1":
+            # The sender of stripe 1 stops halfway and closes its connection
+            return await start_sender_async(server_ip, server_port, connection_id, *args, length=length // 2, **kwargs)
+        return await start_sender_async(server_ip, server_port, connection_id, *args, length=length, end_mark=end_mark,
+                                        **kwargs)
+
+    monkeypatch.setattr(rdt_striped, "start_sender_async", sender)
+    source = tmp_path / "source.txt"
+    source.write_bytes(bytes(ord("a") + i % 26 for i in range(600)))
+
+    async def run():
+        return await asyncio.gather(
+            send_striped("127.0.0.1", relay.port, "killed", str(source), 3, transmission_timeout=1),
+            receive_striped("127.0.0.1", relay.port, "killed", 3, output=str(tmp_path / "received.txt")),
+        )
+
+    sent, checksum_val = asyncio.run(run())
+    assert checksum_val == "00000"